@@ -0,0 +1,198 @@
+#!/usr/bin/python3
+
+"""
+HYDE Downloading Tool - Startup Benchmark
+
+__date__ = '20201028'
+__version__ = '3.0.0'
+__author__ = 'Fabio Delogu (fabio.delogu@cimafoundation.org'
+__library__ = 'HyDE'
+
+General command line:
+python3 hyde_benchmark_startup.py -repeat 5
+python3 hyde_benchmark_startup.py -repeat 5 -settings_file configuration.json -time "YYYY-MM-DD HH:MM"
+
+Measure, for each connector, the import time of the entry point (in a fresh interpreter) and the
+cumulative import time of the heavy libraries; optionally measure the settings and time initialization.
+"""
+# -------------------------------------------------------------------------------------
+
+# -------------------------------------------------------------------------------------
+# Complete library
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from argparse import ArgumentParser
+# -------------------------------------------------------------------------------------
+
+# -------------------------------------------------------------------------------------
+# Algorithm information
+alg_name = 'HYDE DOWNLOADING TOOL - STARTUP BENCHMARK'
+alg_version = '3.0.0'
+alg_release = '2020-10-28'
+# Algorithm parameter(s)
+time_format = '%Y-%m-%d %H:%M'
+# Connector entry point(s)
+connector_modules = {
+    'ws': 'ground_network.odbc.hyde_downloader_odbc_ws',
+    'rs': 'ground_network.odbc.hyde_downloader_odbc_rs',
+    'dams': 'ground_network.mysql.hyde_downloader_mysql_dams',
+}
+# Heavy libraries
+library_modules = ['numpy', 'pandas', 'geopandas', 'rasterio', 'pyodbc', 'mysql.connector']
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Script Main
+def main():
+
+    # -------------------------------------------------------------------------------------
+    # Get algorithm settings
+    alg_settings, alg_time, alg_repeat = get_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Info algorithm
+    logging.info(' ============================================================================ ')
+    logging.info(' ==> ' + alg_name + ' (Version: ' + alg_version + ' Release_Date: ' + alg_release + ')')
+    logging.info(' ==> START ... ')
+    logging.info(' ')
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Measure import time of the entry point(s)
+    folder_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for connector_name, connector_module in connector_modules.items():
+
+        logging.info(' ---> Connector ' + connector_name + ' (' + connector_module + ') ... ')
+
+        time_wall_list, time_import_list, import_error = [], [], None
+        for repeat_id in range(alg_repeat):
+            time_wall, time_import, import_error = measure_import(connector_module, folder_root)
+            if import_error is not None:
+                break
+            time_wall_list.append(time_wall)
+            time_import_list.append(time_import)
+
+        if import_error is not None:
+            logging.info(' ---> Connector ' + connector_name + ' ... FAILED. ' + import_error)
+            continue
+
+        logging.info(' ----> Interpreter and import (wall): ' + format_time(statistics.median(time_wall_list)))
+        for library_module in library_modules:
+            library_time = [time_import.get(library_module) for time_import in time_import_list]
+            if None in library_time:
+                logging.info(' ----> Library ' + library_module + ': not imported')
+            else:
+                logging.info(' ----> Library ' + library_module + ': ' + format_time(statistics.median(library_time)))
+
+        logging.info(' ---> Connector ' + connector_name + ' ... DONE')
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Measure initialization time (settings and time run)
+    if alg_settings is not None:
+
+        sys.path.insert(0, folder_root)
+        from ground_network.odbc.lib_utils_io import read_file_settings
+        from ground_network.odbc.lib_utils_time import set_time
+
+        logging.info(' ---> Initialization (' + alg_settings + ') ... ')
+
+        time_settings_list, time_run_list = [], []
+        for repeat_id in range(alg_repeat):
+            time_start = time.perf_counter()
+            data_settings = read_file_settings(alg_settings)
+            time_settings_list.append(time.perf_counter() - time_start)
+
+            time_start = time.perf_counter()
+            set_time(time_run_args=alg_time, time_run_file=data_settings['time']['time_now'],
+                     time_format=time_format)
+            time_run_list.append(time.perf_counter() - time_start)
+
+        logging.info(' ----> Settings: ' + format_time(statistics.median(time_settings_list)))
+        logging.info(' ----> Time run: ' + format_time(statistics.median(time_run_list)))
+
+        logging.info(' ---> Initialization ... DONE')
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Info algorithm
+    logging.info(' ')
+    logging.info(' ==> ... END')
+    logging.info(' ============================================================================ ')
+    # -------------------------------------------------------------------------------------
+
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to measure the import of a module in a fresh interpreter
+def measure_import(module_name, folder_root):
+
+    process_env = dict(os.environ)
+    process_env['PYTHONPATH'] = os.pathsep.join(
+        [folder_root] + [path for path in [process_env.get('PYTHONPATH')] if path])
+
+    time_start = time.perf_counter()
+    process_obj = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + module_name],
+                                 cwd=folder_root, env=process_env, capture_output=True, text=True)
+    time_wall = time.perf_counter() - time_start
+
+    if process_obj.returncode != 0:
+        process_lines = process_obj.stderr.strip().splitlines()
+        return time_wall, None, process_lines[-1] if process_lines else 'Import failed'
+
+    # Format: "import time: self [us] | cumulative | imported package"
+    time_import = {}
+    for process_line in process_obj.stderr.splitlines():
+        if not process_line.startswith('import time:'):
+            continue
+        line_parts = process_line[len('import time:'):].split('|')
+        if len(line_parts) != 3 or not line_parts[1].strip().isdigit():
+            continue
+        line_module = line_parts[2].strip()
+        if line_module not in time_import:
+            time_import[line_module] = int(line_parts[1]) / 1e6
+
+    return time_wall, time_import, None
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to format a time interval
+def format_time(time_value):
+    return str(round(time_value * 1000, 1)) + ' ms'
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to get script argument(s)
+def get_args():
+    parser_handle = ArgumentParser()
+    parser_handle.add_argument('-settings_file', action="store", dest="alg_settings")
+    parser_handle.add_argument('-time', action="store", dest="alg_time")
+    parser_handle.add_argument('-repeat', action="store", dest="alg_repeat", type=int, default=5)
+    parser_values = parser_handle.parse_args()
+
+    alg_settings = parser_values.alg_settings
+    alg_time = parser_values.alg_time
+    alg_repeat = max(parser_values.alg_repeat, 1)
+
+    return alg_settings, alg_time, alg_repeat
+
+# -------------------------------------------------------------------------------------
+
+
+# ----------------------------------------------------------------------------
+# Call script from external library
+if __name__ == "__main__":
+    main()
+# ----------------------------------------------------------------------------
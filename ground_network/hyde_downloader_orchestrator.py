@@ -0,0 +1,361 @@
+#!/usr/bin/python3
+
+"""
+HYDE Downloading Tool - Ground Network Orchestrator
+
+__date__ = '20201028'
+__version__ = '3.0.0'
+__author__ = 'Fabio Delogu (fabio.delogu@cimafoundation.org'
+__library__ = 'HyDE'
+
+General command line:
+python3 hyde_downloader_orchestrator.py -settings_file configuration.json -time "YYYY-MM-DD HH:MM"
+python3 hyde_downloader_orchestrator.py -settings_file configuration.json -time "YYYY-MM-DD HH:MM" -connectors ws rs
+python3 hyde_downloader_orchestrator.py -settings_file configuration.json -daemon
+
+Run the weather stations, river stations and dams connectors concurrently in one process; the connectors
+share the scheduler, the database connections (a concurrency budget for each database) and the timing report.
+"""
+# -------------------------------------------------------------------------------------
+
+# -------------------------------------------------------------------------------------
+# Complete library
+import importlib
+import logging
+import os
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
+
+from ground_network.odbc.lib_utils_io import read_file_settings
+from ground_network.odbc.lib_utils_system import make_folder
+from ground_network.odbc.lib_utils_scheduler import CycleTimer, define_schedule, run_schedule
+
+from argparse import ArgumentParser
+# -------------------------------------------------------------------------------------
+
+# -------------------------------------------------------------------------------------
+# Algorithm information
+alg_name = 'HYDE DOWNLOADING TOOL - GROUND NETWORK ORCHESTRATOR'
+alg_version = '3.0.0'
+alg_release = '2020-10-28'
+# Algorithm parameter(s)
+time_format = '%Y-%m-%d %H:%M'
+# Connector entry point(s) and database(s)
+connector_registry = {
+    'ws': {'module': 'ground_network.odbc.hyde_downloader_odbc_ws', 'database': 'sirmip'},
+    'rs': {'module': 'ground_network.odbc.hyde_downloader_odbc_rs', 'database': 'sirmip'},
+    'dams': {'module': 'ground_network.mysql.hyde_downloader_mysql_dams', 'database': 'dams'},
+}
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Script Main
+def main():
+
+    # -------------------------------------------------------------------------------------
+    # Get algorithm settings
+    alg_settings, alg_time, alg_connectors, alg_daemon = get_args()
+
+    # Set algorithm settings
+    orchestrator_settings = read_file_settings(alg_settings)
+
+    # Set algorithm logging
+    make_folder(orchestrator_settings['log']['folder_name'])
+    set_logging(logger_file=os.path.join(orchestrator_settings['log']['folder_name'],
+                                         orchestrator_settings['log']['file_name']),
+                logger_format=orchestrator_settings['log']['format'])
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Info algorithm
+    logging.info(' ============================================================================ ')
+    logging.info(' ==> ' + alg_name + ' (Version: ' + alg_version + ' Release_Date: ' + alg_release + ')')
+    logging.info(' ==> START ... ')
+    logging.info(' ')
+
+    # Time algorithm information
+    start_time = time.time()
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Define connector(s) and get geographical information (once for each connector)
+    connector_obj = define_connectors(orchestrator_settings['connectors'], alg_connectors)
+    for connector_name, connector_fields in connector_obj.items():
+        logging.info(' ---> Connector ' + connector_name + ' geographical information ... ')
+        connector_fields['geo'] = connector_fields['module'].DriverGeo(
+            src_dict=connector_fields['settings']['data']['static']).read_data()
+        logging.info(' ---> Connector ' + connector_name + ' geographical information ... DONE')
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Define database connection pool(s) and async front-end(s) (shared by the connectors of a database)
+    if 'budget' in list(orchestrator_settings.keys()):
+        db_obj = define_databases(connector_obj, orchestrator_settings['budget'])
+    else:
+        db_obj = define_databases(connector_obj)
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Run connectors (once or on schedule keeping geographical data and database connections)
+    try:
+        if not alg_daemon:
+
+            cycle_timer = run_connectors(connector_obj, db_obj, alg_time)
+            logging.info(' ---> Timing -- ' + cycle_timer.summary())
+
+        else:
+
+            def run_cycle(cycle_time, cycle_timer):
+                run_connectors(connector_obj, db_obj, cycle_time.strftime(time_format), cycle_timer=cycle_timer)
+
+            if 'daemon' in list(orchestrator_settings.keys()):
+                schedule_settings = define_schedule(orchestrator_settings['daemon'])
+            else:
+                schedule_settings = define_schedule()
+            run_schedule(run_cycle, **schedule_settings)
+
+    finally:
+        # Close database connection(s)
+        for db_fields in db_obj.values():
+            if db_fields['async'] is not None:
+                db_fields['async'].close()
+            if db_fields['pool'] is not None:
+                db_fields['pool'].close()
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Info algorithm
+    time_elapsed = round(time.time() - start_time, 1)
+
+    logging.info(' ')
+    logging.info(' ==> ' + alg_name + ' (Version: ' + alg_version + ' Release_Date: ' + alg_release + ')')
+    logging.info(' ==> TIME ELAPSED: ' + str(time_elapsed) + ' seconds')
+    logging.info(' ==> ... END')
+    logging.info(' ==> Bye, Bye')
+    logging.info(' ============================================================================ ')
+
+    # -------------------------------------------------------------------------------------
+
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to define the connector(s) (entry point module and settings)
+def define_connectors(connector_settings, connector_list=None):
+
+    if connector_list is None:
+        connector_list = [connector_name for connector_name, connector_fields in connector_settings.items()
+                          if ('active' not in list(connector_fields.keys())) or connector_fields['active']]
+
+    connector_obj = {}
+    for connector_name in connector_list:
+
+        if connector_name not in list(connector_registry.keys()):
+            logging.error(' ===> Connector "' + connector_name + '" is not supported')
+            raise NotImplementedError('Connector not implemented yet')
+        if connector_name not in list(connector_settings.keys()):
+            logging.error(' ===> Connector "' + connector_name + '" is not defined in the settings file')
+            raise IOError('Connector settings are not available')
+
+        # Entry point is imported only if the connector is selected
+        connector_module = importlib.import_module(connector_registry[connector_name]['module'])
+        data_settings = read_file_settings(connector_settings[connector_name]['settings_file'])
+
+        connector_obj[connector_name] = {'module': connector_module, 'settings': data_settings,
+                                         'database': connector_registry[connector_name]['database']}
+
+    if not connector_obj:
+        logging.error(' ===> Connector(s) are not selected')
+        raise IOError('Connector(s) are not available')
+
+    return connector_obj
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to define the database connection pool and async front-end (budget) of the connector(s)
+def define_databases(connector_obj, budget_settings=None):
+
+    if budget_settings is None:
+        budget_settings = {}
+
+    db_obj = {}
+    for connector_name, connector_fields in connector_obj.items():
+
+        connector_module = connector_fields['module']
+        db_info = deepcopy(connector_fields['settings']['data']['dynamic']['source'])
+
+        # Connectors of the same database (and server) share the connections
+        db_key = connector_fields['database'] + '@' + str(db_info['server_ip'])
+        connector_fields['database_key'] = db_key
+        if db_key in list(db_obj.keys()):
+            logging.info(' ---> Connector ' + connector_name + ' shares the database ' + db_key)
+            continue
+
+        # Budget (maximum concurrent queries) bounds the pool and the async front-end
+        if connector_fields['database'] in list(budget_settings.keys()):
+            db_budget = budget_settings[connector_fields['database']]
+        else:
+            db_budget = {}
+        if 'concurrency' in list(db_budget.keys()):
+            db_info['pool_size'] = db_budget['concurrency']
+        if 'query_async' not in list(db_info.keys()):
+            db_info['query_async'] = {}
+        for budget_key, async_key in [('concurrency', 'workers'), ('concurrency', 'concurrency'),
+                                      ('timeout', 'timeout')]:
+            if budget_key in list(db_budget.keys()):
+                db_info['query_async'][async_key] = db_budget[budget_key]
+
+        logging.info(' ---> Database ' + db_key + ' ... ')
+
+        db_pool = connector_module.define_db_pool(connector_module.DriverData.collect_db_settings(db_info))
+        if db_pool is not None:
+            if hasattr(connector_module, 'define_db_native_open'):
+                db_async = connector_module.define_db_async(
+                    db_info, db_name=connector_fields['database'],
+                    db_native_fx=lambda: connector_module.define_db_native_open(
+                        db_pool.db_settings, pool_size=db_pool.pool_size))
+            else:
+                db_async = connector_module.define_db_async(db_info, db_name=connector_fields['database'])
+        else:
+            db_async = None
+
+        db_obj[db_key] = {'pool': db_pool, 'async': db_async}
+
+        logging.info(' ---> Database ' + db_key + ' ... DONE')
+
+    return db_obj
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to run the connector(s) concurrently (one thread for each connector)
+def run_connectors(connector_obj, db_obj, time_run_args=None, cycle_timer=None):
+
+    if cycle_timer is None:
+        cycle_timer = CycleTimer()
+
+    def run_connector(connector_name):
+
+        connector_fields = connector_obj[connector_name]
+        connector_module = connector_fields['module']
+        data_settings = connector_fields['settings']
+        db_fields = db_obj[connector_fields['database_key']]
+
+        thread_name = threading.current_thread().name
+        threading.current_thread().name = connector_name
+        try:
+            connector_timer = CycleTimer()
+            with connector_timer.step('total'):
+                time_run, time_range = connector_module.set_time(
+                    time_run_args=time_run_args, time_run_file=data_settings['time']['time_now'],
+                    time_format=time_format)
+                connector_module.run_time_range(data_settings, time_range, connector_fields['geo'],
+                                                db_fields['pool'], cycle_timer=connector_timer,
+                                                db_async=db_fields['async'])
+        finally:
+            threading.current_thread().name = thread_name
+
+        return connector_timer
+
+    logging.info(' ---> Connector(s) ' + ', '.join(connector_obj.keys()) + ' ... ')
+
+    with ThreadPoolExecutor(max_workers=len(connector_obj)) as connector_executor:
+        connector_future = {connector_name: connector_executor.submit(run_connector, connector_name)
+                            for connector_name in connector_obj.keys()}
+
+    # Combined timing report (connector name prefixed to the step name)
+    connector_failed = []
+    for connector_name, connector_result in connector_future.items():
+        try:
+            connector_timer = connector_result.result()
+        except Exception as connector_error:
+            connector_failed.append(connector_name)
+            logging.error(' ===> Connector ' + connector_name + ' failed: ' + repr(connector_error))
+            continue
+        logging.info(' ----> Connector ' + connector_name + ' ... DONE. Timing -- ' + connector_timer.summary())
+        cycle_timer.update({connector_name + '_' + step_name: step_time
+                            for step_name, step_time in connector_timer.timing_obj.items()})
+
+    if connector_failed:
+        logging.info(' ---> Connector(s) ' + ', '.join(connector_obj.keys()) + ' ... FAILED')
+        raise RuntimeError('Connector(s) ' + ', '.join(connector_failed) + ' failed')
+
+    logging.info(' ---> Connector(s) ' + ', '.join(connector_obj.keys()) + ' ... DONE')
+
+    return cycle_timer
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to get script argument(s)
+def get_args():
+    parser_handle = ArgumentParser()
+    parser_handle.add_argument('-settings_file', action="store", dest="alg_settings")
+    parser_handle.add_argument('-time', action="store", dest="alg_time")
+    parser_handle.add_argument('-connectors', action="store", dest="alg_connectors", nargs='+')
+    parser_handle.add_argument('-daemon', action="store_true", dest="alg_daemon")
+    parser_values = parser_handle.parse_args()
+
+    if parser_values.alg_settings:
+        alg_settings = parser_values.alg_settings
+    else:
+        alg_settings = 'configuration.json'
+
+    if parser_values.alg_time:
+        alg_time = parser_values.alg_time
+    else:
+        alg_time = None
+
+    alg_connectors = parser_values.alg_connectors
+    alg_daemon = parser_values.alg_daemon
+
+    return alg_settings, alg_time, alg_connectors, alg_daemon
+
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to set logging information
+def set_logging(logger_file='log.txt', logger_format=None):
+    if logger_format is None:
+        logger_format = '%(asctime)s %(threadName)-10s %(levelname)-8s ' \
+                        '%(filename)s:[%(lineno)-6s - %(funcName)20s()] %(message)s'
+
+    # Remove old logging file
+    if os.path.exists(logger_file):
+        os.remove(logger_file)
+
+    # Set level of root debugger
+    logging.root.setLevel(logging.DEBUG)
+
+    # Open logging basic configuration
+    logging.basicConfig(level=logging.DEBUG, format=logger_format, filename=logger_file, filemode='w')
+
+    # Set logger handle
+    logger_handle_1 = logging.FileHandler(logger_file, 'w')
+    logger_handle_2 = logging.StreamHandler()
+    # Set logger level
+    logger_handle_1.setLevel(logging.DEBUG)
+    logger_handle_2.setLevel(logging.DEBUG)
+    # Set logger formatter
+    logger_formatter = logging.Formatter(logger_format)
+    logger_handle_1.setFormatter(logger_formatter)
+    logger_handle_2.setFormatter(logger_formatter)
+
+    # Add handle to logging
+    logging.getLogger('').addHandler(logger_handle_1)
+    logging.getLogger('').addHandler(logger_handle_2)
+
+# -------------------------------------------------------------------------------------
+
+
+# ----------------------------------------------------------------------------
+# Call script from external library
+if __name__ == "__main__":
+    main()
+# ----------------------------------------------------------------------------
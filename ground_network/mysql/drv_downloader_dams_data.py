@@ -2,6 +2,7 @@
 # Libraries
 import logging
 import os
+import threading
 
 import pandas as pd
 
@@ -9,10 +10,12 @@ from copy import deepcopy
 
 from ground_network.mysql.lib_utils_io import write_file_csv, write_obj, read_obj, write_file_json, \
     json2dump_dams  # Matteo: add of functions "write_file_json, json2dump_dams"
-from ground_network.mysql.lib_utils_system import fill_tags2string, make_folder, get_root_path, list_folder
+from ground_network.mysql.lib_utils_system import fill_tags2string_range, get_root_path, list_folder, FileIndex
+from ground_network.mysql.lib_utils_store import read_store_index, write_store, export_store
 
 from ground_network.mysql.lib_utils_db_dams import define_db_settings, get_db_credential, \
-    parse_query_time, get_data_dams, organize_data_dams, order_data
+    parse_query_time, get_data_dams, get_data_dams_native, organize_data_dams, order_data
+from ground_network.mysql.lib_utils_db_async import run_requests
 
 
 # -------------------------------------------------------------------------------------
@@ -24,7 +27,8 @@ class DriverData:
 
     def __init__(self, time_step, dams_collection=None, src_dict=None, ancillary_dict=None, dst_dict=None,
                  time_dict=None, variable_dict=None, template_dict=None, info_dict=None,
-                 flag_updating_ancillary=True, flag_updating_destination=True, flag_cleaning_tmp=True):
+                 flag_updating_ancillary=True, flag_updating_destination=True, flag_cleaning_tmp=True,
+                 db_pool=None, file_index=None, time_range=None, db_async=None):
 
         self.time_step = time_step
         self.dams_collection = dams_collection
@@ -41,14 +45,24 @@ class DriverData:
         self.tag_file_active = 'active'
 
         self.tag_file_fields = 'fields'
+        self.tag_store = 'store'
 
         self.domain_name = info_dict['domain']
         self.variable_list = list(self.variable_dict.keys())
 
-        self.time_range = self.collect_file_time()
+        self.time_range = self.collect_file_time(time_range=time_range)
 
-        self.db_info = self.collect_db_settings(self.src_dict)
-        self.db_settings = define_db_settings(self.db_info)
+        self.db_async = db_async
+        self.db_pool = db_pool
+        if self.db_pool is None:
+            self.db_info = self.collect_db_settings(self.src_dict)
+            self.db_settings = define_db_settings(self.db_info)
+        else:
+            self.db_settings = self.db_pool.db_settings
+
+        self.file_index = file_index
+        if self.file_index is None:
+            self.file_index = FileIndex()
 
         self.folder_name_anc_dset_raw = self.ancillary_dict[self.tag_folder_name]
         self.file_name_anc_dset_raw = self.ancillary_dict[self.tag_file_name]
@@ -78,6 +92,10 @@ class DriverData:
             logging.warning('The json file that will contain the dam water levels for Dewetra has not been well' +
                             'configured at the destination field of the initial configuration json file. Please check.')
 
+        self.file_active_dst_store, self.file_path_dst_store_obj = self.collect_file_store(self.dst_dict)
+        self.file_index_dst_store, self.file_data_dst_store = {}, {}
+        self.lock_dst_store = threading.Lock()
+
         self.flag_updating_ancillary = flag_updating_ancillary
         self.flag_updating_destination = flag_updating_destination
 
@@ -142,15 +160,19 @@ class DriverData:
 
     # -------------------------------------------------------------------------------------
     # Method to collect time(s)
-    def collect_file_time(self, time_reverse=True):
+    def collect_file_time(self, time_range=None, time_reverse=True):
 
-        time_period = self.time_dict["time_period"]
-        time_frequency = self.time_dict["time_frequency"]
-        time_rounding = self.time_dict["time_rounding"]
+        if time_range is not None:
+            # Time range planned by the caller (e.g. union of run windows or backfill chunk)
+            time_range = pd.DatetimeIndex(time_range).sort_values()
+        else:
+            time_period = self.time_dict["time_period"]
+            time_frequency = self.time_dict["time_frequency"]
+            time_rounding = self.time_dict["time_rounding"]
 
-        time_end = self.time_step.floor(time_rounding)
+            time_end = self.time_step.floor(time_rounding)
 
-        time_range = pd.date_range(end=time_end, periods=time_period, freq=time_frequency)
+            time_range = pd.date_range(end=time_end, periods=time_period, freq=time_frequency)
 
         if time_reverse:
             time_range = time_range[::-1]
@@ -164,38 +186,39 @@ class DriverData:
     def collect_file_list(self, folder_name_raw, file_name_raw):
 
         domain_name = self.domain_name
+        time_range = self.time_range
 
         file_name_obj = {}
         for variable_step in self.variable_list:
             variable_tag = self.variable_dict[variable_step]['tag']
 
             if variable_tag is not None:
-                file_name_list = []
-                for datetime_step in self.time_range:
-                    template_values_step = {
-                        'domain_name': domain_name,
-                        'ancillary_var_name': variable_step,
-                        'destination_var_name': variable_step,
-                        'ancillary_datetime': datetime_step, 'ancillary_sub_path_time': datetime_step,
-                        'destination_datetime': datetime_step, 'destination_sub_path_time': datetime_step}
 
-                    folder_name_def = fill_tags2string(
-                        folder_name_raw, self.template_dict, template_values_step)
-                    file_name_def = fill_tags2string(
-                        file_name_raw, self.template_dict, template_values_step)
-                    file_path_def = os.path.join(folder_name_def, file_name_def)
+                template_values = {
+                    'domain_name': domain_name,
+                    'ancillary_var_name': variable_step,
+                    'destination_var_name': variable_step,
+                    'ancillary_datetime': time_range, 'ancillary_sub_path_time': time_range,
+                    'destination_datetime': time_range, 'destination_sub_path_time': time_range,
+                    'destination_store_datetime': time_range}
 
-                    file_name_list.append(file_path_def)
+                # Folder and file templates are compiled once and rendered over the whole time range
+                folder_name_list = fill_tags2string_range(
+                    folder_name_raw, self.template_dict, template_values, time_range)
+                file_name_list = fill_tags2string_range(
+                    file_name_raw, self.template_dict, template_values, time_range)
 
-                file_name_obj[variable_step] = file_name_list
+                file_name_obj[variable_step] = [
+                    os.path.join(folder_name_def, file_name_def)
+                    for folder_name_def, file_name_def in zip(folder_name_list, file_name_list)]
 
         return file_name_obj
 
     # -------------------------------------------------------------------------------------
 
     # -------------------------------------------------------------------------------------
-    # Method to download datasets
-    def download_data(self):
+    # Method to download datasets (all the time steps or a subset of them)
+    def download_data(self, time_steps=None):
 
         logging.info(' ----> Download datasets ... ')
 
@@ -207,6 +230,7 @@ class DriverData:
         flag_upd_anc = self.flag_updating_ancillary
         flag_upd_dst = self.flag_updating_destination
 
+        download_async = []
         for var_name, var_fields in var_dict.items():
 
             logging.info(' -----> Variable ' + var_name + ' ... ')
@@ -225,36 +249,50 @@ class DriverData:
                     for time_step, file_path_anc_step, file_path_dst_step in zip(
                             time_range, file_path_anc_list, file_path_dst_list):
 
+                        if (time_steps is not None) and (time_step not in time_steps):
+                            continue
+
                         logging.info(' ------> Time Step ' + str(time_step) + ' ... ')
 
                         if flag_upd_anc:
-                            if os.path.exists(file_path_anc_step):
-                                os.remove(file_path_anc_step)
+                            if self.file_index.exists(file_path_anc_step):
+                                self.file_index.remove(file_path_anc_step)
 
                         if flag_upd_dst:
-                            if os.path.exists(file_path_dst_step):
-                                os.remove(file_path_dst_step)
+                            if self.file_index.exists(file_path_dst_step):
+                                self.file_index.remove(file_path_dst_step)
+
+                        file_exists_dst_step = self.check_file_dst(var_name, time_step, file_path_dst_step)
 
-                        if (not os.path.exists(file_path_anc_step)) and (not os.path.exists(file_path_dst_step)):
+                        if (not self.file_index.exists(file_path_anc_step)) and (not file_exists_dst_step):
 
                             time_from, time_to = parse_query_time(time_step, time_mode=var_type)
-                            var_data = get_data_dams(var_tag, time_from, time_to, self.db_settings)
+
+                            if self.db_async is not None:
+                                download_async.append([var_tag, time_step, file_path_anc_step, time_from, time_to])
+                                logging.info(' ------> Time Step ' + str(time_step) +
+                                             ' ... DELAYED. Datasets will be downloaded by an async query.')
+                                continue
+
+                            var_data = get_data_dams(var_tag, time_from, time_to, self.db_settings,
+                                                     db_pool=self.db_pool)
 
                             if var_data:
 
                                 folder_name_anc_step, file_name_anc_step = os.path.split(file_path_anc_step)
-                                make_folder(folder_name_anc_step)
+                                self.file_index.make_folder(folder_name_anc_step)
 
                                 write_obj(file_path_anc_step, var_data)
+                                self.file_index.add(file_path_anc_step)
                                 logging.info(' ------> Time Step ' + str(time_step) + ' ... DONE')
                             else:
                                 logging.info(' ------> Time Step ' + str(time_step) +
                                              ' ... SKIPPED. Database request received an empty datasets')
 
-                        elif (os.path.exists(file_path_anc_step)) and (not os.path.exists(file_path_dst_step)):
+                        elif (self.file_index.exists(file_path_anc_step)) and (not file_exists_dst_step):
                             logging.info(' ------> Time Step ' + str(time_step) +
                                          ' ... SKIPPED. Ancillary file always exists.')
-                        elif (not os.path.exists(file_path_anc_step)) and (os.path.exists(file_path_dst_step)):
+                        elif (not self.file_index.exists(file_path_anc_step)) and file_exists_dst_step:
                             logging.info(' ------> Time Step ' + str(time_step) +
                                          ' ... SKIPPED. Destination file always exists.')
                         else:
@@ -272,13 +310,169 @@ class DriverData:
 
                 logging.info(' -----> Variable ' + var_name + ' ... SKIPPED. Variable tag is null.')
 
+        if download_async:
+            self.download_data_async(download_async)
+
         logging.info(' ----> Download datasets ... DONE')
 
     # -------------------------------------------------------------------------------------
 
     # -------------------------------------------------------------------------------------
-    # Method to organize datasets
-    def organize_data(self):
+    # Method to download datasets using concurrent hourly queries (async front-end; native driver if available)
+    def download_data_async(self, download_async):
+
+        logging.info(' -----> Async queries (' + str(len(download_async)) + ') ... ')
+
+        request_list = []
+        for var_tag, time_step, file_path_anc_step, time_from, time_to in download_async:
+            if self.db_async.native:
+                request_list.append([self.db_async, get_data_dams_native, (var_tag, time_from, time_to), {}])
+            else:
+                request_list.append([self.db_async, get_data_dams, (var_tag, time_from, time_to, self.db_settings),
+                                     {'db_pool': self.db_pool}])
+        result_list = run_requests(request_list)
+
+        # Failed (or timed out) requests are retried by a blocking query (errors are raised as in the hourly mode)
+        request_failed = 0
+        for (var_tag, time_step, file_path_anc_step, time_from, time_to), var_data in zip(download_async, result_list):
+            if isinstance(var_data, BaseException):
+                request_failed += 1
+                logging.warning(' ===> Variable ' + var_tag + ' at time step ' + str(time_step) +
+                                ' failed by async query (' + repr(var_data) + '). Retry by blocking query')
+                var_data = get_data_dams(var_tag, time_from, time_to, self.db_settings,
+                                         db_pool=self.db_pool)
+            if var_data:
+                folder_name_anc_step, file_name_anc_step = os.path.split(file_path_anc_step)
+                self.file_index.make_folder(folder_name_anc_step)
+
+                write_obj(file_path_anc_step, var_data)
+                self.file_index.add(file_path_anc_step)
+
+        logging.info(' -----> Async queries (' + str(len(download_async)) + ') ... DONE. Retried: ' +
+                     str(request_failed))
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to collect store (consolidated destination file per day) information
+    def collect_file_store(self, dst_info):
+
+        file_active_store, file_path_store_obj = False, None
+        if self.tag_store in list(dst_info.keys()):
+
+            store_info = dst_info[self.tag_store]
+            if self.tag_file_active in list(store_info.keys()):
+                file_active_store = store_info[self.tag_file_active]
+            else:
+                file_active_store = True
+
+            if file_active_store:
+                file_path_store_obj = self.collect_file_list(
+                    store_info[self.tag_folder_name], store_info[self.tag_file_name])
+
+        return file_active_store, file_path_store_obj
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to check destination file (or time step in the store file)
+    def check_file_dst(self, var_name, time_step, file_path_dst_step):
+
+        if self.file_index.exists(file_path_dst_step):
+            return True
+
+        if self.file_active_dst_store and (not self.flag_updating_destination):
+            file_path_store_step = self.file_path_dst_store_obj[var_name][self.time_range.get_loc(time_step)]
+            with self.lock_dst_store:
+                if file_path_store_step not in list(self.file_index_dst_store.keys()):
+                    self.file_index_dst_store[file_path_store_step] = set()
+                    if self.file_index.exists(file_path_store_step):
+                        self.file_index_dst_store[file_path_store_step] = set(read_store_index(file_path_store_step))
+                return time_step in self.file_index_dst_store[file_path_store_step]
+
+        return False
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to collect time step for the store file (csv and json files are managed by their own flags)
+    def write_file_dst(self, var_name, time_step, file_path_dst_step, var_df):
+
+        if self.file_active_dst_store:
+            file_path_store_step = self.file_path_dst_store_obj[var_name][self.time_range.get_loc(time_step)]
+            with self.lock_dst_store:
+                if file_path_store_step not in list(self.file_data_dst_store.keys()):
+                    self.file_data_dst_store[file_path_store_step] = {}
+                self.file_data_dst_store[file_path_store_step][time_step] = var_df
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to dump the collected time steps in the store file(s) (one write for each file)
+    def dump_file_store(self):
+
+        # Store index and data are shared with the download stage of the pipeline (see run_pipeline_data)
+        with self.lock_dst_store:
+            file_data_dst_store, self.file_data_dst_store = self.file_data_dst_store, {}
+
+        for file_path_store, file_data_store in file_data_dst_store.items():
+
+            logging.info(' -----> Store ' + file_path_store + ' ... ')
+
+            folder_name_store, file_name_store = os.path.split(file_path_store)
+            self.file_index.make_folder(folder_name_store)
+
+            write_store(file_path_store, file_data_store)
+            self.file_index.add(file_path_store)
+
+            with self.lock_dst_store:
+                if file_path_store in list(self.file_index_dst_store.keys()):
+                    self.file_index_dst_store[file_path_store].update(file_data_store.keys())
+
+            logging.info(' -----> Store ' + file_path_store + ' ... DONE. Time steps: ' +
+                         str(len(file_data_store)))
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to export destination file(s) from the store file(s)
+    def export_data(self):
+
+        logging.info(' ----> Export datasets ... ')
+
+        if not self.file_active_dst_store:
+            logging.info(' ----> Export datasets ... SKIPPED. Store is not activated.')
+            return
+
+        for var_name, file_path_dst_list in self.file_path_dst_csv_dset_obj.items():
+
+            logging.info(' -----> Variable ' + var_name + ' ... ')
+
+            file_path_store_list = self.file_path_dst_store_obj[var_name]
+            for time_step, file_path_dst_step, file_path_store_step in zip(
+                    self.time_range, file_path_dst_list, file_path_store_list):
+
+                if not self.file_index.exists(file_path_store_step):
+                    continue
+                if self.file_index.exists(file_path_dst_step) and (not self.flag_updating_destination):
+                    continue
+
+                folder_name_dst_step, file_name_dst_step = os.path.split(file_path_dst_step)
+                self.file_index.make_folder(folder_name_dst_step)
+
+                if export_store(file_path_store_step, time_step, file_path_dst_step):
+                    self.file_index.add(file_path_dst_step)
+                    logging.info(' ------> Time Step ' + str(time_step) + ' ... DONE')
+
+            logging.info(' -----> Variable ' + var_name + ' ... DONE')
+
+        logging.info(' ----> Export datasets ... DONE')
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to organize datasets (all the time steps or a subset of them)
+    def organize_data(self, time_steps=None):
 
         logging.info(' ----> Organize datasets ... ')
 
@@ -314,13 +508,18 @@ class DriverData:
                 for time_step, file_path_anc_step, file_path_dst_csv_step, file_path_dst_json_step in zip(
                         time_range, file_path_anc_list, file_path_dst_csv_list, file_path_dst_json_list):
 
+                    if (time_steps is not None) and (time_step not in time_steps):
+                        continue
+
                     logging.info(' ------> Time Step ' + str(time_step) + ' ... ')
 
                     if flag_upd_dst:
-                        if os.path.exists(file_path_dst_csv_step):
-                            os.remove(file_path_dst_csv_step)
+                        if self.file_index.exists(file_path_dst_csv_step):
+                            self.file_index.remove(file_path_dst_csv_step)
 
-                    if (os.path.exists(file_path_anc_step)) and (not os.path.exists(file_path_dst_csv_step)):
+                    file_exists_dst_step = self.check_file_dst(var_name, time_step, file_path_dst_csv_step)
+
+                    if (self.file_index.exists(file_path_anc_step)) and (not file_exists_dst_step):
 
                         var_data = read_obj(file_path_anc_step)
 
@@ -341,16 +540,17 @@ class DriverData:
                                 # CSV:
                                 if self.file_active_dst_csv:
                                     folder_name_dst_csv_dset, file_name_dst_csv_dset = os.path.split(file_path_dst_csv_step)
-                                    make_folder(folder_name_dst_csv_dset)
+                                    self.file_index.make_folder(folder_name_dst_csv_dset)
 
                                     logging.info(
                                         ' ----> Saving dams water levels to csv file:' + str(file_path_dst_csv_step))
                                     write_file_csv(file_path_dst_csv_step, var_df)
+                                    self.file_index.add(file_path_dst_csv_step)
 
                                 # JSON:
                                 if self.file_active_dst_json:
                                     folder_name_dst_json_dset, file_name_dst_json_dset = os.path.split(file_path_dst_csv_step)
-                                    make_folder(folder_name_dst_json_dset)
+                                    self.file_index.make_folder(folder_name_dst_json_dset)
 
                                     logging.info(
                                         ' ----> Saving dams water levels to json file:' + str(file_path_dst_json_step))
@@ -358,6 +558,11 @@ class DriverData:
                                     all_levels2json = write_file_json(var_df)
                                     # save dictionary to json file:
                                     json2dump_dams(all_levels2json, file_path_dst_json_step)
+                                    self.file_index.add(file_path_dst_json_step)
+
+                                # STORE:
+                                if self.file_active_dst_store:
+                                    self.write_file_dst(var_name, time_step, file_path_dst_csv_step, var_df)
 
                                 logging.info(' ------> Time Step ' + str(time_step) + ' ... DONE')
 
@@ -369,11 +574,11 @@ class DriverData:
                             logging.info(' ------> Time Step ' + str(time_step) + ' ... FAILED. ')
                             logging.warning(' ===> Data downloaded from database source service is null.')
 
-                    elif (not os.path.exists(file_path_anc_step)) and (os.path.exists(file_path_dst_csv_step)):
+                    elif (not self.file_index.exists(file_path_anc_step)) and file_exists_dst_step:
                         logging.info(' ------> Time Step ' + str(time_step) +
                                      ' ... SKIPPED. Destination file always exists.')
 
-                    elif (not os.path.exists(file_path_anc_step)) and (not os.path.exists(file_path_dst_csv_step)):
+                    elif (not self.file_index.exists(file_path_anc_step)) and (not file_exists_dst_step):
                         logging.info(' ------> Time Step ' + str(time_step) +
                                      ' ... SKIPPED. Variable is not activated or source datasets are empty.')
 
@@ -381,13 +586,16 @@ class DriverData:
 
                 logging.info(' -----> Variable ' + var_name + ' ... SKIPPED. Variable tag is null.')
 
+        if self.file_data_dst_store:
+            self.dump_file_store()
+
         logging.info(' ----> Organize datasets ... DONE')
 
     # -------------------------------------------------------------------------------------
 
     # -------------------------------------------------------------------------------------
     # Method to clean temporary information
-    def clean_tmp(self):
+    def clean_tmp(self, clean_all=True):
 
         file_path_anc = self.file_path_anc_dset_obj
         clean_tmp = self.flag_cleaning_tmp
@@ -398,27 +606,32 @@ class DriverData:
             # Remove tmp file and folder(s)
             for var_name, var_file_path_list in file_path_anc.items():
                 for var_file_path_step in var_file_path_list:
-                    if os.path.exists(var_file_path_step):
-                        os.remove(var_file_path_step)
+                    if self.file_index.exists(var_file_path_step):
+                        self.file_index.remove(var_file_path_step)
                     var_folder_name_step, var_file_name_step = os.path.split(var_file_path_step)
                     if var_folder_name_step != '':
-                        if os.path.exists(var_folder_name_step):
-                            if not os.listdir(var_folder_name_step):
-                                os.rmdir(var_folder_name_step)
+                        if self.file_index.exists(var_folder_name_step):
+                            if self.file_index.is_empty(var_folder_name_step):
+                                self.file_index.remove_folder(var_folder_name_step)
 
-            # Remove empty folder(s)
+            # Remove empty folder(s) (and the remaining file(s) if all the ancillary datasets are cleaned)
             folder_name_anc_list = list_folder(folder_name_anc_main)
             for folder_name_anc_step in folder_name_anc_list:
-                if os.path.exists(folder_name_anc_step):
+                if self.file_index.exists(folder_name_anc_step):
+
+                    if not clean_all:
+                        if self.file_index.is_empty(folder_name_anc_step):
+                            self.file_index.remove_folder(folder_name_anc_step)
+                        continue
 
-                    file_name_tmp = os.listdir(folder_name_anc_step)
+                    file_name_tmp = sorted(self.file_index.scan(folder_name_anc_step))
                     if file_name_tmp:
                         for file_name_step in file_name_tmp:
                             file_path_step = os.path.join(folder_name_anc_step, file_name_step)
-                            if os.path.exists(file_path_step):
-                                os.remove(file_path_step)
+                            if self.file_index.exists(file_path_step):
+                                self.file_index.remove(file_path_step)
 
-                    os.rmdir(folder_name_anc_step)
+                    self.file_index.remove_folder(folder_name_anc_step)
 
     # -------------------------------------------------------------------------------------
 
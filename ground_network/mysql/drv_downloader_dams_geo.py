@@ -2,9 +2,9 @@
 # Libraries
 import logging
 import os
-import numpy as np
 
-from ground_network.mysql.lib_utils_geo import read_data_shapefile_dam
+from ground_network.mysql.lib_utils_geo import read_data_shapefile_dam, define_shapefile_key, \
+    read_data_snapshot, write_data_snapshot
 # -------------------------------------------------------------------------------------
 
 
@@ -20,29 +20,66 @@ class DriverGeo:
         self.tag_geo_sections = tag_geo_sections
         self.tag_folder_name = 'folder_name'
         self.tag_file_name = 'file_name'
+        self.tag_snapshot = 'snapshot'
+        self.tag_active = 'active'
 
         self.folder_name = self.src_dict[self.tag_geo_sections][self.tag_folder_name]
         self.file_name = self.src_dict[self.tag_geo_sections][self.tag_file_name]
 
         self.file_path = os.path.join(self.folder_name, self.file_name)
+        self.file_path_snapshot = self.collect_file_snapshot(self.src_dict[self.tag_geo_sections])
 
         self.columns_name_expected = ['HMC_X', 'HMC_Y', 'LON', 'LAT', 'BASIN', 'NAME', 'CODE', 'TAG', 'TYPE', 'AREA']
-        self.columns_name_type = [np.int, np.int, np.float, np.float, str, str, np.int, str, str, np.float]
+        self.columns_name_type = [int, int, float, float, str, str, int, str, str, float]
 
         self.columns_name_tag = ['hmc_id_x', 'hmc_id_y', 'longitude', 'latitude',
                                  'catchment', 'name', 'code', 'tag', 'type', 'area']
 
-    # Method to read sections datasets
+    # Method to collect snapshot file (typed table of the shapefile)
+    def collect_file_snapshot(self, geo_dict):
+
+        folder_name_snapshot = self.folder_name
+        file_name_snapshot = os.path.splitext(self.file_name)[0] + '.snapshot'
+        active_snapshot = True
+        if self.tag_snapshot in list(geo_dict.keys()):
+            snapshot_dict = geo_dict[self.tag_snapshot]
+            if self.tag_folder_name in list(snapshot_dict.keys()):
+                folder_name_snapshot = snapshot_dict[self.tag_folder_name]
+            if self.tag_file_name in list(snapshot_dict.keys()):
+                file_name_snapshot = snapshot_dict[self.tag_file_name]
+            if self.tag_active in list(snapshot_dict.keys()):
+                active_snapshot = snapshot_dict[self.tag_active]
+
+        if not active_snapshot:
+            return None
+        return os.path.join(folder_name_snapshot, file_name_snapshot)
+
+    # Method to read dams datasets
     def read_data(self):
 
         logging.info(' ----> Read dams file ' + self.file_name + ' ... ')
         if os.path.exists(self.file_path):
-            dams_obj = read_data_shapefile_dam(
-                self.file_path,
-                columns_name_expected=self.columns_name_expected,
-                columns_name_type=self.columns_name_type,
-                columns_name_tag=self.columns_name_tag)
-            logging.info(' ----> Read dams file ' + self.file_name + ' ... DONE')
+
+            file_key = define_shapefile_key(self.file_path,
+                                            columns_name_expected=self.columns_name_expected,
+                                            columns_name_type=self.columns_name_type,
+                                            columns_name_tag=self.columns_name_tag)
+
+            dams_obj = None
+            if self.file_path_snapshot is not None:
+                dams_obj = read_data_snapshot(self.file_path_snapshot, file_key)
+
+            if dams_obj is None:
+                dams_obj = read_data_shapefile_dam(
+                    self.file_path,
+                    columns_name_expected=self.columns_name_expected,
+                    columns_name_type=self.columns_name_type,
+                    columns_name_tag=self.columns_name_tag)
+                if self.file_path_snapshot is not None:
+                    write_data_snapshot(self.file_path_snapshot, file_key, dams_obj)
+                logging.info(' ----> Read dams file ' + self.file_name + ' ... DONE')
+            else:
+                logging.info(' ----> Read dams file ' + self.file_name + ' ... DONE. Loaded from snapshot file')
         else:
             logging.error(' ==> Read dams file ' + self.file_name + ' ... FAILED')
             raise IOError('File does not exist')
@@ -0,0 +1,181 @@
+# -------------------------------------------------------------------------------------
+# Libraries
+import asyncio
+import logging
+import weakref
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Class database asynchronous front-end (bounded executor, concurrency limit and timeout for each database)
+class DBAsync:
+
+    def __init__(self, db_name='db', db_workers=4, db_concurrency=2, db_timeout=None, db_native_open=None):
+
+        if db_workers < 1:
+            logging.error(' ===> Database async workers must be greater than 0')
+            raise ValueError('Bad definition of async workers')
+        if db_concurrency < 1:
+            logging.error(' ===> Database async concurrency must be greater than 0')
+            raise ValueError('Bad definition of async concurrency')
+
+        self.db_name = db_name
+        self.db_workers = db_workers
+        self.db_concurrency = db_concurrency
+        self.db_timeout = db_timeout
+
+        # Blocking calls run in the executor (shared by all the callers, so the workers bound the calls of all
+        # the loops); native calls (coroutine functions) use a native pool opened in each loop
+        self.db_executor = ThreadPoolExecutor(max_workers=db_workers, thread_name_prefix=db_name)
+        self.db_native_open = db_native_open
+
+        # Loop-bound objects (semaphore, lock and native pool of each running loop)
+        self.db_loop_obj = weakref.WeakKeyDictionary()
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to check if native asynchronous calls are available
+    @property
+    def native(self):
+        return self.db_native_open is not None
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to get the objects of the running loop
+    def bind(self):
+        db_loop = asyncio.get_running_loop()
+        if db_loop not in self.db_loop_obj:
+            self.db_loop_obj[db_loop] = {'semaphore': asyncio.Semaphore(self.db_concurrency),
+                                         'lock': asyncio.Lock(), 'native_pool': None}
+        return self.db_loop_obj[db_loop]
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to run a request (blocking function in the executor or native coroutine function)
+    async def call(self, db_fx, *args, **kwargs):
+
+        db_obj = self.bind()
+        async with db_obj['semaphore']:
+            if asyncio.iscoroutinefunction(db_fx):
+                async with db_obj['lock']:
+                    if db_obj['native_pool'] is None:
+                        db_obj['native_pool'] = await self.db_native_open()
+                db_request = db_fx(db_obj['native_pool'], *args, **kwargs)
+            else:
+                # A timed out call frees its slot, but the executor thread runs until the driver returns
+                db_request = asyncio.get_running_loop().run_in_executor(
+                    self.db_executor, partial(db_fx, *args, **kwargs))
+            return await asyncio.wait_for(db_request, timeout=self.db_timeout)
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to close the native pool of the running loop
+    async def close_native(self):
+        db_obj = self.bind()
+        if db_obj['native_pool'] is not None:
+            db_obj['native_pool'].close()
+            await db_obj['native_pool'].wait_closed()
+            db_obj['native_pool'] = None
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to close the executor
+    def close(self):
+        self.db_executor.shutdown(wait=True)
+
+    # -------------------------------------------------------------------------------------
+
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to define the asynchronous front-end settings
+def define_db_async(db_info, db_name='db', db_native_fx=None,
+                    db_workers_default=4, db_concurrency_default=2, db_timeout_default=None):
+
+    if 'query_async' in list(db_info.keys()):
+        async_info = db_info['query_async']
+    else:
+        async_info = {}
+
+    if 'active' in list(async_info.keys()):
+        async_active = async_info['active']
+    else:
+        async_active = False
+    if 'workers' in list(async_info.keys()):
+        db_workers = async_info['workers']
+    else:
+        db_workers = db_workers_default
+    if 'concurrency' in list(async_info.keys()):
+        db_concurrency = async_info['concurrency']
+    else:
+        db_concurrency = db_concurrency_default
+    if 'timeout' in list(async_info.keys()):
+        db_timeout = async_info['timeout']
+    else:
+        db_timeout = db_timeout_default
+    if 'native' in list(async_info.keys()):
+        db_native = async_info['native']
+    else:
+        db_native = True
+
+    if not async_active:
+        logging.info(' ---> Define server async front-end ... SKIPPED. Front-end is not activated.')
+        return None
+
+    # Native pool opener is defined only if the front-end is active (the native driver is imported here)
+    if db_native and (db_native_fx is not None):
+        db_native_open = db_native_fx()
+    else:
+        db_native_open = None
+
+    logging.info(' ---> Define server async front-end (workers: ' + str(db_workers) + ', concurrency: ' +
+                 str(db_concurrency) + ', timeout: ' + str(db_timeout) + ', native: ' +
+                 str(db_native_open is not None) + ') ... OK')
+
+    return DBAsync(db_name=db_name, db_workers=db_workers, db_concurrency=db_concurrency,
+                   db_timeout=db_timeout, db_native_open=db_native_open)
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to run the requests concurrently (failed requests return their exception)
+async def gather_requests(request_list):
+
+    db_request_list = [db_async.call(db_fx, *db_args, **db_kwargs)
+                       for db_async, db_fx, db_args, db_kwargs in request_list]
+    try:
+        db_result_list = await asyncio.gather(*db_request_list, return_exceptions=True)
+    finally:
+        for db_async in set([request_step[0] for request_step in request_list]):
+            await db_async.close_native()
+
+    return db_result_list
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to run the requests from a blocking caller
+def run_requests(request_list):
+
+    if not request_list:
+        return []
+
+    db_result_list = asyncio.run(gather_requests(request_list))
+
+    for db_result in db_result_list:
+        if isinstance(db_result, asyncio.TimeoutError):
+            logging.warning(' ===> Database request timed out')
+        elif isinstance(db_result, BaseException):
+            logging.warning(' ===> Database request failed: ' + repr(db_result))
+
+    return db_result_list
+# -------------------------------------------------------------------------------------
@@ -1,15 +1,17 @@
 # -------------------------------------------------------------------------------------
 # Libraries
 import logging
-import mysql.connector as pymysql
 import datetime
 import csv
 import netrc
 
-import numpy as np
 import pandas as pd
 
 from copy import deepcopy
+from contextlib import contextmanager
+
+from ground_network.mysql.lib_utils_db_pool import DBPool
+from ground_network.mysql.lib_utils_decoder import define_columns_schema, decode_data
 # -------------------------------------------------------------------------------------
 
 
@@ -44,7 +46,7 @@ def organize_data_dams(
     if columns_list_data is None:
         columns_list_data = ['id', 'name', 'time', 'data']
     if columns_type_data is None:
-        columns_type_data = [np.int, str, datetime.datetime, np.float]
+        columns_type_data = [int, str, datetime.datetime, float]
     if columns_id_data is None:
         columns_id_data = [0, 1, 2, 3]
 
@@ -64,51 +66,10 @@ def organize_data_dams(
         logging.error(' ===> Column name data tag is not in columns list names')
         raise ValueError('Bad definition of column tag')
 
-    data_workspace = {}
-    for data_array_row in data_collection:
-
-        columns_list_select = [columns_list_data[i] for i in columns_id_data]
-        columns_type_select = [columns_type_data[i] for i in columns_id_data]
-
-        data_list_row = list(data_array_row)
-        data_list_select = [data_list_row[i] for i in columns_id_data]
-
-        for column_name, column_value in zip(columns_list_select, data_list_select):
-
-            if column_name not in list(data_workspace.keys()):
-                data_workspace[column_name] = [column_value]
-            else:
-                column_tmp = data_workspace[column_name]
-                column_tmp.append(column_value)
-                data_workspace[column_name] = column_tmp
-
-    for column_name, column_type in zip(columns_list_select, columns_type_select):
-        data_tmp = data_workspace[column_name]
-
-        if np.int == column_type:
-            data_tmp = np.asarray(data_tmp, dtype=np.int)
-        elif np.float == column_type:
-            data_tmp = np.asarray(data_tmp, dtype=np.float)
-        elif pd.Timestamp == column_type:
-            data_tmp = pd.to_datetime(data_tmp)
-        elif bool == column_type:
-            data_tmp = np.asarray(data_tmp, dtype=bool)
-
-        if column_name == column_value_data:
-
-            data_tmp = data_tmp / data_scale_factor
-
-            data_valid_min = data_valid_range[0]
-            data_valid_max = data_valid_range[1]
-
-            if data_valid_min is not None:
-                data_tmp[data_tmp < data_valid_min] = np.nan
-            if data_valid_max is not None:
-                data_tmp[data_tmp > data_valid_max] = np.nan
-
-        data_workspace[column_name] = data_tmp
-
-    data_df = pd.DataFrame(data_workspace, columns=columns_list_select)
+    columns_schema = define_columns_schema(
+        columns_list_data, columns_type_data, columns_id_data, column_data=column_value_data,
+        data_scale_factor=data_scale_factor, data_valid_range=data_valid_range)
+    data_df = decode_data(data_collection, columns_schema)
 
     # Adapt names on database qith names in the shapefile
     data_df[column_join_data] = data_df[column_join_data].str.title()
@@ -135,28 +96,115 @@ def organize_data_dams(
 
 # -------------------------------------------------------------------------------------
 # Method to get dams dataset
-def get_data_dams(var_name, time_from, time_to, db_obj_settings):
+def get_data_dams(var_name, time_from, time_to, db_obj_settings, db_pool=None):
 
     # Define DB query
     db_query_data = define_query_dams_data(var_name=var_name, time_from=time_from, time_to=time_to)
 
     # Open DB connection
-    db_connection = pymysql.connect(**db_obj_settings)
+    with connect_db(db_obj_settings, db_pool=db_pool) as db_connection:
 
-    db_cursor = db_connection.cursor()
-    db_cursor.execute("SELECT VERSION()")
-    db_rows = db_cursor.fetchone()
+        db_cursor = db_connection.cursor()
+        db_cursor.execute(db_query_data)
+        db_dataset = db_cursor.fetchall()
 
-    db_cursor.execute(db_query_data)
-    db_dataset = db_cursor.fetchall()
-    db_len = len(db_dataset)
+        # Close DB cursor
+        db_cursor.close()
+        db_connection.commit()
 
-    db_cursor.close()
-    # Close DB connection
-    db_connection.commit()
+    return db_dataset
+
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to get dams dataset (native asynchronous driver)
+async def get_data_dams_native(db_native_pool, var_name, time_from, time_to):
+
+    # Define DB query
+    db_query_data = define_query_dams_data(var_name=var_name, time_from=time_from, time_to=time_to)
+
+    # Borrow DB connection from the native pool
+    async with db_native_pool.acquire() as db_connection:
+        async with db_connection.cursor() as db_cursor:
+            await db_cursor.execute(db_query_data)
+            db_dataset = list(await db_cursor.fetchall())
+        await db_connection.commit()
 
     return db_dataset
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to define the native asynchronous pool opener (None if the native driver is not installed)
+def define_db_native_open(db_obj_settings, pool_size=2):
+
+    try:
+        import aiomysql
+    except ImportError:
+        logging.warning(' ===> Native async driver (aiomysql) is not available. Blocking driver is used')
+        return None
+
+    async def open_db_native():
+        return await aiomysql.create_pool(minsize=1, maxsize=pool_size, **db_obj_settings)
+
+    return open_db_native
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to open a DB connection (driver is imported at the first connection)
+def open_db_connection(db_obj_settings):
+    import mysql.connector as pymysql
+    return pymysql.connect(**db_obj_settings)
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to open a DB connection (borrowed from the pool if available)
+@contextmanager
+def connect_db(db_obj_settings, db_pool=None):
+
+    if db_pool is not None:
+        with db_pool.connection() as db_connection:
+            yield db_connection
+    else:
+        db_connection = open_db_connection(db_obj_settings)
+        try:
+            yield db_connection
+        finally:
+            db_connection.close()
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to check a DB connection
+def check_db_connection(db_connection):
+    db_connection.ping(reconnect=False)
+    return True
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to define DB connection pool
+def define_db_pool(db_info, pool_size_default=2):
+
+    db_settings = define_db_settings(db_info)
+
+    if db_settings is not None:
+        if 'pool_size' in list(db_info.keys()):
+            pool_size = db_info['pool_size']
+        else:
+            pool_size = pool_size_default
+
+        logging.info(' ---> Define server connection pool (size: ' + str(pool_size) + ') ... OK')
+        db_pool = DBPool(db_settings, db_connect=open_db_connection, db_check=check_db_connection,
+                         pool_size=pool_size)
+    else:
+        logging.info(' ---> Define server connection pool ... SKIPPED. Server is in inactive mode.')
+        db_pool = None
 
+    return db_pool
 # -------------------------------------------------------------------------------------
 
 
@@ -0,0 +1,140 @@
+# -------------------------------------------------------------------------------------
+# Libraries
+import logging
+import queue
+import threading
+import time
+
+from contextlib import contextmanager
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Class database connection pool
+class DBPool:
+
+    def __init__(self, db_settings, db_connect, db_check=None,
+                 pool_size=2, pool_timeout=None, pool_check_interval=30):
+
+        self.db_settings = db_settings
+        self.db_connect = db_connect
+        self.db_check = db_check
+
+        if pool_size < 1:
+            logging.error(' ===> Database pool size must be greater than 0')
+            raise ValueError('Bad definition of pool size')
+
+        self.pool_size = pool_size
+        self.pool_timeout = pool_timeout
+        self.pool_check_interval = pool_check_interval
+
+        self.pool_slots = threading.BoundedSemaphore(pool_size)
+        self.pool_idle = queue.LifoQueue()
+        self.pool_closed = False
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to check an idle connection before lending it
+    def check(self, db_connection, db_time_idle):
+
+        if self.db_check is None:
+            return True
+        if (time.time() - db_time_idle) < self.pool_check_interval:
+            return True
+
+        try:
+            db_status = self.db_check(db_connection)
+        except Exception as db_error:
+            logging.warning(' ===> Database connection check failed: ' + str(db_error))
+            db_status = False
+
+        return db_status
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to discard a connection
+    @staticmethod
+    def discard(db_connection):
+        try:
+            db_connection.close()
+        except Exception as db_error:
+            logging.warning(' ===> Database connection close failed: ' + str(db_error))
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to borrow a connection from the pool
+    def acquire(self):
+
+        if self.pool_closed:
+            logging.error(' ===> Database pool is closed')
+            raise RuntimeError('Database pool is not available')
+
+        if not self.pool_slots.acquire(timeout=self.pool_timeout):
+            logging.error(' ===> Database pool has no available connections')
+            raise TimeoutError('Database pool timeout')
+
+        try:
+            while True:
+                try:
+                    db_connection, db_time_idle = self.pool_idle.get_nowait()
+                except queue.Empty:
+                    break
+                if self.check(db_connection, db_time_idle):
+                    return db_connection
+                self.discard(db_connection)
+
+            return self.db_connect(self.db_settings)
+
+        except BaseException:
+            self.pool_slots.release()
+            raise
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to give a connection back to the pool
+    def release(self, db_connection, db_discard=False):
+
+        if db_discard or self.pool_closed:
+            self.discard(db_connection)
+        else:
+            self.pool_idle.put((db_connection, time.time()))
+
+        self.pool_slots.release()
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to use a connection in a with statement
+    @contextmanager
+    def connection(self):
+
+        db_connection = self.acquire()
+        try:
+            yield db_connection
+        except BaseException:
+            self.release(db_connection, db_discard=True)
+            raise
+        else:
+            self.release(db_connection)
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to close all the idle connection(s)
+    def close(self):
+
+        self.pool_closed = True
+        while True:
+            try:
+                db_connection, db_time_idle = self.pool_idle.get_nowait()
+            except queue.Empty:
+                break
+            self.discard(db_connection)
+
+    # -------------------------------------------------------------------------------------
+
+# -------------------------------------------------------------------------------------
@@ -0,0 +1,187 @@
+# -------------------------------------------------------------------------------------
+# Libraries
+import logging
+import datetime
+import decimal
+import numbers
+
+import numpy as np
+import pandas as pd
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to define the columns schema used by the decoder
+def define_columns_schema(columns_list, columns_type, columns_id, column_data=None,
+                          data_scale_factor=1, data_valid_range=None, columns_format=None):
+
+    if columns_format is None:
+        columns_format = {}
+
+    columns_schema = []
+    for column_id in columns_id:
+
+        column_name = columns_list[column_id]
+
+        column_schema = {'name': column_name, 'index': column_id, 'type': columns_type[column_id],
+                         'scale': None, 'valid_range': None, 'format': None}
+
+        if column_name == column_data:
+            column_schema['scale'] = data_scale_factor
+            column_schema['valid_range'] = data_valid_range
+        if column_name in list(columns_format.keys()):
+            column_schema['format'] = columns_format[column_name]
+
+        columns_schema.append(column_schema)
+
+    return columns_schema
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to encode data rows into a columnar (numpy structured) array
+def encode_data(data_collection, column_tag_values='f', column_tag_null='n'):
+
+    data_columns = list(zip(*[tuple(data_array_row) for data_array_row in data_collection]))
+    if not data_columns:
+        return None
+
+    data_dtype, data_workspace = [], {}
+    for column_id, column_values in enumerate(data_columns):
+
+        column_values_valid = [column_value for column_value in column_values if column_value is not None]
+        column_null = len(column_values_valid) < len(column_values)
+        column_null_flags = [column_value is None for column_value in column_values]
+
+        column_tag = column_tag_values + str(column_id)
+        if not column_values_valid:
+            column_dtype, column_values = 'U1', [''] * len(column_values)
+        elif all(isinstance(column_value, (bool, np.bool_)) for column_value in column_values_valid):
+            column_dtype = '?'
+        elif all(isinstance(column_value, (int, np.integer)) for column_value in column_values_valid):
+            column_dtype = 'i8'
+        elif all(isinstance(column_value, (numbers.Number, decimal.Decimal)) and
+                 not isinstance(column_value, (bool, np.bool_, complex)) for column_value in column_values_valid):
+            column_dtype, column_null = 'f8', False
+        elif all(isinstance(column_value, datetime.datetime) and column_value.tzinfo is None
+                 for column_value in column_values_valid):
+            column_dtype, column_null = 'M8[us]', False
+        elif all(isinstance(column_value, str) for column_value in column_values_valid):
+            column_dtype = 'U' + str(max(max([len(column_value) for column_value in column_values_valid]), 1))
+            column_values = ['' if column_value is None else column_value for column_value in column_values]
+        else:
+            return None
+
+        # Null value(s) of integer/boolean columns are not representable
+        if column_null and column_dtype in ['?', 'i8']:
+            return None
+
+        data_dtype.append((column_tag, column_dtype))
+        data_workspace[column_tag] = column_values
+        if column_null:
+            data_dtype.append((column_tag_null + str(column_id), '?'))
+            data_workspace[column_tag_null + str(column_id)] = column_null_flags
+
+    data_array = np.empty(len(data_columns[0]), dtype=data_dtype)
+    try:
+        for column_tag, column_values in data_workspace.items():
+            if data_array.dtype[column_tag].kind == 'f':
+                column_values = [np.nan if column_value is None else column_value for column_value in column_values]
+            data_array[column_tag] = column_values
+    except (OverflowError, TypeError, ValueError):
+        return None
+
+    return data_array
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to select a column from a columnar array (original values if null values are defined)
+def select_data(data_array, column_id, column_tag_values='f', column_tag_null='n'):
+
+    column_values = data_array[column_tag_values + str(column_id)]
+
+    column_tag_null = column_tag_null + str(column_id)
+    if column_tag_null in data_array.dtype.names:
+        column_values = [None if column_null else column_value for column_value, column_null in zip(
+            column_values.tolist(), data_array[column_tag_null].tolist())]
+
+    return column_values
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to decode data rows (or columnar array) into typed columns
+def decode_data(data_collection, columns_schema):
+
+    if isinstance(data_collection, np.ndarray) and (data_collection.dtype.names is not None):
+        data_columns = None
+    else:
+        # Rows are transposed into columns in a single pass
+        data_columns = list(zip(*[tuple(data_array_row) for data_array_row in data_collection]))
+        if not data_columns:
+            data_columns = [()] * (max([column_schema['index'] for column_schema in columns_schema]) + 1)
+
+    data_workspace = {}
+    for column_schema in columns_schema:
+
+        column_name = column_schema['name']
+        column_type = column_schema['type']
+        if data_columns is None:
+            column_values = select_data(data_collection, column_schema['index'])
+        else:
+            column_values = data_columns[column_schema['index']]
+
+        if column_type is int:
+            data_tmp = np.asarray(column_values, dtype=np.int64)
+        elif column_type is float:
+            data_tmp = np.asarray(column_values, dtype=np.float64)
+        elif column_type is bool:
+            data_tmp = np.asarray(column_values, dtype=bool)
+        elif column_type is pd.Timestamp:
+            if not isinstance(column_values, np.ndarray):
+                column_values = list(column_values)
+            elif column_values.dtype.kind == 'M':
+                column_values = column_values.astype('datetime64[ns]')
+            data_tmp = pd.to_datetime(column_values, format=column_schema['format'])
+        elif (column_type is str) or (column_type is datetime.datetime):
+            if isinstance(column_values, np.ndarray):
+                data_tmp = column_values.tolist()
+            else:
+                data_tmp = list(column_values)
+        else:
+            logging.error(' ===> Datatype of column "' + column_name + '" is not allowed')
+            raise NotImplementedError('Datatype not implemented yet')
+
+        if column_schema['scale'] is not None:
+            data_tmp = data_tmp / column_schema['scale']
+
+        if column_schema['valid_range'] is not None:
+
+            data_valid_min = column_schema['valid_range'][0]
+            data_valid_max = column_schema['valid_range'][1]
+
+            if data_valid_min is not None:
+                data_tmp[data_tmp < data_valid_min] = np.nan
+            if data_valid_max is not None:
+                data_tmp[data_tmp > data_valid_max] = np.nan
+
+        data_workspace[column_name] = data_tmp
+
+    data_df = pd.DataFrame(data_workspace, columns=[column_schema['name'] for column_schema in columns_schema])
+
+    return data_df
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to decode a list of data collections (each collection is decoded with its own layout)
+def decode_data_list(data_collection_list, columns_schema):
+
+    data_df_list = [decode_data(data_collection, columns_schema) for data_collection in data_collection_list
+                    if len(data_collection) > 0]
+    if not data_df_list:
+        return decode_data([], columns_schema)
+
+    return pd.concat(data_df_list, ignore_index=True)
+# -------------------------------------------------------------------------------------
@@ -1,11 +1,14 @@
 # -------------------------------------------------------------------------------------
 # Libraries
 import logging
+import json
+import os
 import numpy as np
-import geopandas as gpd
 import pandas as pd
-import rasterio
 
+from collections.abc import Mapping
+
+# Geographical libraries (geopandas, rasterio) are imported by the methods that need them
 logging.getLogger('rasterio').setLevel(logging.WARNING)
 # -------------------------------------------------------------------------------------
 
@@ -17,93 +20,272 @@ def read_data_shapefile_dam(file_name, columns_name_expected=None, columns_name_
     if columns_name_expected is None:
         columns_name_expected = ['HMC_X', 'HMC_Y', 'CODE', 'NAME', 'ID', 'AREA', 'Q_THR1', 'Q_THR2']
     if columns_name_type is None:
-        columns_name_type = [np.int, np.int, np.int, str, np.int, np.float, np.float, np.float]
+        columns_name_type = [int, int, int, str, int, float, float, float]
     if columns_name_tag is None:
         columns_name_tag = columns_name_expected
 
+    import geopandas as gpd
+
     file_dframe_raw = gpd.read_file(file_name)
+    dam_df = convert_data_shapefile(file_dframe_raw, columns_name_expected, columns_name_type, columns_name_tag)
+
+    return dam_df
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to convert the shapefile columns in the expected datatypes (one conversion for each column)
+def convert_data_shapefile(file_dframe_raw, columns_name_expected, columns_name_type, columns_name_tag):
+
     file_rows = file_dframe_raw.shape[0]
 
     file_obj = {}
     for column_name, column_type, column_tag in zip(columns_name_expected, columns_name_type, columns_name_tag):
+
+        if column_type not in [int, str, float]:
+            logging.error(' ===> Datatype for undefined columns in the section shapefile is not allowed')
+            raise NotImplementedError('Datatype not implemented yet')
+
         if column_name in file_dframe_raw.columns:
-            column_data_tmp = file_dframe_raw[column_name].values.tolist()
+            column_data_tmp = file_dframe_raw[column_name].to_numpy()
 
-            if column_type == np.int:
-                column_data = [np.int(item) for item in column_data_tmp]
+            if column_type == int:
+                column_data = column_data_tmp.astype(np.int64)
             elif column_type == str:
-                column_data = [str(item) for item in column_data_tmp]
-            elif column_type == np.float:
-                column_data = [np.float(item) for item in column_data_tmp]
+                column_data = column_data_tmp.astype(str).astype(object)
             else:
-                logging.error(' ===> Datatype for undefined columns in the section shapefile is not allowed')
-                raise NotImplementedError('Datatype not implemented yet')
+                column_data = column_data_tmp.astype(np.float64)
         else:
 
             logging.warning(' ===> Column ' + column_name +
                             ' not available in shapefile. Initialized with undefined values according with datatype')
-            if column_type == np.int:
-                column_data = [-9999] * file_rows
+            if column_type == int:
+                column_data = np.full(file_rows, -9999, dtype=np.int64)
             elif column_type == str:
-                column_data = [''] * file_rows
-            elif column_type == np.float:
-                column_data = [-9999.0] * file_rows
+                column_data = np.full(file_rows, '', dtype=object)
             else:
-                logging.error(' ===> Datatype for undefined columns in the section shapefile is not allowed')
-                raise NotImplementedError('Datatype not implemented yet')
+                column_data = np.full(file_rows, -9999.0, dtype=np.float64)
 
         file_obj[column_tag] = column_data
 
-    dam_df = pd.DataFrame(file_obj, columns=columns_name_tag)
+    file_df = pd.DataFrame(file_obj, columns=columns_name_tag)
+
+    return file_df
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to define the key of a shapefile (mtime and size of all the shapefile components)
+def define_shapefile_key(file_name, columns_name_expected=None, columns_name_type=None, columns_name_tag=None):
+
+    file_stem, file_ext = os.path.splitext(file_name)
+
+    file_key = []
+    for file_ext_step in ['.shp', '.shx', '.dbf', '.prj', '.cpg']:
+        file_name_step = file_stem + file_ext_step
+        if os.path.exists(file_name_step):
+            file_stat = os.stat(file_name_step)
+            file_key.append([file_ext_step, file_stat.st_mtime_ns, file_stat.st_size])
+
+    if columns_name_type is not None:
+        columns_name_type = [column_type.__name__ for column_type in columns_name_type]
+
+    return json.dumps({'file': file_key, 'columns_expected': columns_name_expected,
+                       'columns_type': columns_name_type, 'columns_tag': columns_name_tag})
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to read the snapshot of a shapefile (None if not available or not updated)
+def read_data_snapshot(file_name_snapshot, file_key):
+
+    if not os.path.exists(file_name_snapshot):
+        return None
+
+    try:
+        with np.load(file_name_snapshot, allow_pickle=False) as file_handle:
+            if str(file_handle['snapshot_key']) != file_key:
+                return None
+            columns_name_tag = file_handle['snapshot_columns'].tolist()
+
+            file_obj = {}
+            for column_id, column_tag in enumerate(columns_name_tag):
+                column_data = file_handle['column_' + str(column_id)]
+                if column_data.dtype.kind == 'U':
+                    column_data = column_data.astype(object)
+                file_obj[column_tag] = column_data
+    except Exception as snapshot_error:
+        logging.warning(' ===> Snapshot file "' + file_name_snapshot + '" is not readable: ' + str(snapshot_error))
+        return None
+
+    return pd.DataFrame(file_obj, columns=columns_name_tag)
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to write the snapshot of a shapefile
+def write_data_snapshot(file_name_snapshot, file_key, file_df):
+
+    file_obj = {'snapshot_key': np.array(file_key),
+                'snapshot_columns': np.array(list(file_df.columns), dtype=str)}
+    for column_id, column_tag in enumerate(file_df.columns):
+        column_data = file_df[column_tag].to_numpy()
+        if column_data.dtype == object:
+            column_data = column_data.astype(str)
+        file_obj['column_' + str(column_id)] = column_data
+
+    file_name_tmp = file_name_snapshot + '.tmp'
+    try:
+        folder_name_snapshot = os.path.dirname(file_name_snapshot)
+        if folder_name_snapshot != '':
+            os.makedirs(folder_name_snapshot, exist_ok=True)
+        with open(file_name_tmp, 'wb') as file_handle:
+            np.savez(file_handle, **file_obj)
+        os.replace(file_name_tmp, file_name_snapshot)
+    except OSError as snapshot_error:
+        logging.warning(' ===> Snapshot file "' + file_name_snapshot + '" is not writable: ' + str(snapshot_error))
+        if os.path.exists(file_name_tmp):
+            os.remove(file_name_tmp)
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Class land raster (1-D coordinates and transform; 2-D grids and values are built on demand)
+class RasterLand(Mapping):
+
+    def __init__(self, file_name, file_name_values=None, decimal_round=7):
+
+        import rasterio
+
+        self.file_name = file_name
+        self.file_name_values = file_name_values
+
+        with rasterio.open(file_name) as dset:
+            bounds = dset.bounds
+            res = dset.res
+            self.transform = dset.transform
+            self.shape = (dset.height, dset.width)
+
+        center_right = bounds.right - (res[0] / 2)
+        center_left = bounds.left + (res[0] / 2)
+        center_top = bounds.top - (res[1] / 2)
+        center_bottom = bounds.bottom + (res[1] / 2)
+
+        lon = np.arange(center_left, center_right + np.abs(res[0] / 2), np.abs(res[0]), float)
+        lat = np.arange(center_bottom, center_top + np.abs(res[0] / 2), np.abs(res[1]), float)
+
+        assert round(np.min(lon), decimal_round) == round(center_left, decimal_round)
+        assert round(np.max(lon), decimal_round) == round(center_right, decimal_round)
+        assert round(np.min(lat), decimal_round) == round(center_bottom, decimal_round)
+        assert round(np.max(lat), decimal_round) == round(center_top, decimal_round)
+
+        # Latitude is north-up (as the raster rows)
+        self.lon_1d = lon
+        self.lat_1d = np.flipud(lat)
+
+        self.file_obj = {'transform': self.transform,
+                         'bb_left': bounds.left, 'bb_right': bounds.right,
+                         'bb_top': bounds.top, 'bb_bottom': bounds.bottom,
+                         'res_lon': res[0], 'res_lat': res[1]}
+        self.file_keys = ['values', 'longitude', 'latitude'] + list(self.file_obj.keys())
+
+        self.file_values = None
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to map the raster values from the values file (written from the raster if not available or not updated)
+    def map_values(self):
+
+        if self.file_name_values is None:
+            return None
+
+        if (not os.path.exists(self.file_name_values)) or \
+                (os.stat(self.file_name_values).st_mtime_ns < os.stat(self.file_name).st_mtime_ns):
+
+            import rasterio
+
+            with rasterio.open(self.file_name) as dset:
+                file_values = dset.read(1)
+
+            file_name_tmp = self.file_name_values + '.tmp'
+            try:
+                folder_name_values = os.path.dirname(self.file_name_values)
+                if folder_name_values != '':
+                    os.makedirs(folder_name_values, exist_ok=True)
+                with open(file_name_tmp, 'wb') as file_handle:
+                    np.save(file_handle, file_values)
+                os.replace(file_name_tmp, self.file_name_values)
+            except OSError as values_error:
+                logging.warning(' ===> Values file "' + self.file_name_values + '" is not writable: ' +
+                                str(values_error))
+                if os.path.exists(file_name_tmp):
+                    os.remove(file_name_tmp)
+                return file_values
+
+        try:
+            file_values = np.load(self.file_name_values, mmap_mode='r', allow_pickle=False)
+        except Exception as values_error:
+            logging.warning(' ===> Values file "' + self.file_name_values + '" is not readable: ' + str(values_error))
+            return None
+        if file_values.shape != self.shape:
+            logging.warning(' ===> Values file "' + self.file_name_values + '" does not match the raster shape')
+            return None
+
+        return file_values
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to read the raster values (a window [row_start, row_end, col_start, col_end] if defined)
+    def read_values(self, window=None):
+
+        # Values are memory-mapped from the values file (if defined)
+        file_values = self.map_values()
+        if file_values is not None:
+            if window is None:
+                return file_values
+            row_start, row_end, col_start, col_end = window
+            return file_values[row_start:row_end, col_start:col_end]
+
+        import rasterio
+        from rasterio.windows import Window
+
+        with rasterio.open(self.file_name) as dset:
+            if window is None:
+                return dset.read(1)
+            row_start, row_end, col_start, col_end = window
+            return dset.read(1, window=Window(col_start, row_start, col_end - col_start, row_end - row_start))
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to get a field (2-D grids are read-only views of the 1-D coordinates)
+    def __getitem__(self, key):
+
+        if key == 'values':
+            if self.file_values is None:
+                self.file_values = self.read_values()
+            return self.file_values
+        elif key == 'longitude':
+            return np.broadcast_to(self.lon_1d[np.newaxis, :], (self.lat_1d.shape[0], self.lon_1d.shape[0]))
+        elif key == 'latitude':
+            return np.broadcast_to(self.lat_1d[:, np.newaxis], (self.lat_1d.shape[0], self.lon_1d.shape[0]))
+        return self.file_obj[key]
+
+    def __iter__(self):
+        return iter(self.file_keys)
+
+    def __len__(self):
+        return len(self.file_keys)
+
+    # -------------------------------------------------------------------------------------
 
-    return dam_df
 # -------------------------------------------------------------------------------------
 
 
 # -------------------------------------------------------------------------------------
 # Method to read ascii data raster
-def read_data_raster_land(file_name):
-
-    dset = rasterio.open(file_name)
-    bounds = dset.bounds
-    res = dset.res
-    transform = dset.transform
-    data = dset.read()
-    values = data[0, :, :]
-
-    decimal_round = 7
-
-    center_right = bounds.right - (res[0] / 2)
-    center_left = bounds.left + (res[0] / 2)
-    center_top = bounds.top - (res[1] / 2)
-    center_bottom = bounds.bottom + (res[1] / 2)
-
-    lon = np.arange(center_left, center_right + np.abs(res[0] / 2), np.abs(res[0]), float)
-    lat = np.arange(center_bottom, center_top + np.abs(res[0] / 2), np.abs(res[1]), float)
-    lons, lats = np.meshgrid(lon, lat)
-
-    min_lon_round = round(np.min(lons), decimal_round)
-    max_lon_round = round(np.max(lons), decimal_round)
-    min_lat_round = round(np.min(lats), decimal_round)
-    max_lat_round = round(np.max(lats), decimal_round)
-
-    center_right_round = round(center_right, decimal_round)
-    center_left_round = round(center_left, decimal_round)
-    center_bottom_round = round(center_bottom, decimal_round)
-    center_top_round = round(center_top, decimal_round)
-
-    assert min_lon_round == center_left_round
-    assert max_lon_round == center_right_round
-    assert min_lat_round == center_bottom_round
-    assert max_lat_round == center_top_round
-
-    lats = np.flipud(lats)
-
-    file_obj = {'values': values, 'longitude': lons, 'latitude': lats,
-                'transform': transform,
-                'bb_left': bounds.left, 'bb_right': bounds.right,
-                'bb_top': bounds.top, 'bb_bottom': bounds.bottom,
-                'res_lon': res[0], 'res_lat': res[1]}
-
-    return file_obj
+def read_data_raster_land(file_name, file_name_values=None):
+    return RasterLand(file_name, file_name_values=file_name_values)
 # -------------------------------------------------------------------------------------
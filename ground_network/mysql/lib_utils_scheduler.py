@@ -0,0 +1,488 @@
+# -------------------------------------------------------------------------------------
+# Libraries
+import csv
+import json
+import logging
+import os
+import queue
+import signal
+import threading
+import time
+
+import pandas as pd
+
+from contextlib import contextmanager
+from datetime import datetime
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Class cycle timer (elapsed time of the steps of a cycle)
+class CycleTimer:
+
+    def __init__(self):
+        self.timing_obj = {}
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to time a step (elapsed times of steps with the same name are summed)
+    @contextmanager
+    def step(self, step_name):
+        time_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timing_obj[step_name] = self.timing_obj.get(step_name, 0.0) + time.perf_counter() - time_start
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to add elapsed times (e.g. measured by a worker process)
+    def update(self, timing_obj):
+        for step_name, step_time in timing_obj.items():
+            self.timing_obj[step_name] = self.timing_obj.get(step_name, 0.0) + step_time
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to summarize the elapsed times
+    def summary(self):
+        return ', '.join([step_name + ': ' + str(round(step_time, 1)) + ' seconds'
+                          for step_name, step_time in self.timing_obj.items()])
+
+    # -------------------------------------------------------------------------------------
+
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to define the schedule settings
+def define_schedule(schedule_dict=None, cycle_interval_default=3600, cycle_offset_default=0):
+
+    if schedule_dict is None:
+        schedule_dict = {}
+
+    if 'cycle_interval' in list(schedule_dict.keys()):
+        cycle_interval = schedule_dict['cycle_interval']
+    else:
+        cycle_interval = cycle_interval_default
+    if 'cycle_offset' in list(schedule_dict.keys()):
+        cycle_offset = schedule_dict['cycle_offset']
+    else:
+        cycle_offset = cycle_offset_default
+    if 'cycle_max' in list(schedule_dict.keys()):
+        cycle_max = schedule_dict['cycle_max']
+    else:
+        cycle_max = None
+    if 'file_timing' in list(schedule_dict.keys()):
+        file_timing = schedule_dict['file_timing']
+    else:
+        file_timing = None
+
+    if cycle_interval is None or cycle_interval <= 0:
+        logging.error(' ===> Schedule cycle interval must be greater than 0')
+        raise ValueError('Bad definition of cycle interval')
+    if cycle_offset is None or cycle_offset < 0 or cycle_offset >= cycle_interval:
+        logging.error(' ===> Schedule cycle offset must be in [0, cycle interval)')
+        raise ValueError('Bad definition of cycle offset')
+
+    return {'cycle_interval': cycle_interval, 'cycle_offset': cycle_offset,
+            'cycle_max': cycle_max, 'file_timing': file_timing}
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to compute the next cycle time (aligned to the interval plus the offset, in seconds)
+def compute_cycle_next(time_now, cycle_interval, cycle_offset=0):
+    cycle_id = (time_now - cycle_offset) // cycle_interval
+    return (cycle_id + 1) * cycle_interval + cycle_offset
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to write the cycle timing (one row for each cycle)
+def write_cycle_timing(file_name, cycle_time, cycle_status, cycle_timing):
+
+    file_row = {'cycle_time': cycle_time.strftime('%Y-%m-%d %H:%M:%S'), 'cycle_status': cycle_status}
+    for step_name, step_time in cycle_timing.items():
+        file_row[step_name] = round(step_time, 3)
+
+    folder_name = os.path.dirname(file_name)
+    if folder_name != '':
+        os.makedirs(folder_name, exist_ok=True)
+
+    file_fields = list(file_row.keys())
+    if os.path.exists(file_name) and os.path.getsize(file_name) > 0:
+        with open(file_name, 'r', newline='') as file_handle:
+            file_fields = next(csv.reader(file_handle))
+        file_mode = 'a'
+    else:
+        file_mode = 'w'
+
+    with open(file_name, file_mode, newline='') as file_handle:
+        file_writer = csv.DictWriter(file_handle, fieldnames=file_fields, extrasaction='ignore')
+        if file_mode == 'w':
+            file_writer.writeheader()
+        file_writer.writerow(file_row)
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to run a cycle function on schedule (the first cycle starts immediately)
+def run_schedule(cycle_fx, cycle_interval=3600, cycle_offset=0, cycle_max=None, file_timing=None):
+
+    # Stop (at the end of the running cycle) on SIGTERM/SIGINT
+    cycle_stop = threading.Event()
+
+    def stop_schedule(signal_id, signal_frame):
+        logging.info(' ===> Schedule stop requested (signal ' + str(signal_id) + ')')
+        cycle_stop.set()
+
+    signal_handlers = {}
+    if threading.current_thread() is threading.main_thread():
+        for signal_id in [signal.SIGTERM, signal.SIGINT]:
+            signal_handlers[signal_id] = signal.signal(signal_id, stop_schedule)
+
+    try:
+        cycle_n = 0
+        while not cycle_stop.is_set():
+
+            cycle_time = datetime.now()
+            cycle_timer = CycleTimer()
+
+            logging.info(' ---> CYCLE ' + str(cycle_n + 1) + ' (' + str(cycle_time) + ') ... ')
+            try:
+                with cycle_timer.step('cycle'):
+                    cycle_fx(cycle_time, cycle_timer)
+                cycle_status = 'DONE'
+            except Exception as cycle_error:
+                logging.error(' ===> Cycle failed: ' + repr(cycle_error))
+                cycle_status = 'FAILED'
+            logging.info(' ---> CYCLE ' + str(cycle_n + 1) + ' (' + str(cycle_time) + ') ... ' + cycle_status +
+                         '. Timing -- ' + cycle_timer.summary())
+
+            if file_timing is not None:
+                try:
+                    write_cycle_timing(file_timing, cycle_time, cycle_status, cycle_timer.timing_obj)
+                except OSError as timing_error:
+                    logging.warning(' ===> Cycle timing file "' + file_timing + '" is not writable: ' +
+                                    str(timing_error))
+
+            cycle_n += 1
+            if (cycle_max is not None) and (cycle_n >= cycle_max):
+                break
+
+            cycle_next = compute_cycle_next(time.time(), cycle_interval, cycle_offset)
+            logging.info(' ---> Next cycle at ' + str(datetime.fromtimestamp(cycle_next)))
+            cycle_stop.wait(max(cycle_next - time.time(), 0))
+
+    finally:
+        for signal_id, signal_handler in signal_handlers.items():
+            signal.signal(signal_id, signal_handler)
+
+    return cycle_n
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to define the pipeline settings
+def define_pipeline(pipeline_dict=None, time_block_default=6, queue_size_default=2):
+
+    if pipeline_dict is None:
+        pipeline_dict = {}
+
+    if 'active' in list(pipeline_dict.keys()):
+        pipeline_active = pipeline_dict['active']
+    else:
+        pipeline_active = False
+    if 'time_block' in list(pipeline_dict.keys()):
+        time_block = pipeline_dict['time_block']
+    else:
+        time_block = time_block_default
+    if 'queue_size' in list(pipeline_dict.keys()):
+        queue_size = pipeline_dict['queue_size']
+    else:
+        queue_size = queue_size_default
+
+    if time_block is None or time_block <= 0:
+        logging.error(' ===> Pipeline time block must be greater than 0')
+        raise ValueError('Bad definition of pipeline time block')
+    if queue_size is None or queue_size <= 0:
+        logging.error(' ===> Pipeline queue size must be greater than 0')
+        raise ValueError('Bad definition of pipeline queue size')
+
+    return {'pipeline_active': pipeline_active, 'time_block': time_block, 'queue_size': queue_size}
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to run a producer (in a thread) and a consumer (in the caller) over a bounded queue
+def run_pipeline(item_list, produce_fx, consume_fx, queue_size=2):
+
+    item_queue = queue.Queue(maxsize=queue_size)
+    item_end = object()
+    item_stop = threading.Event()
+    item_error = []
+
+    # Put an item unless the consumer stopped (a full queue blocks the producer)
+    def put_item(item):
+        while not item_stop.is_set():
+            try:
+                item_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce_items():
+        try:
+            for item in item_list:
+                if item_stop.is_set():
+                    break
+                produce_fx(item)
+                if not put_item(item):
+                    break
+        except BaseException as producer_error:
+            item_error.append(producer_error)
+        finally:
+            put_item(item_end)
+
+    producer_thread = threading.Thread(target=produce_items, name='pipeline-producer', daemon=True)
+    producer_thread.start()
+
+    try:
+        while True:
+            item = item_queue.get()
+            if item is item_end:
+                break
+            consume_fx(item)
+    finally:
+        item_stop.set()
+        producer_thread.join()
+
+    if item_error:
+        raise item_error[0]
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to download (producer) and organize (consumer) the datasets of a driver by blocks of time steps
+def run_pipeline_data(driver_data, time_block=6, queue_size=2, cycle_timer=None):
+
+    if cycle_timer is None:
+        cycle_timer = CycleTimer()
+
+    time_range = driver_data.time_range
+    time_blocks = [time_range[time_id:time_id + time_block] for time_id in range(0, time_range.size, time_block)]
+
+    def download_block(time_steps):
+        with cycle_timer.step('download'):
+            driver_data.download_data(time_steps=time_steps)
+
+    def organize_block(time_steps):
+        with cycle_timer.step('organize'):
+            driver_data.organize_data(time_steps=time_steps)
+
+    run_pipeline(time_blocks, download_block, organize_block, queue_size=queue_size)
+
+    return cycle_timer
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to define the work scheduler settings (priority order and run deadline)
+def define_work_scheduler(scheduler_dict=None, time_block_default=6, backlog_period_default=48):
+
+    if scheduler_dict is None:
+        scheduler_dict = {}
+
+    if 'active' in list(scheduler_dict.keys()):
+        scheduler_active = scheduler_dict['active']
+    else:
+        scheduler_active = False
+    if 'deadline' in list(scheduler_dict.keys()):
+        time_deadline = scheduler_dict['deadline']
+    else:
+        time_deadline = None
+    if 'time_block' in list(scheduler_dict.keys()):
+        time_block = scheduler_dict['time_block']
+    else:
+        time_block = time_block_default
+    if 'file_backlog' in list(scheduler_dict.keys()):
+        file_backlog = scheduler_dict['file_backlog']
+    else:
+        file_backlog = None
+    if 'backlog_period' in list(scheduler_dict.keys()):
+        backlog_period = scheduler_dict['backlog_period']
+    else:
+        backlog_period = backlog_period_default
+
+    if time_deadline is not None and time_deadline <= 0:
+        logging.error(' ===> Scheduler deadline must be greater than 0')
+        raise ValueError('Bad definition of scheduler deadline')
+    if time_block is None or time_block <= 0:
+        logging.error(' ===> Scheduler time block must be greater than 0')
+        raise ValueError('Bad definition of scheduler time block')
+
+    return {'scheduler_active': scheduler_active, 'time_deadline': time_deadline, 'time_block': time_block,
+            'file_backlog': file_backlog, 'backlog_period': backlog_period}
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to order the work items (variable, time) by variable priority and then most recent first
+def plan_work_items(time_steps, variable_dict, work_backlog=None):
+
+    var_list = [var_name for var_name, var_fields in variable_dict.items()
+                if ('download' not in list(var_fields.keys())) or var_fields['download']]
+
+    work_items = set([(var_name, pd.Timestamp(time_step)) for var_name in var_list for time_step in time_steps])
+    if work_backlog is not None:
+        work_items.update([(var_name, time_step) for var_name, time_step in work_backlog if var_name in var_list])
+
+    # Lower values run first (default priority is 0); variables with the same priority are interleaved by time
+    var_priority, var_order = {}, {}
+    for var_id, (var_name, var_fields) in enumerate(variable_dict.items()):
+        if 'priority' in list(var_fields.keys()):
+            var_priority[var_name] = var_fields['priority']
+        else:
+            var_priority[var_name] = 0
+        var_order[var_name] = var_id
+
+    return sorted(work_items, key=lambda work_item: (
+        var_priority[work_item[0]], -work_item[1].value, var_order[work_item[0]]))
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to group the ordered work items in rounds (same variables for up to time block consecutive items)
+def group_work_rounds(work_items, time_block=6):
+
+    # Variables of each time step (keeping the items order)
+    work_steps = []
+    for var_name, time_step in work_items:
+        if work_steps and work_steps[-1][1] == time_step:
+            work_steps[-1][0].append(var_name)
+        else:
+            work_steps.append([[var_name], time_step])
+
+    work_rounds = []
+    for var_list, time_step in work_steps:
+        if work_rounds and work_rounds[-1][0] == var_list and len(work_rounds[-1][1]) < time_block:
+            work_rounds[-1][1].append(time_step)
+        else:
+            work_rounds.append([var_list, [time_step]])
+
+    return work_rounds
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to run the work rounds until the deadline (the remaining work items are deferred)
+def run_work_rounds(work_rounds, round_fx, time_deadline=None):
+
+    # The stop time is passed to each round (the time steps not run by the round are returned and deferred)
+    if time_deadline is not None:
+        time_stop = time.time() + time_deadline
+    else:
+        time_stop = None
+
+    work_deferred = []
+    for round_id, (var_list, time_steps) in enumerate(work_rounds):
+
+        if (time_stop is not None) and (time.time() >= time_stop):
+            time_steps_deferred = time_steps
+        else:
+            logging.info(' ---> Work round ' + str(round_id + 1) + '/' + str(len(work_rounds)) + ' (' +
+                         ', '.join(var_list) + ' :: ' + str(max(time_steps)) + ' - ' + str(min(time_steps)) +
+                         ') ... ')
+            time_steps_deferred = round_fx(var_list, time_steps, time_stop)
+            logging.info(' ---> Work round ' + str(round_id + 1) + '/' + str(len(work_rounds)) + ' ... DONE')
+
+        if time_steps_deferred:
+            work_deferred = [(var_name, time_step) for time_step in time_steps_deferred for var_name in var_list]
+            work_deferred += [(var_name, time_step)
+                              for var_list_round, time_steps_round in work_rounds[round_id + 1:]
+                              for time_step in time_steps_round for var_name in var_list_round]
+            logging.warning(' ===> Scheduler deadline reached. Work items deferred to the next cycle: ' +
+                            str(len(work_deferred)))
+            break
+
+    return work_deferred
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to download and organize the time steps of a work round (the stop time is checked for each time step)
+def run_round_data(driver_data, time_steps, time_stop=None, cycle_timer=None):
+
+    if cycle_timer is None:
+        cycle_timer = CycleTimer()
+
+    if time_stop is None:
+        with cycle_timer.step('download'):
+            driver_data.download_data()
+        with cycle_timer.step('organize'):
+            driver_data.organize_data()
+        return []
+
+    for step_id, time_step in enumerate(time_steps):
+        if time.time() >= time_stop:
+            return list(time_steps[step_id:])
+        with cycle_timer.step('download'):
+            driver_data.download_data(time_steps=[time_step])
+        with cycle_timer.step('organize'):
+            driver_data.organize_data(time_steps=[time_step])
+
+    return []
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to read the work backlog (items deferred by the previous cycles, if not expired)
+def read_work_backlog(file_name, time_reference, backlog_period=48, time_frequency='H'):
+
+    if (file_name is None) or (not os.path.exists(file_name)):
+        return []
+
+    with open(file_name, 'r') as file_handle:
+        backlog_list = json.load(file_handle)
+
+    time_expired = pd.Timestamp(time_reference) - pd.Timedelta(
+        pd.tseries.frequencies.to_offset(time_frequency)) * backlog_period
+
+    work_backlog = []
+    for backlog_item in backlog_list:
+        time_step = pd.Timestamp(backlog_item['time'])
+        if time_step > time_expired:
+            work_backlog.append((backlog_item['variable'], time_step))
+
+    logging.info(' ---> Work backlog: ' + str(len(work_backlog)) + ' item(s) (expired: ' +
+                 str(len(backlog_list) - len(work_backlog)) + ')')
+
+    return work_backlog
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to write the work backlog (replaced at each cycle)
+def write_work_backlog(file_name, work_deferred, time_format='%Y-%m-%d %H:%M'):
+
+    if file_name is None:
+        if work_deferred:
+            logging.warning(' ===> Work backlog file is not defined. Deferred items are not saved')
+        return
+
+    folder_name = os.path.dirname(file_name)
+    if folder_name != '':
+        os.makedirs(folder_name, exist_ok=True)
+
+    backlog_list = [{'variable': var_name, 'time': time_step.strftime(time_format)}
+                    for var_name, time_step in work_deferred]
+
+    file_name_tmp = file_name + '.tmp'
+    with open(file_name_tmp, 'w') as file_handle:
+        json.dump(backlog_list, file_handle, indent=2)
+    os.replace(file_name_tmp, file_name)
+# -------------------------------------------------------------------------------------
@@ -2,16 +2,20 @@
 # Libraries
 import logging
 import os
+import threading
 
 import pandas as pd
 
 from copy import deepcopy
 
 from ground_network.odbc.lib_utils_io import write_file_csv, write_obj, read_obj
-from ground_network.odbc.lib_utils_system import fill_tags2string, make_folder, get_root_path, list_folder
+from ground_network.odbc.lib_utils_system import fill_tags2string_range, get_root_path, list_folder, FileIndex
+from ground_network.odbc.lib_utils_store import read_store_index, write_store, export_store
 
 from ground_network.odbc.lib_utils_db_sirmip import define_db_settings, get_db_credential, \
-    parse_query_time, get_data_ws, organize_data_ws, order_data
+    parse_query_time, parse_query_window, get_data_ws, split_data_ws, split_data_ws_by_variable, \
+    organize_data_ws, organize_data_ws_window, accumulate_data_ws, order_data
+from ground_network.odbc.lib_utils_db_async import run_requests
 # -------------------------------------------------------------------------------------
 
 
@@ -21,7 +25,8 @@ class DriverData:
 
     def __init__(self, time_step, src_dict=None, ancillary_dict=None, dst_dict=None,
                  time_dict=None, variable_dict=None, template_dict=None, info_dict=None,
-                 flag_updating_ancillary=True, flag_updating_destination=True, flag_cleaning_tmp=True):
+                 flag_updating_ancillary=True, flag_updating_destination=True, flag_cleaning_tmp=True,
+                 db_pool=None, file_index=None, time_range=None, time_lookback=0, db_async=None):
 
         self.time_step = time_step
 
@@ -36,14 +41,35 @@ class DriverData:
         self.tag_file_name = 'file_name'
 
         self.tag_file_fields = 'fields'
+        self.tag_file_active = 'active'
+        self.tag_store = 'store'
+        self.tag_store_csv = 'export_csv'
+        self.tag_query_mode = 'query_mode'
+        self.tag_query_group = 'query_group'
+        self.tag_organize_mode = 'organize_mode'
+        self.tag_accumulations = 'accumulations'
+        self.tag_accumulations_coverage = 'accumulations_coverage'
 
         self.domain_name = info_dict['domain']
         self.variable_list = list(self.variable_dict.keys())
 
-        self.time_range = self.collect_file_time()
+        self.time_range = self.collect_file_time(time_range=time_range)
+        self.time_lookback = time_lookback
 
-        self.db_info = self.collect_db_settings(self.src_dict)
-        self.db_settings = define_db_settings(self.db_info)
+        self.db_async = db_async
+        self.db_pool = db_pool
+        if self.db_pool is None:
+            self.db_info = self.collect_db_settings(self.src_dict)
+            self.db_settings = define_db_settings(self.db_info)
+        else:
+            self.db_settings = self.db_pool.db_settings
+
+        self.file_index = file_index
+        if self.file_index is None:
+            self.file_index = FileIndex()
+
+        self.query_mode = self.collect_query_mode(self.src_dict)
+        self.query_group = self.collect_query_group(self.src_dict)
 
         self.folder_name_anc_dset_raw = self.ancillary_dict[self.tag_folder_name]
         self.file_name_anc_dset_raw = self.ancillary_dict[self.tag_file_name]
@@ -52,8 +78,16 @@ class DriverData:
         self.folder_name_dst_dset_raw = self.dst_dict[self.tag_folder_name]
         self.file_name_dst_dset_raw = self.dst_dict[self.tag_file_name]
         self.file_path_dst_dset_obj = self.collect_file_list(self.folder_name_dst_dset_raw, self.file_name_dst_dset_raw)
+        self.file_path_dst_derived_obj = self.collect_file_list_derived(
+            self.folder_name_dst_dset_raw, self.file_name_dst_dset_raw)
 
         self.file_fields_dst_dset = self.dst_dict[self.tag_file_fields]
+        self.organize_mode = self.collect_organize_mode(self.dst_dict)
+
+        self.file_active_dst_store, self.file_export_dst_csv, self.file_path_dst_store_obj = \
+            self.collect_file_store(self.dst_dict)
+        self.file_index_dst_store, self.file_data_dst_store = {}, {}
+        self.lock_dst_store = threading.Lock()
 
         self.flag_updating_ancillary = flag_updating_ancillary
         self.flag_updating_destination = flag_updating_destination
@@ -110,9 +144,57 @@ class DriverData:
         return db_info_upd
     # -------------------------------------------------------------------------------------
 
+    # -------------------------------------------------------------------------------------
+    # Method to collect query mode
+    def collect_query_mode(self, db_info, query_mode_default='hourly'):
+
+        if self.tag_query_mode in list(db_info.keys()):
+            query_mode = db_info[self.tag_query_mode]
+        else:
+            query_mode = query_mode_default
+
+        if query_mode not in ['hourly', 'window']:
+            logging.error(' ===> Query mode "' + str(query_mode) + '" is not allowed')
+            raise NotImplementedError('Query mode not implemented yet')
+
+        return query_mode
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to collect query group flag (all the variables in a single query)
+    def collect_query_group(self, db_info, query_group_default=False):
+
+        if self.tag_query_group in list(db_info.keys()):
+            query_group = db_info[self.tag_query_group]
+        else:
+            query_group = query_group_default
+
+        return query_group
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to collect organize mode
+    def collect_organize_mode(self, dst_info, organize_mode_default='hourly'):
+
+        if self.tag_organize_mode in list(dst_info.keys()):
+            organize_mode = dst_info[self.tag_organize_mode]
+        else:
+            organize_mode = organize_mode_default
+
+        if organize_mode not in ['hourly', 'window']:
+            logging.error(' ===> Organize mode "' + str(organize_mode) + '" is not allowed')
+            raise NotImplementedError('Organize mode not implemented yet')
+
+        return organize_mode
+    # -------------------------------------------------------------------------------------
+
     # -------------------------------------------------------------------------------------
     # Method to collect time(s)
-    def collect_file_time(self):
+    def collect_file_time(self, time_range=None):
+
+        if time_range is not None:
+            # Time range planned by the caller (e.g. union of run windows or backfill chunk)
+            return pd.DatetimeIndex(time_range).sort_values()
 
         time_period = self.time_dict["time_period"]
         time_frequency = self.time_dict["time_frequency"]
@@ -129,40 +211,70 @@ class DriverData:
     # Method to collect ancillary file
     def collect_file_list(self, folder_name_raw, file_name_raw):
 
-        domain_name = self.domain_name
-
         file_name_obj = {}
         for variable_step in self.variable_list:
             variable_tag = self.variable_dict[variable_step]['tag']
 
             if variable_tag is not None:
-                file_name_list = []
-                for datetime_step in self.time_range:
+                file_name_obj[variable_step] = self.collect_file_path(folder_name_raw, file_name_raw, variable_step)
 
-                    template_values_step = {
-                        'domain_name': domain_name,
-                        'ancillary_var_name': variable_step,
-                        'destination_var_name': variable_step,
-                        'ancillary_datetime': datetime_step, 'ancillary_sub_path_time': datetime_step,
-                        'destination_datetime': datetime_step, 'destination_sub_path_time': datetime_step}
+        return file_name_obj
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to collect derived (accumulated over n hours) destination file
+    def collect_file_list_derived(self, folder_name_raw, file_name_raw):
+
+        file_name_obj = {}
+        for variable_step in self.variable_list:
+            variable_fields = self.variable_dict[variable_step]
 
-                    folder_name_def = fill_tags2string(
-                        folder_name_raw, self.template_dict, template_values_step)
-                    file_name_def = fill_tags2string(
-                        file_name_raw, self.template_dict, template_values_step)
-                    file_path_def = os.path.join(folder_name_def, file_name_def)
+            if (variable_fields['tag'] is not None) and (self.tag_accumulations in list(variable_fields.keys())):
 
-                    file_name_list.append(file_path_def)
+                if variable_fields['type'] != 'accumulated':
+                    logging.error(' ===> Accumulations are allowed only for accumulated variables')
+                    raise NotImplementedError('Accumulations of "' + variable_fields['type'] +
+                                              '" variables not implemented yet')
 
-                file_name_obj[variable_step] = file_name_list
+                file_name_obj[variable_step] = {}
+                for variable_duration in variable_fields[self.tag_accumulations]:
+                    variable_name = variable_step + '_' + str(variable_duration) + 'h'
+                    file_name_obj[variable_step][variable_duration] = self.collect_file_path(
+                        folder_name_raw, file_name_raw, variable_name)
 
         return file_name_obj
 
     # -------------------------------------------------------------------------------------
 
     # -------------------------------------------------------------------------------------
-    # Method to download datasets
-    def download_data(self):
+    # Method to fill file path over the time range
+    def collect_file_path(self, folder_name_raw, file_name_raw, variable_name, time_range=None):
+
+        if time_range is None:
+            time_range = self.time_range
+
+        template_values = {
+            'domain_name': self.domain_name,
+            'ancillary_var_name': variable_name,
+            'destination_var_name': variable_name,
+            'ancillary_datetime': time_range, 'ancillary_sub_path_time': time_range,
+            'destination_datetime': time_range, 'destination_sub_path_time': time_range,
+            'destination_store_datetime': time_range}
+
+        folder_name_list = fill_tags2string_range(folder_name_raw, self.template_dict, template_values, time_range)
+        file_name_list = fill_tags2string_range(file_name_raw, self.template_dict, template_values, time_range)
+
+        file_path_list = [os.path.join(folder_name_def, file_name_def)
+                          for folder_name_def, file_name_def in zip(folder_name_list, file_name_list)]
+
+        return file_path_list
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to download datasets (all the time steps or a subset of them)
+    def download_data(self, time_steps=None):
 
         logging.info(' ----> Download datasets ... ')
 
@@ -174,6 +286,7 @@ class DriverData:
         flag_upd_anc = self.flag_updating_ancillary
         flag_upd_dst = self.flag_updating_destination
 
+        download_obj, download_tag, download_async = {}, {}, []
         for var_name, var_fields in var_dict.items():
 
             logging.info(' -----> Variable ' + var_name + ' ... ')
@@ -188,40 +301,73 @@ class DriverData:
 
                 if var_download:
 
+                    time_window_list, file_path_window_list = [], []
                     for time_step, file_path_anc_step, file_path_dst_step in zip(
                             time_range, file_path_anc_list, file_path_dst_list):
 
+                        if (time_steps is not None) and (time_step not in time_steps):
+                            continue
+
                         logging.info(' ------> Time Step ' + str(time_step) + ' ... ')
 
                         folder_name_anc_step, file_name_anc_step = os.path.split(file_path_anc_step)
-                        make_folder(folder_name_anc_step)
+                        self.file_index.make_folder(folder_name_anc_step)
 
                         if flag_upd_anc:
-                            if os.path.exists(file_path_anc_step):
-                                os.remove(file_path_anc_step)
+                            if self.file_index.exists(file_path_anc_step):
+                                self.file_index.remove(file_path_anc_step)
 
                         if flag_upd_dst:
-                            if os.path.exists(file_path_dst_step):
-                                os.remove(file_path_dst_step)
+                            if self.file_index.exists(file_path_dst_step):
+                                self.file_index.remove(file_path_dst_step)
+
+                        file_exists_dst_step = self.check_file_dst(var_name, time_step, file_path_dst_step)
 
-                        if (not os.path.exists(file_path_anc_step)) and (not os.path.exists(file_path_dst_step)):
+                        if (not self.file_index.exists(file_path_anc_step)) and (not file_exists_dst_step):
+
+                            if (self.query_mode == 'window') or self.query_group:
+                                time_window_list.append(time_step)
+                                file_path_window_list.append(file_path_anc_step)
+                                logging.info(' ------> Time Step ' + str(time_step) +
+                                             ' ... DELAYED. Datasets will be downloaded by a ' +
+                                             self.query_mode + ' query.')
+                                continue
+
+                            if self.db_async is not None:
+                                download_async.append([var_tag, time_step, file_path_anc_step])
+                                logging.info(' ------> Time Step ' + str(time_step) +
+                                             ' ... DELAYED. Datasets will be downloaded by an async query.')
+                                continue
 
                             time_from, time_to = parse_query_time(time_step)
-                            var_data = get_data_ws(var_tag, time_from, time_to, self.db_settings, flag_type='automatic')
+                            var_data = get_data_ws(var_tag, time_from, time_to, self.db_settings,
+                                                   flag_type='automatic', db_pool=self.db_pool)
                             write_obj(file_path_anc_step, var_data)
+                            self.file_index.add(file_path_anc_step)
 
                             logging.info(' ------> Time Step ' + str(time_step) + ' ... DONE')
 
-                        elif (os.path.exists(file_path_anc_step)) and (not os.path.exists(file_path_dst_step)):
+                        elif (self.file_index.exists(file_path_anc_step)) and (not file_exists_dst_step):
                             logging.info(' ------> Time Step ' + str(time_step) +
                                          ' ... SKIPPED. Ancillary file always exists.')
-                        elif (not os.path.exists(file_path_anc_step)) and (os.path.exists(file_path_dst_step)):
+                        elif (not self.file_index.exists(file_path_anc_step)) and file_exists_dst_step:
                             logging.info(' ------> Time Step ' + str(time_step) +
                                          ' ... SKIPPED. Destination file always exists.')
+                        elif self.file_index.exists(file_path_anc_step) and file_exists_dst_step:
+                            # Ancillary file kept by the previous run for the accumulations
+                            logging.info(' ------> Time Step ' + str(time_step) +
+                                         ' ... SKIPPED. Ancillary and destination files always exist.')
                         else:
                             logging.error(' ===> Bad file multiple condition')
                             raise NotImplemented("File multiple condition not implemented yet")
 
+                    if time_window_list:
+                        if self.query_group:
+                            download_obj[var_name] = [time_window_list, file_path_window_list]
+                            download_tag[var_name] = var_tag
+                        else:
+                            self.download_data_window(var_tag, time_window_list, file_path_window_list)
+
                     logging.info(' -----> Variable ' + var_name + ' ... DONE')
 
                 else:
@@ -233,13 +379,244 @@ class DriverData:
 
                 logging.info(' -----> Variable ' + var_name + ' ... SKIPPED. Variable tag is null.')
 
+        if download_obj:
+            self.download_data_group(download_obj, download_tag)
+        if download_async:
+            self.download_data_async(download_async)
+
         logging.info(' ----> Download datasets ... DONE')
 
     # -------------------------------------------------------------------------------------
 
     # -------------------------------------------------------------------------------------
-    # Method to organize datasets
-    def organize_data(self):
+    # Method to download datasets using a single query over the time window
+    def download_data_window(self, var_tag, time_window, file_path_window):
+
+        time_window_start, time_window_end = min(time_window), max(time_window)
+
+        logging.info(' ------> Time Window ' + str(time_window_start) + ' :: ' + str(time_window_end) + ' ... ')
+
+        time_from, time_to = parse_query_window(time_window)
+        var_data = get_data_ws(var_tag, time_from, time_to, self.db_settings,
+                               flag_type='automatic', db_pool=self.db_pool)
+
+        var_data_obj = split_data_ws(var_data, time_window)
+        for time_step, file_path_anc_step in zip(time_window, file_path_window):
+            write_obj(file_path_anc_step, var_data_obj[time_step])
+            self.file_index.add(file_path_anc_step)
+
+        logging.info(' ------> Time Window ' + str(time_window_start) + ' :: ' + str(time_window_end) +
+                     ' ... DONE. Rows: ' + str(len(var_data)))
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to download datasets using concurrent hourly queries (async front-end)
+    def download_data_async(self, download_async):
+
+        logging.info(' -----> Async queries (' + str(len(download_async)) + ') ... ')
+
+        request_list = []
+        for var_tag, time_step, file_path_anc_step in download_async:
+            time_from, time_to = parse_query_time(time_step)
+            request_list.append([self.db_async, get_data_ws, (var_tag, time_from, time_to, self.db_settings),
+                                 {'flag_type': 'automatic', 'db_pool': self.db_pool}])
+        result_list = run_requests(request_list)
+
+        # Failed (or timed out) requests are retried by a blocking query (errors are raised as in the hourly mode)
+        request_failed = 0
+        for (var_tag, time_step, file_path_anc_step), var_data in zip(download_async, result_list):
+            if isinstance(var_data, BaseException):
+                request_failed += 1
+                logging.warning(' ===> Variable ' + var_tag + ' at time step ' + str(time_step) +
+                                ' failed by async query (' + repr(var_data) + '). Retry by blocking query')
+                time_from, time_to = parse_query_time(time_step)
+                var_data = get_data_ws(var_tag, time_from, time_to, self.db_settings,
+                                       flag_type='automatic', db_pool=self.db_pool)
+            write_obj(file_path_anc_step, var_data)
+            self.file_index.add(file_path_anc_step)
+
+        logging.info(' -----> Async queries (' + str(len(download_async)) + ') ... DONE. Retried: ' +
+                     str(request_failed))
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to download datasets of all the variables using a single query for each time window
+    def download_data_group(self, download_obj, download_tag):
+
+        var_name_list = list(download_obj.keys())
+
+        logging.info(' -----> Variable(s) ' + ', '.join(var_name_list) + ' ... ')
+
+        time_steps = sorted(set([time_step for time_list, file_list in download_obj.values()
+                                 for time_step in time_list]))
+        if self.query_mode == 'window':
+            time_windows = [time_steps]
+        else:
+            time_windows = [[time_step] for time_step in time_steps]
+
+        for time_window in time_windows:
+
+            time_window_start, time_window_end = min(time_window), max(time_window)
+            logging.info(' ------> Time Window ' + str(time_window_start) + ' :: ' + str(time_window_end) + ' ... ')
+
+            # Variables sharing a sensor tag are queried once
+            var_name_window = [var_name for var_name in var_name_list
+                               if any(time_step in time_window for time_step in download_obj[var_name][0])]
+            var_tag_window = list(dict.fromkeys([download_tag[var_name] for var_name in var_name_window]))
+
+            time_from, time_to = parse_query_window(time_window)
+            var_data = get_data_ws(var_tag_window, time_from, time_to, self.db_settings,
+                                   flag_type='automatic', db_pool=self.db_pool)
+
+            var_data_obj = split_data_ws_by_variable(var_data, var_tag_window)
+            for var_name in var_name_window:
+                time_list, file_path_list = download_obj[var_name]
+                var_data_split = split_data_ws(var_data_obj[download_tag[var_name]], time_window)
+                for time_step, file_path_anc_step in zip(time_list, file_path_list):
+                    if time_step in var_data_split:
+                        write_obj(file_path_anc_step, var_data_split[time_step])
+                        self.file_index.add(file_path_anc_step)
+
+            logging.info(' ------> Time Window ' + str(time_window_start) + ' :: ' + str(time_window_end) +
+                         ' ... DONE. Rows: ' + str(len(var_data)))
+
+        logging.info(' -----> Variable(s) ' + ', '.join(var_name_list) + ' ... DONE')
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to collect store (consolidated destination file per day) information
+    def collect_file_store(self, dst_info):
+
+        file_active_store, file_export_csv, file_path_store_obj = False, True, None
+        if self.tag_store in list(dst_info.keys()):
+
+            store_info = dst_info[self.tag_store]
+            if self.tag_file_active in list(store_info.keys()):
+                file_active_store = store_info[self.tag_file_active]
+            else:
+                file_active_store = True
+            if self.tag_store_csv in list(store_info.keys()):
+                file_export_csv = store_info[self.tag_store_csv]
+
+            if file_active_store:
+                file_path_store_obj = self.collect_file_list(
+                    store_info[self.tag_folder_name], store_info[self.tag_file_name])
+            else:
+                file_export_csv = True
+
+        return file_active_store, file_export_csv, file_path_store_obj
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to check destination file (or time step in the store file)
+    def check_file_dst(self, var_name, time_step, file_path_dst_step):
+
+        if self.file_index.exists(file_path_dst_step):
+            return True
+
+        if self.file_active_dst_store and (not self.flag_updating_destination):
+            file_path_store_step = self.file_path_dst_store_obj[var_name][self.time_range.get_loc(time_step)]
+            with self.lock_dst_store:
+                if file_path_store_step not in list(self.file_index_dst_store.keys()):
+                    self.file_index_dst_store[file_path_store_step] = set()
+                    if self.file_index.exists(file_path_store_step):
+                        self.file_index_dst_store[file_path_store_step] = set(read_store_index(file_path_store_step))
+                return time_step in self.file_index_dst_store[file_path_store_step]
+
+        return False
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to write destination file (and/or collect time step for the store file)
+    def write_file_dst(self, var_name, time_step, file_path_dst_step, var_df):
+
+        if self.file_export_dst_csv:
+            folder_name_dst_dset, file_name_dst_dset = os.path.split(file_path_dst_step)
+            self.file_index.make_folder(folder_name_dst_dset)
+
+            write_file_csv(file_path_dst_step, var_df)
+            self.file_index.add(file_path_dst_step)
+
+        if self.file_active_dst_store:
+            file_path_store_step = self.file_path_dst_store_obj[var_name][self.time_range.get_loc(time_step)]
+            with self.lock_dst_store:
+                if file_path_store_step not in list(self.file_data_dst_store.keys()):
+                    self.file_data_dst_store[file_path_store_step] = {}
+                self.file_data_dst_store[file_path_store_step][time_step] = var_df
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to dump the collected time steps in the store file(s) (one write for each file)
+    def dump_file_store(self):
+
+        # Store index and data are shared with the download stage of the pipeline (see run_pipeline_data)
+        with self.lock_dst_store:
+            file_data_dst_store, self.file_data_dst_store = self.file_data_dst_store, {}
+
+        for file_path_store, file_data_store in file_data_dst_store.items():
+
+            logging.info(' -----> Store ' + file_path_store + ' ... ')
+
+            folder_name_store, file_name_store = os.path.split(file_path_store)
+            self.file_index.make_folder(folder_name_store)
+
+            write_store(file_path_store, file_data_store)
+            self.file_index.add(file_path_store)
+
+            with self.lock_dst_store:
+                if file_path_store in list(self.file_index_dst_store.keys()):
+                    self.file_index_dst_store[file_path_store].update(file_data_store.keys())
+
+            logging.info(' -----> Store ' + file_path_store + ' ... DONE. Time steps: ' +
+                         str(len(file_data_store)))
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to export destination file(s) from the store file(s)
+    def export_data(self):
+
+        logging.info(' ----> Export datasets ... ')
+
+        if not self.file_active_dst_store:
+            logging.info(' ----> Export datasets ... SKIPPED. Store is not activated.')
+            return
+
+        for var_name, file_path_dst_list in self.file_path_dst_dset_obj.items():
+
+            logging.info(' -----> Variable ' + var_name + ' ... ')
+
+            file_path_store_list = self.file_path_dst_store_obj[var_name]
+            for time_step, file_path_dst_step, file_path_store_step in zip(
+                    self.time_range, file_path_dst_list, file_path_store_list):
+
+                if not self.file_index.exists(file_path_store_step):
+                    continue
+                if self.file_index.exists(file_path_dst_step) and (not self.flag_updating_destination):
+                    continue
+
+                folder_name_dst_step, file_name_dst_step = os.path.split(file_path_dst_step)
+                self.file_index.make_folder(folder_name_dst_step)
+
+                if export_store(file_path_store_step, time_step, file_path_dst_step):
+                    self.file_index.add(file_path_dst_step)
+                    logging.info(' ------> Time Step ' + str(time_step) + ' ... DONE')
+
+            logging.info(' -----> Variable ' + var_name + ' ... DONE')
+
+        logging.info(' ----> Export datasets ... DONE')
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to organize datasets (all the time steps or a subset of them)
+    def organize_data(self, time_steps=None):
 
         logging.info(' ----> Organize datasets ... ')
 
@@ -268,30 +645,41 @@ class DriverData:
                 file_path_anc_list = file_path_anc_obj[var_name]
                 file_path_dst_list = file_path_dst_obj[var_name]
 
+                var_data_window, file_path_dst_window = {}, {}
                 for time_step, file_path_anc_step, file_path_dst_step in zip(
                         time_range, file_path_anc_list, file_path_dst_list):
 
+                    if (time_steps is not None) and (time_step not in time_steps):
+                        continue
+
                     logging.info(' ------> Time Step ' + str(time_step) + ' ... ')
 
                     if flag_upd_dst:
-                        if os.path.exists(file_path_dst_step):
-                            os.remove(file_path_dst_step)
+                        if self.file_index.exists(file_path_dst_step):
+                            self.file_index.remove(file_path_dst_step)
 
-                    if (os.path.exists(file_path_anc_step)) and (not os.path.exists(file_path_dst_step)):
+                    file_exists_dst_step = self.check_file_dst(var_name, time_step, file_path_dst_step)
+
+                    if (self.file_index.exists(file_path_anc_step)) and (not file_exists_dst_step):
 
                         var_data = read_obj(file_path_anc_step)
 
-                        if var_data.__len__() > 0:
+                        if (var_data.__len__() > 0) and (self.organize_mode == 'window'):
+
+                            var_data_window[time_step] = var_data
+                            file_path_dst_window[time_step] = file_path_dst_step
+
+                            logging.info(' ------> Time Step ' + str(time_step) +
+                                         ' ... DELAYED. Datasets will be organized over the time window.')
+
+                        elif var_data.__len__() > 0:
                             var_df = organize_data_ws(var_data, data_type=var_type,
                                                       data_scale_factor=var_scale_factor, data_min_count=var_min_count,
                                                       data_units=var_units, data_valid_range=var_valid_range)
 
                             var_df = order_data(var_df, var_fields_expected)
 
-                            folder_name_dst_dset, file_name_dst_dset = os.path.split(file_path_dst_step)
-                            make_folder(folder_name_dst_dset)
-
-                            write_file_csv(file_path_dst_step, var_df)
+                            self.write_file_dst(var_name, time_step, file_path_dst_step, var_df)
 
                             logging.info(' ------> Time Step ' + str(time_step) + ' ... DONE')
 
@@ -300,23 +688,151 @@ class DriverData:
                             logging.info(' ------> Time Step ' + str(time_step) + ' ... FAILED. ')
                             logging.warning(' ===> Data downloaded from database source service is null.')
 
-                    elif (not os.path.exists(file_path_anc_step)) and (os.path.exists(file_path_dst_step)):
+                    elif (not self.file_index.exists(file_path_anc_step)) and file_exists_dst_step:
                         logging.info(' ------> Time Step ' + str(time_step) +
                                      ' ... SKIPPED. Destination file always exists.')
-                    elif (not os.path.exists(file_path_anc_step)) and (not os.path.exists(file_path_dst_step)):
+                    elif (not self.file_index.exists(file_path_anc_step)) and (not file_exists_dst_step):
                         logging.info(' ------> Time Step ' + str(time_step) +
                                      ' ... SKIPPED. Variable is not activated.')
 
+                if var_data_window:
+                    self.organize_data_window(var_name, var_data_window, file_path_dst_window, var_fields)
+
                 logging.info(' -----> Variable ' + var_name + ' ... DONE')
 
             else:
 
                 logging.info(' -----> Variable ' + var_name + ' ... SKIPPED. Variable tag is null.')
 
+        if self.file_data_dst_store:
+            self.dump_file_store()
+
         logging.info(' ----> Organize datasets ... DONE')
 
     # -------------------------------------------------------------------------------------
 
+    # -------------------------------------------------------------------------------------
+    # Method to organize datasets over the time window (single aggregation)
+    def organize_data_window(self, var_name, var_data_window, file_path_dst_window, var_fields):
+
+        time_window = list(var_data_window.keys())
+        time_window_start, time_window_end = min(time_window), max(time_window)
+
+        logging.info(' ------> Time Window ' + str(time_window_start) + ' :: ' + str(time_window_end) + ' ... ')
+
+        var_df_window = organize_data_ws_window(
+            var_data_window, data_type=var_fields['type'],
+            data_scale_factor=var_fields['scale_factor'], data_min_count=var_fields['min_count'],
+            data_units=var_fields['units'], data_valid_range=var_fields['valid_range'])
+
+        for time_step, var_df in var_df_window.items():
+
+            var_df = order_data(var_df, self.file_fields_dst_dset)
+
+            self.write_file_dst(var_name, time_step, file_path_dst_window[time_step], var_df)
+
+            logging.info(' ------> Time Step ' + str(time_step) + ' ... DONE')
+
+        logging.info(' ------> Time Window ' + str(time_window_start) + ' :: ' + str(time_window_end) + ' ... DONE')
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to derive datasets (accumulations over n hours) from the hourly ancillary datasets
+    def derive_data(self):
+
+        logging.info(' ----> Derive datasets ... ')
+
+        time_range = self.time_range
+        file_path_anc_obj = self.file_path_anc_dset_obj
+        file_path_derived_obj = self.file_path_dst_derived_obj
+
+        var_dict = self.variable_dict
+        var_fields_expected = self.file_fields_dst_dset
+
+        flag_upd_dst = self.flag_updating_destination
+
+        for var_name, file_path_derived_var in file_path_derived_obj.items():
+
+            logging.info(' -----> Variable ' + var_name + ' ... ')
+
+            var_fields = var_dict[var_name]
+
+            if flag_upd_dst:
+                for file_path_derived_list in file_path_derived_var.values():
+                    for file_path_derived_step in file_path_derived_list:
+                        if self.file_index.exists(file_path_derived_step):
+                            self.file_index.remove(file_path_derived_step)
+
+            file_path_derived_missing = [
+                file_path_derived_step for file_path_derived_list in file_path_derived_var.values()
+                for file_path_derived_step in file_path_derived_list
+                if not self.file_index.exists(file_path_derived_step)]
+            if not file_path_derived_missing:
+                logging.info(' -----> Variable ' + var_name + ' ... SKIPPED. Destination files always exist.')
+                continue
+
+            # Hourly datasets are read from the ancillary files (no further queries to the database)
+            time_range_anc, file_path_anc_list = time_range, file_path_anc_obj[var_name]
+            if self.time_lookback > 0:
+                # Hours before the time range (if still available) complete the first accumulation windows
+                time_range_lookback = pd.date_range(
+                    end=time_range[0] - pd.Timedelta(hours=1), periods=self.time_lookback, freq='H')
+                file_path_lookback = self.collect_file_path(
+                    self.folder_name_anc_dset_raw, self.file_name_anc_dset_raw, var_name,
+                    time_range=time_range_lookback)
+                time_range_anc = time_range_lookback.append(time_range)
+                file_path_anc_list = file_path_lookback + file_path_anc_list
+
+            var_data_window = {}
+            for time_step, file_path_anc_step in zip(time_range_anc, file_path_anc_list):
+                if self.file_index.exists(file_path_anc_step):
+                    var_data_window[time_step] = read_obj(file_path_anc_step)
+
+            if not var_data_window:
+                logging.info(' -----> Variable ' + var_name + ' ... SKIPPED. Ancillary files are not available.')
+                continue
+
+            # Ratio of the valid hours needed by an accumulation (all the hours by default)
+            if self.tag_accumulations_coverage in list(var_fields.keys()):
+                var_coverage = var_fields[self.tag_accumulations_coverage]
+            else:
+                var_coverage = 1
+
+            var_df_obj = accumulate_data_ws(
+                var_data_window, time_range_anc, list(file_path_derived_var.keys()),
+                data_scale_factor=var_fields['scale_factor'], data_min_count=var_fields['min_count'],
+                data_coverage=var_coverage,
+                data_units=var_fields['units'], data_valid_range=var_fields['valid_range'])
+
+            for var_duration, file_path_derived_list in file_path_derived_var.items():
+
+                logging.info(' ------> Accumulation ' + str(var_duration) + 'h ... ')
+
+                var_df_duration = var_df_obj[var_duration]
+                for time_step, file_path_derived_step in zip(time_range, file_path_derived_list):
+
+                    if self.file_index.exists(file_path_derived_step):
+                        continue
+                    if time_step not in list(var_df_duration.keys()):
+                        continue
+
+                    var_df = order_data(var_df_duration[time_step], var_fields_expected)
+
+                    folder_name_derived_step, file_name_derived_step = os.path.split(file_path_derived_step)
+                    self.file_index.make_folder(folder_name_derived_step)
+
+                    write_file_csv(file_path_derived_step, var_df)
+                    self.file_index.add(file_path_derived_step)
+
+                logging.info(' ------> Accumulation ' + str(var_duration) + 'h ... DONE')
+
+            logging.info(' -----> Variable ' + var_name + ' ... DONE')
+
+        logging.info(' ----> Derive datasets ... DONE')
+
+    # -------------------------------------------------------------------------------------
+
     # -------------------------------------------------------------------------------------
     # Method to clean temporary information
     def clean_tmp(self):
@@ -330,19 +846,19 @@ class DriverData:
             # Remove tmp file and folder(s)
             for var_name, var_file_path_list in file_path_anc.items():
                 for var_file_path_step in var_file_path_list:
-                    if os.path.exists(var_file_path_step):
-                        os.remove(var_file_path_step)
+                    if self.file_index.exists(var_file_path_step):
+                        self.file_index.remove(var_file_path_step)
                     var_folder_name_step, var_file_name_step = os.path.split(var_file_path_step)
                     if var_folder_name_step != '':
-                        if os.path.exists(var_folder_name_step):
-                            if not os.listdir(var_folder_name_step):
-                                os.rmdir(var_folder_name_step)
+                        if self.file_index.exists(var_folder_name_step):
+                            if self.file_index.is_empty(var_folder_name_step):
+                                self.file_index.remove_folder(var_folder_name_step)
 
             # Remove empty folder(s)
             folder_name_anc_list = list_folder(folder_name_anc_main)
             for folder_name_anc_step in folder_name_anc_list:
-                if os.path.exists(folder_name_anc_step):
-                    os.rmdir(folder_name_anc_step)
+                if self.file_index.exists(folder_name_anc_step) and self.file_index.is_empty(folder_name_anc_step):
+                    self.file_index.remove_folder(folder_name_anc_step)
 
     # -------------------------------------------------------------------------------------
 
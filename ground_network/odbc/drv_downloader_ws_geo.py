@@ -19,18 +19,40 @@ class DriverGeo:
         self.tag_geo_land = tag_geo_land
         self.tag_folder_name = 'folder_name'
         self.tag_file_name = 'file_name'
+        self.tag_snapshot = 'snapshot'
+        self.tag_active = 'active'
 
         self.folder_name = self.src_dict[self.tag_geo_land][self.tag_folder_name]
         self.file_name = self.src_dict[self.tag_geo_land][self.tag_file_name]
 
         self.file_path = os.path.join(self.folder_name, self.file_name)
+        self.file_path_snapshot = self.collect_file_snapshot(self.src_dict[self.tag_geo_land])
+
+    # Method to collect snapshot file (memory-mapped values of the raster)
+    def collect_file_snapshot(self, geo_dict):
+
+        folder_name_snapshot = self.folder_name
+        file_name_snapshot = os.path.splitext(self.file_name)[0] + '.npy'
+        active_snapshot = True
+        if self.tag_snapshot in list(geo_dict.keys()):
+            snapshot_dict = geo_dict[self.tag_snapshot]
+            if self.tag_folder_name in list(snapshot_dict.keys()):
+                folder_name_snapshot = snapshot_dict[self.tag_folder_name]
+            if self.tag_file_name in list(snapshot_dict.keys()):
+                file_name_snapshot = snapshot_dict[self.tag_file_name]
+            if self.tag_active in list(snapshot_dict.keys()):
+                active_snapshot = snapshot_dict[self.tag_active]
+
+        if not active_snapshot:
+            return None
+        return os.path.join(folder_name_snapshot, file_name_snapshot)
 
     # Method to read geographical datasets
     def read_data(self):
 
         logging.info(' ----> Read geographical file ' + self.file_name + ' ... ')
         if os.path.exists(self.file_path):
-            geo_obj = read_data_raster_land(self.file_path)
+            geo_obj = read_data_raster_land(self.file_path, file_name_values=self.file_path_snapshot)
             logging.info(' ----> Read geographical file ' + self.file_name + ' ... DONE')
         else:
             logging.error(' ==> Read geographical file ' + self.file_name + ' ... FAILED')
@@ -9,7 +9,10 @@ __author__ = 'Fabio Delogu (fabio.delogu@cimafoundation.org'
 __library__ = 'HyDE'
 
 General command line:
-python3 hyde_downloader_mysql_dams.py -settings_file configuration.json -time "YYYY-MM-DD HH:MM"
+python3 hyde_downloader_odbc_rs.py -settings_file configuration.json -time "YYYY-MM-DD HH:MM"
+python3 hyde_downloader_odbc_rs.py -settings_file configuration.json -time "YYYY-MM-DD HH:MM" -export
+python3 hyde_downloader_odbc_rs.py -settings_file configuration.json -daemon
+python3 hyde_downloader_odbc_rs.py -settings_file configuration.json -backfill "YYYY-MM-DD HH:MM" "YYYY-MM-DD HH:MM"
 
 Version:
 20201210 (2.0.0) --> Release 2.0 Beta (HyDE package)
@@ -22,10 +25,20 @@ Version:
 import logging
 import os
 import time
+import pandas as pd
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from copy import deepcopy
 
 from ground_network.odbc.lib_utils_io import read_file_settings
-from ground_network.odbc.lib_utils_system import make_folder
-from ground_network.odbc.lib_utils_time import set_time
+from ground_network.odbc.lib_utils_system import make_folder, FileIndex, define_work_lease
+from ground_network.odbc.lib_utils_time import set_time, plan_time_windows, split_time_chunks
+from ground_network.odbc.lib_utils_scheduler import CycleTimer, define_schedule, run_schedule, \
+    define_pipeline, run_pipeline_data, define_work_scheduler, plan_work_items, group_work_rounds, run_work_rounds, \
+    run_round_data, read_work_backlog, write_work_backlog
+from ground_network.odbc.lib_utils_db_sirmip import define_db_pool
+from ground_network.odbc.lib_utils_db_async import define_db_async
 
 from ground_network.odbc.drv_downloader_rs_geo import DriverGeo
 from ground_network.odbc.drv_downloader_rs_data import DriverData
@@ -49,7 +62,7 @@ def main():
 
     # -------------------------------------------------------------------------------------
     # Get algorithm settings
-    alg_settings, alg_time = get_args()
+    alg_settings, alg_time, alg_export, alg_daemon, alg_backfill = get_args()
 
     # Set algorithm settings
     data_settings = read_file_settings(alg_settings)
@@ -73,68 +86,357 @@ def main():
     # -------------------------------------------------------------------------------------
 
     # -------------------------------------------------------------------------------------
-    # Organize time run
-    time_run, time_range = set_time(time_run_args=alg_time, time_run_file=data_settings['time']['time_now'],
-                                    time_format=time_format)
+    # Get geographical information (not needed to export the store file(s))
+    if not alg_export:
+        driver_geo = DriverGeo(src_dict=data_settings['data']['static'])
+        sections_collections = driver_geo.read_data()
+    else:
+        sections_collections = None
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Define database connection pool (shared by all the time steps)
+    db_pool = define_db_pool(DriverData.collect_db_settings(data_settings['data']['dynamic']['source']))
     # -------------------------------------------------------------------------------------
 
     # -------------------------------------------------------------------------------------
-    # Get geographical information
-    driver_geo = DriverGeo(src_dict=data_settings['data']['static'])
-    sections_collections = driver_geo.read_data()
+    # Define database asynchronous front-end (concurrent hourly queries, if activated)
+    if db_pool is not None:
+        db_async = define_db_async(data_settings['data']['dynamic']['source'], db_name='sirmip')
+    else:
+        db_async = None
     # -------------------------------------------------------------------------------------
 
     # -------------------------------------------------------------------------------------
-    # Iterate over time(S)
-    for time_step in time_range:
+    # Run time steps (once or on schedule keeping geographical data and database connections)
+    try:
+        if alg_backfill is not None:
+
+            # Iterate over the chunk(s) of the backfill period
+            cycle_timer = run_backfill(data_settings, alg_backfill[0], alg_backfill[1], sections_collections, db_pool,
+                                       alg_export=alg_export, db_async=db_async)
+            logging.info(' ---> Timing -- ' + cycle_timer.summary())
+
+        elif not alg_daemon:
+
+            # Organize time run
+            time_run, time_range = set_time(time_run_args=alg_time, time_run_file=data_settings['time']['time_now'],
+                                            time_format=time_format)
+
+            # Iterate over time(s)
+            cycle_timer = run_time_range(data_settings, time_range, sections_collections, db_pool,
+                                         alg_export=alg_export, db_async=db_async)
+            logging.info(' ---> Timing -- ' + cycle_timer.summary())
+
+        else:
+
+            # Organize time run and iterate over time(s) at each cycle
+            def run_cycle(cycle_time, cycle_timer):
+                time_run_cycle, time_range_cycle = set_time(
+                    time_run_args=cycle_time.strftime(time_format), time_run_file=data_settings['time']['time_now'],
+                    time_format=time_format)
+                run_time_range(data_settings, time_range_cycle, sections_collections, db_pool,
+                               alg_export=alg_export, cycle_timer=cycle_timer, db_async=db_async)
+
+            if 'daemon' in list(data_settings.keys()):
+                schedule_settings = define_schedule(data_settings['daemon'])
+            else:
+                schedule_settings = define_schedule()
+            run_schedule(run_cycle, **schedule_settings)
+
+    finally:
+        # Close database connection(s)
+        if db_async is not None:
+            db_async.close()
+        if db_pool is not None:
+            db_pool.close()
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Info algorithm
+    time_elapsed = round(time.time() - start_time, 1)
+
+    logging.info(' ')
+    logging.info(' ==> ' + alg_name + ' (Version: ' + alg_version + ' Release_Date: ' + alg_release + ')')
+    logging.info(' ==> TIME ELAPSED: ' + str(time_elapsed) + ' seconds')
+    logging.info(' ==> ... END')
+    logging.info(' ==> Bye, Bye')
+    logging.info(' ============================================================================ ')
+
+    # -------------------------------------------------------------------------------------
+
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to define the datasets driver of a time window
+def define_driver_data(data_settings, time_window, sections_collections,
+                       db_pool=None, file_index=None, db_async=None):
+    driver_data = DriverData(time_window[-1],
+                             sections_collection=sections_collections,
+                             src_dict=data_settings['data']['dynamic']['source'],
+                             ancillary_dict=data_settings['data']['dynamic']['ancillary'],
+                             dst_dict=data_settings['data']['dynamic']['destination'],
+                             time_dict=data_settings['time'],
+                             variable_dict=data_settings['variable'],
+                             template_dict=data_settings['template'],
+                             info_dict=data_settings['info'],
+                             flag_updating_ancillary=data_settings['flags']['update_dynamic_data_ancillary'],
+                             flag_updating_destination=data_settings['flags']['update_dynamic_data_destination'],
+                             flag_cleaning_tmp=data_settings['flags']['clean_tmp_file'],
+                             db_pool=db_pool, file_index=file_index, db_async=db_async,
+                             time_range=time_window)
+    return driver_data
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to run the time steps of a time range
+def run_time_range(data_settings, time_range, sections_collections, db_pool, alg_export=False, cycle_timer=None,
+                   db_async=None):
+
+    if cycle_timer is None:
+        cycle_timer = CycleTimer()
+
+    # Define file index (existing files shared by all the time steps)
+    file_index = FileIndex()
+
+    # Define pipeline settings (download and organize overlapped by blocks of time steps)
+    if 'pipeline' in list(data_settings.keys()):
+        pipeline_settings = define_pipeline(data_settings['pipeline'])
+    else:
+        pipeline_settings = define_pipeline()
+
+    # Plan time windows (the hours shared by the run windows are processed once)
+    time_windows = plan_time_windows(time_range, time_period=data_settings['time']['time_period'],
+                                     time_frequency=data_settings['time']['time_frequency'],
+                                     time_rounding=data_settings['time']['time_rounding'])
+    logging.info(' ---> Time windows: ' + str(len(time_windows)) + ' -- Time steps: ' +
+                 str(sum([time_window.size for time_window in time_windows])) + ' (instead of ' +
+                 str(len(time_range) * data_settings['time']['time_period']) + ')')
+
+    # Define work scheduler settings (hourly work items by priority until the run deadline)
+    if 'scheduler' in list(data_settings.keys()):
+        scheduler_settings = define_work_scheduler(data_settings['scheduler'])
+    else:
+        scheduler_settings = define_work_scheduler()
+
+    # Define work lease (work items in progress in other instances are skipped)
+    if 'lock' in list(data_settings.keys()):
+        work_lease = define_work_lease(data_settings['lock'], lease_name='rs')
+    else:
+        work_lease = None
+
+    if (scheduler_settings['scheduler_active'] or (work_lease is not None)) and (not alg_export):
+        return run_time_scheduled(data_settings, time_windows, sections_collections, db_pool, scheduler_settings,
+                                  file_index=file_index, cycle_timer=cycle_timer, db_async=db_async,
+                                  work_lease=work_lease)
+
+    for time_window in time_windows:
 
         # -------------------------------------------------------------------------------------
         # Info time
-        logging.info(' ---> TIME STEP: ' + str(time_step) + ' ... ')
+        logging.info(' ---> TIME WINDOW: ' + str(time_window[0]) + ' :: ' + str(time_window[-1]) + ' ... ')
         # -------------------------------------------------------------------------------------
 
         # -------------------------------------------------------------------------------------
         # Get datasets information
-        driver_data = DriverData(time_step,
-                                 sections_collection=sections_collections,
-                                 src_dict=data_settings['data']['dynamic']['source'],
-                                 ancillary_dict=data_settings['data']['dynamic']['ancillary'],
-                                 dst_dict=data_settings['data']['dynamic']['destination'],
-                                 time_dict=data_settings['time'],
-                                 variable_dict=data_settings['variable'],
-                                 template_dict=data_settings['template'],
-                                 info_dict=data_settings['info'],
-                                 flag_updating_ancillary=data_settings['flags']['update_dynamic_data_ancillary'],
-                                 flag_updating_destination=data_settings['flags']['update_dynamic_data_destination'],
-                                 flag_cleaning_tmp=data_settings['flags']['clean_tmp_file'])
-        # Download datasets
-        driver_data.download_data()
-        # Organize and save datasets
-        driver_data.organize_data()
-
-        # Clean temporary file(s)
-        driver_data.clean_tmp()
+        driver_data = define_driver_data(data_settings, time_window, sections_collections,
+                                         db_pool=db_pool, file_index=file_index, db_async=db_async)
+        if alg_export:
+            # Export datasets from the store file(s)
+            with cycle_timer.step('export'):
+                driver_data.export_data()
+        else:
+            if pipeline_settings['pipeline_active']:
+                # Download and organize datasets concurrently (by blocks of time steps)
+                with cycle_timer.step('pipeline'):
+                    run_pipeline_data(driver_data, time_block=pipeline_settings['time_block'],
+                                      queue_size=pipeline_settings['queue_size'], cycle_timer=cycle_timer)
+            else:
+                # Download datasets
+                with cycle_timer.step('download'):
+                    driver_data.download_data()
+                # Organize and save datasets
+                with cycle_timer.step('organize'):
+                    driver_data.organize_data()
+
+            # Clean temporary file(s)
+            with cycle_timer.step('clean'):
+                driver_data.clean_tmp()
         # -------------------------------------------------------------------------------------
 
         # -------------------------------------------------------------------------------------
         # Info time
-        logging.info(' ---> TIME STEP: ' + str(time_step) + ' ... DONE')
+        logging.info(' ---> TIME WINDOW: ' + str(time_window[0]) + ' :: ' + str(time_window[-1]) + ' ... DONE')
         # -------------------------------------------------------------------------------------
 
-    # -------------------------------------------------------------------------------------
+    return cycle_timer
 
-    # -------------------------------------------------------------------------------------
-    # Info algorithm
-    time_elapsed = round(time.time() - start_time, 1)
+# -------------------------------------------------------------------------------------
 
-    logging.info(' ')
-    logging.info(' ==> ' + alg_name + ' (Version: ' + alg_version + ' Release_Date: ' + alg_release + ')')
-    logging.info(' ==> TIME ELAPSED: ' + str(time_elapsed) + ' seconds')
-    logging.info(' ==> ... END')
-    logging.info(' ==> Bye, Bye')
-    logging.info(' ============================================================================ ')
 
-    # -------------------------------------------------------------------------------------
+# -------------------------------------------------------------------------------------
+# Method to organize the datasets of a backfill chunk (in a worker process)
+def organize_chunk(data_settings, time_chunk, sections_collections):
+
+    cycle_timer = CycleTimer()
+
+    driver_data = define_driver_data(data_settings, time_chunk, sections_collections)
+    with cycle_timer.step('organize'):
+        driver_data.organize_data()
+
+    return cycle_timer.timing_obj
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to run the work items of the time windows (by priority until the deadline; the others are deferred)
+def run_time_scheduled(data_settings, time_windows, sections_collections, db_pool, scheduler_settings, file_index=None,
+                       cycle_timer=None, db_async=None, work_lease=None):
+
+    if cycle_timer is None:
+        cycle_timer = CycleTimer()
+    if file_index is None:
+        file_index = FileIndex()
+
+    time_steps = time_windows[0]
+    for time_window in time_windows[1:]:
+        time_steps = time_steps.union(time_window)
+
+    # Plan work items (deferred items of the previous cycles are added to the time windows ones)
+    work_backlog = read_work_backlog(scheduler_settings['file_backlog'], time_steps[-1],
+                                     backlog_period=scheduler_settings['backlog_period'],
+                                     time_frequency=data_settings['time']['time_frequency'])
+    work_items = plan_work_items(time_steps, data_settings['variable'], work_backlog=work_backlog)
+    work_busy = []
+    if work_lease is not None:
+        # Work items are leased at once (the items in progress in other instances are skipped)
+        work_items, work_busy = work_lease.acquire(work_items)
+    work_rounds = group_work_rounds(work_items, time_block=scheduler_settings['time_block'])
+    logging.info(' ---> Work items: ' + str(len(work_items)) + ' -- Work rounds: ' + str(len(work_rounds)) +
+                 ' -- Deadline: ' + str(scheduler_settings['time_deadline']))
+
+    # Download and organize datasets of each round (only the variables and the time steps of the round; the time
+    # steps not run before the deadline are returned)
+    def run_round(var_list, time_steps_round, time_stop=None):
+        if work_lease is not None:
+            work_lease.renew()
+        data_settings_round = dict(data_settings)
+        data_settings_round['variable'] = {var_name: data_settings['variable'][var_name] for var_name in var_list}
+        driver_data = define_driver_data(data_settings_round, pd.DatetimeIndex(sorted(time_steps_round)),
+                                         sections_collections, db_pool=db_pool, file_index=file_index,
+                                         db_async=db_async)
+        return run_round_data(driver_data, time_steps_round, time_stop=time_stop, cycle_timer=cycle_timer)
+
+    try:
+        work_deferred = run_work_rounds(work_rounds, run_round, time_deadline=scheduler_settings['time_deadline'])
+        write_work_backlog(scheduler_settings['file_backlog'], work_deferred)
+
+        # Wait for the work items in progress in other instances (the files written by them are scanned again)
+        if work_busy:
+            if work_lease.lease_wait > 0:
+                with cycle_timer.step('wait'):
+                    work_lease.wait(work_busy)
+            file_index = FileIndex()
+
+        # Clean temporary file(s) (ancillary files of the items in progress in other instances are kept)
+        time_clean = pd.DatetimeIndex(sorted(set([time_step for var_name, time_step in work_items])))
+        if work_lease is not None:
+            time_clean = time_clean.difference(pd.DatetimeIndex(
+                sorted(set([time_step for var_name, time_step in work_lease.collect()]))))
+        if not time_clean.empty:
+            with cycle_timer.step('clean'):
+                define_driver_data(data_settings, time_clean, sections_collections, db_pool=db_pool,
+                                   file_index=file_index).clean_tmp()
+
+    finally:
+        if work_lease is not None:
+            work_lease.release()
+
+    return cycle_timer
+
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to backfill a time period (download by chunk, organize in worker processes)
+def run_backfill(data_settings, time_start, time_end, sections_collections, db_pool,
+                 alg_export=False, cycle_timer=None, db_async=None):
+
+    if cycle_timer is None:
+        cycle_timer = CycleTimer()
+
+    if 'backfill' in list(data_settings.keys()):
+        backfill_settings = data_settings['backfill']
+    else:
+        backfill_settings = {}
+    if 'time_chunk' in list(backfill_settings.keys()):
+        time_chunk_freq = backfill_settings['time_chunk']
+    else:
+        time_chunk_freq = 'D'
+    if 'workers' in list(backfill_settings.keys()):
+        process_workers = max(backfill_settings['workers'], 1)
+    else:
+        process_workers = 2
+
+    # Store files are written by day (each day must be organized by a single worker)
+    dst_settings = data_settings['data']['dynamic']['destination']
+    if ('store' in list(dst_settings.keys())) and \
+            (('active' not in list(dst_settings['store'].keys())) or dst_settings['store']['active']):
+        time_chunk_align = 'D'
+    else:
+        time_chunk_align = None
+
+    time_chunks = split_time_chunks(time_start, time_end,
+                                    time_frequency=data_settings['time']['time_frequency'],
+                                    time_rounding=data_settings['time']['time_rounding'],
+                                    time_chunk=time_chunk_freq, time_align=time_chunk_align)
+    logging.info(' ---> Backfill chunks: ' + str(len(time_chunks)) + ' -- Time steps: ' +
+                 str(sum([time_chunk.size for time_chunk in time_chunks])) + ' -- Workers: ' + str(process_workers))
+
+    # Query the database once for each chunk
+    data_settings = deepcopy(data_settings)
+    data_settings['data']['dynamic']['source']['query_mode'] = 'window'
+
+    if alg_export:
+        # Export datasets from the store file(s)
+        file_index = FileIndex()
+        for time_chunk in time_chunks:
+            with cycle_timer.step('export'):
+                define_driver_data(data_settings, time_chunk, sections_collections,
+                                   db_pool=db_pool, file_index=file_index).export_data()
+        return cycle_timer
+
+    def clean_chunk(time_chunk):
+        with cycle_timer.step('clean'):
+            define_driver_data(data_settings, time_chunk, sections_collections,
+                               db_pool=db_pool, file_index=FileIndex()).clean_tmp()
+
+    chunk_pending = deque()
+    with ProcessPoolExecutor(max_workers=process_workers) as process_executor:
+        for chunk_id, time_chunk in enumerate(time_chunks):
+
+            logging.info(' ---> TIME CHUNK: ' + str(time_chunk[0]) + ' :: ' + str(time_chunk[-1]) + ' ... ')
+
+            # Download datasets (database connections are kept by the main process)
+            with cycle_timer.step('download'):
+                define_driver_data(data_settings, time_chunk, sections_collections,
+                                   db_pool=db_pool, file_index=FileIndex(), db_async=db_async).download_data()
+
+            # Organize datasets (at most one pending chunk for each worker)
+            chunk_pending.append((chunk_id, process_executor.submit(
+                organize_chunk, data_settings, time_chunk, sections_collections)))
+            while len(chunk_pending) > (process_workers if chunk_id < len(time_chunks) - 1 else 0):
+                chunk_id_done, chunk_future = chunk_pending.popleft()
+                cycle_timer.update(chunk_future.result())
+                logging.info(' ---> TIME CHUNK: ' + str(time_chunks[chunk_id_done][0]) + ' :: ' +
+                             str(time_chunks[chunk_id_done][-1]) + ' ... DONE')
+
+                # Clean temporary file(s)
+                clean_chunk(time_chunks[chunk_id_done])
+
+    return cycle_timer
 
 # -------------------------------------------------------------------------------------
 
@@ -145,6 +447,9 @@ def get_args():
     parser_handle = ArgumentParser()
     parser_handle.add_argument('-settings_file', action="store", dest="alg_settings")
     parser_handle.add_argument('-time', action="store", dest="alg_time")
+    parser_handle.add_argument('-export', action="store_true", dest="alg_export")
+    parser_handle.add_argument('-daemon', action="store_true", dest="alg_daemon")
+    parser_handle.add_argument('-backfill', action="store", dest="alg_backfill", nargs=2)
     parser_values = parser_handle.parse_args()
 
     if parser_values.alg_settings:
@@ -157,7 +462,11 @@ def get_args():
     else:
         alg_time = None
 
-    return alg_settings, alg_time
+    alg_export = parser_values.alg_export
+    alg_daemon = parser_values.alg_daemon
+    alg_backfill = parser_values.alg_backfill
+
+    return alg_settings, alg_time, alg_export, alg_daemon, alg_backfill
 
 # -------------------------------------------------------------------------------------
 
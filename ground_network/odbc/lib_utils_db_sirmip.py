@@ -1,38 +1,103 @@
 # -------------------------------------------------------------------------------------
 # Libraries
 import logging
-import pyodbc
 import datetime
 import csv
 import netrc
 
 import numpy as np
 import pandas as pd
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from ground_network.odbc.lib_utils_db_pool import DBPool
+from ground_network.odbc.lib_utils_decoder import define_columns_schema, decode_data, decode_data_list
 # -------------------------------------------------------------------------------------
 
 
 # -------------------------------------------------------------------------------------
 # Method to get weather station dataset
-def get_data_ws(var_name, time_from, time_to, db_line_settings, flag_type='automatic'):
+def get_data_ws(var_name, time_from, time_to, db_line_settings, flag_type='automatic', db_pool=None):
 
     # Define DB query
     db_query = define_query_ws(var_name, time_from, time_to, flag_type)
 
     # Open DB connection
-    db_connection = pyodbc.connect(db_line_settings)
-    db_cursor = db_connection.cursor()
+    with connect_db(db_line_settings, db_pool=db_pool) as db_connection:
+        db_cursor = db_connection.cursor()
 
-    # Execute DB query
-    db_cursor.execute(db_query)
-    # Get all data
-    db_dataset = db_cursor.fetchall()
-    # Close DB connection
-    db_connection.commit()
+        # Execute DB query
+        db_cursor.execute(db_query)
+        # Get all data
+        db_dataset = db_cursor.fetchall()
+        # Close DB cursor
+        db_cursor.close()
+        db_connection.commit()
 
     return db_dataset
 # -------------------------------------------------------------------------------------
 
 
+# -------------------------------------------------------------------------------------
+# Method to open a DB connection (driver is imported at the first connection)
+def open_db_connection(db_line_settings):
+    import pyodbc
+    return pyodbc.connect(db_line_settings)
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to open a DB connection (borrowed from the pool if available)
+@contextmanager
+def connect_db(db_line_settings, db_pool=None):
+
+    if db_pool is not None:
+        with db_pool.connection() as db_connection:
+            yield db_connection
+    else:
+        db_connection = open_db_connection(db_line_settings)
+        try:
+            yield db_connection
+        finally:
+            db_connection.close()
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to check a DB connection
+def check_db_connection(db_connection):
+    db_cursor = db_connection.cursor()
+    db_cursor.execute('SELECT 1')
+    db_cursor.fetchone()
+    db_cursor.close()
+    return True
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to define DB connection pool
+def define_db_pool(db_info, pool_size_default=2):
+
+    db_settings = define_db_settings(db_info)
+
+    if db_settings is not None:
+        if 'pool_size' in list(db_info.keys()):
+            pool_size = db_info['pool_size']
+        else:
+            pool_size = pool_size_default
+
+        logging.info(' ---> Define server connection pool (size: ' + str(pool_size) + ') ... OK')
+        db_pool = DBPool(db_settings, db_connect=open_db_connection, db_check=check_db_connection,
+                         pool_size=pool_size)
+    else:
+        logging.info(' ---> Define server connection pool ... SKIPPED. Server is in inactive mode.')
+        db_pool = None
+
+    return db_pool
+# -------------------------------------------------------------------------------------
+
+
 # -------------------------------------------------------------------------------------
 # Method to order ground network data
 def order_data(data_frame, data_fields_expected):
@@ -65,7 +130,7 @@ def organize_data_rs(time, data_collection, sections_df, data_type='istantaneous
         columns_list_data = ['id', 'code', 'time_datatime', 'time', 'time_parts', 'water_level', 'discharge',
                              'undefined_1', 'undefined_2', 'name', 'check']
     if columns_type_data is None:
-        columns_type_data = [np.int, np.int, datetime.datetime, pd.Timestamp, str, np.float, np.float,
+        columns_type_data = [int, int, datetime.datetime, pd.Timestamp, str, float, float,
                              str, str, str, bool]
     if columns_id_data is None:
         columns_id_data = [0, 1, 3, 5, 6, 10]
@@ -89,51 +154,11 @@ def organize_data_rs(time, data_collection, sections_df, data_type='istantaneous
         logging.error(' ===> Column index of sections and data tags must have the same name')
         raise ValueError('Bad definition of column tag')
 
-    data_workspace = {}
-    for data_array_row in data_collection:
-
-        columns_list_select = [columns_list_data[i] for i in columns_id_data]
-        columns_type_select = [columns_type_data[i] for i in columns_id_data]
-
-        data_list_row = list(data_array_row)
-        data_list_select = [data_list_row[i] for i in columns_id_data]
-
-        for column_name, column_value in zip(columns_list_select, data_list_select):
+    columns_schema = define_columns_schema(
+        columns_list_data, columns_type_data, columns_id_data, column_data=column_discharge_data,
+        data_scale_factor=data_scale_factor, data_valid_range=data_valid_range)
+    data_df = decode_data(data_collection, columns_schema)
 
-            if column_name not in list(data_workspace.keys()):
-                data_workspace[column_name] = [column_value]
-            else:
-                column_tmp = data_workspace[column_name]
-                column_tmp.append(column_value)
-                data_workspace[column_name] = column_tmp
-
-    for column_name, column_type in zip(columns_list_select, columns_type_select):
-        data_tmp = data_workspace[column_name]
-
-        if np.int == column_type:
-            data_tmp = np.asarray(data_tmp, dtype=np.int)
-        elif np.float == column_type:
-            data_tmp = np.asarray(data_tmp, dtype=np.float)
-        elif pd.Timestamp == column_type:
-            data_tmp = pd.to_datetime(data_tmp)
-        elif bool == column_type:
-            data_tmp = np.asarray(data_tmp, dtype=bool)
-
-        if column_name == column_discharge_data:
-
-            data_tmp = data_tmp / data_scale_factor
-
-            data_valid_min = data_valid_range[0]
-            data_valid_max = data_valid_range[1]
-
-            if data_valid_min is not None:
-                data_tmp[data_tmp < data_valid_min] = np.nan
-            if data_valid_max is not None:
-                data_tmp[data_tmp > data_valid_max] = np.nan
-
-        data_workspace[column_name] = data_tmp
-
-    data_df = pd.DataFrame(data_workspace, columns=columns_list_select)
     data_df_merged = pd.merge(data_df, sections_df, left_on=column_idx_data, right_on=column_idx_sections)
     data_df_select = data_df_merged[(data_df_merged[column_time_data] == time)]
 
@@ -150,14 +175,15 @@ def organize_data_rs(time, data_collection, sections_df, data_type='istantaneous
 def organize_data_ws(data_collection, data_type='accumulated', data_units='', data_valid_range=None,
                      data_scale_factor=1, data_min_count=1,
                      columns_list=None, columns_type=None, columns_id=None,
-                     column_idx='code', column_data='data', column_time_start='time_start', column_time_end='time_end'):
+                     column_idx='code', column_data='data', column_time_start='time_start', column_time_end='time_end',
+                     column_time_format='%Y-%m-%dT%H:%M:%S'):
 
     if columns_list is None:
         columns_list = ['code', 'id', 'name', 'data', 'longitude', 'latitude', 'altitude',
                         'boundary_limit_01', 'boundary_limit_02', 'boundary_limit_03',
                         'catchment', 'time_start', 'time_end']
     if columns_type is None:
-        columns_type = [np.int, np.int, str, np.float, np.float, np.float, np.float,
+        columns_type = [int, int, str, float, float, float, float,
                         str, str, str,
                         str, pd.Timestamp, pd.Timestamp]
     if columns_id is None:
@@ -179,87 +205,206 @@ def organize_data_ws(data_collection, data_type='accumulated', data_units='', da
         logging.error(' ===> Column time end tag is not in columns list names')
         raise ValueError('Bad definition of column tag')
 
-    data_workspace = {}
-    for data_array_row in data_collection:
+    columns_schema = define_columns_schema(
+        columns_list, columns_type, columns_id, column_data=column_data,
+        data_scale_factor=data_scale_factor, data_valid_range=data_valid_range,
+        columns_format={column_time_start: column_time_format, column_time_end: column_time_format})
+    data_df = decode_data(data_collection, columns_schema)
 
-        columns_list_select = [columns_list[i] for i in columns_id]
-        columns_type_select = [columns_type[i] for i in columns_id]
+    data_df_merged = aggregate_data_ws(
+        data_df, [column_idx], data_type=data_type, data_min_count=data_min_count,
+        column_data=column_data, column_time_start=column_time_start, column_time_end=column_time_end)
 
-        data_list_row = list(data_array_row)
-        data_list_select = [data_list_row[i] for i in columns_id]
+    data_df_merged = finalize_data_ws(data_df_merged, column_idx=column_idx, data_units=data_units)
 
-        for column_name, column_value in zip(columns_list_select, data_list_select):
+    return data_df_merged
+# -------------------------------------------------------------------------------------
 
-            if column_name not in list(data_workspace.keys()):
-                data_workspace[column_name] = [column_value]
-            else:
-                column_tmp = data_workspace[column_name]
-                column_tmp.append(column_value)
-                data_workspace[column_name] = column_tmp
 
-    for column_name, column_type in zip(columns_list_select, columns_type_select):
-        data_tmp = data_workspace[column_name]
+# -------------------------------------------------------------------------------------
+# Method to organize weather stations data of a time window into a dataframe for each time step
+def organize_data_ws_window(data_collection_obj, data_type='accumulated', data_units='', data_valid_range=None,
+                            data_scale_factor=1, data_min_count=1,
+                            columns_list=None, columns_type=None, columns_id=None,
+                            column_idx='code', column_data='data',
+                            column_time_start='time_start', column_time_end='time_end',
+                            column_time_format='%Y-%m-%dT%H:%M:%S', column_time_step='time_step'):
+
+    data_df = decode_data_ws_window(
+        data_collection_obj, data_valid_range=data_valid_range, data_scale_factor=data_scale_factor,
+        columns_list=columns_list, columns_type=columns_type, columns_id=columns_id,
+        column_data=column_data, column_time_start=column_time_start, column_time_end=column_time_end,
+        column_time_format=column_time_format, column_time_step=column_time_step)
+
+    # Aggregation(s) over (time step, station) in a single groupby pass
+    data_df_merged = aggregate_data_ws(
+        data_df, [column_time_step, column_idx], data_type=data_type, data_min_count=data_min_count,
+        column_data=column_data, column_time_start=column_time_start, column_time_end=column_time_end)
+
+    data_df_obj = {}
+    for time_step, data_df_step in data_df_merged.groupby(level=column_time_step, sort=False):
+        data_df_step = data_df_step.droplevel(column_time_step)
+        data_df_obj[time_step] = finalize_data_ws(data_df_step, column_idx=column_idx, data_units=data_units)
+
+    return data_df_obj
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to compute rolling accumulations of weather stations data over a time window
+def accumulate_data_ws(data_collection_obj, time_range, data_durations, data_units='', data_valid_range=None,
+                       data_scale_factor=1, data_min_count=1, data_coverage=1,
+                       columns_list=None, columns_type=None, columns_id=None,
+                       column_idx='code', column_data='data',
+                       column_time_start='time_start', column_time_end='time_end',
+                       column_time_format='%Y-%m-%dT%H:%M:%S', column_time_step='time_step'):
+
+    data_df = decode_data_ws_window(
+        data_collection_obj, data_valid_range=data_valid_range, data_scale_factor=data_scale_factor,
+        columns_list=columns_list, columns_type=columns_type, columns_id=columns_id,
+        column_data=column_data, column_time_start=column_time_start, column_time_end=column_time_end,
+        column_time_format=column_time_format, column_time_step=column_time_step)
+
+    columns_static = [column_name for column_name in list(data_df.columns)
+                      if column_name not in [column_time_step, column_idx,
+                                             column_data, column_time_start, column_time_end]]
+    data_df_static = data_df.groupby(column_idx)[columns_static].first()
+
+    # Hourly sum, count of valid values and count of rows as (time step x station) matrices
+    data_df_hourly = data_df.groupby([column_time_step, column_idx])[column_data].agg(['sum', 'count', 'size'])
+    data_df_hourly = data_df_hourly.unstack(column_idx).reindex(time_range).fillna(0)
+    # An hour is valid when it has at least data_min_count values (same rule of the hourly datasets)
+    data_hourly_valid = (data_df_hourly['count'] >= data_min_count).astype(int)
+    data_hourly_values = data_df_hourly['sum'].where(data_hourly_valid > 0, 0)
+    # Time steps without collection are not available (accumulations over them are not defined)
+    time_flags = pd.Series(time_range.isin(list(data_collection_obj.keys())), index=time_range).astype(int)
+
+    data_df_obj = {}
+    for data_duration in data_durations:
+
+        # Running sums over the time steps
+        data_values = data_hourly_values.rolling(window=data_duration, min_periods=data_duration).sum()
+        data_valid = data_hourly_valid.rolling(window=data_duration, min_periods=data_duration).sum()
+        data_size = data_df_hourly['size'].rolling(window=data_duration, min_periods=data_duration).sum()
+        time_flags_rolling = time_flags.rolling(window=data_duration, min_periods=data_duration).sum()
+
+        # Accumulations are defined only when the valid hours cover the data_coverage ratio of the duration
+        data_values = data_values.mask(data_valid / data_duration < data_coverage)
+        data_flags = data_size > 0
+
+        data_df_obj[data_duration] = {}
+        for time_step in time_range[data_duration - 1:]:
+
+            if time_flags_rolling.loc[time_step] < data_duration:
+                continue
+
+            station_flags = data_flags.loc[time_step]
+            station_codes = station_flags.index[station_flags.values]
+            if station_codes.size == 0:
+                continue
+
+            data_df_step = data_df_static.loc[station_codes].copy()
+            data_df_step[column_data] = data_values.loc[time_step, station_codes].values
+            data_df_step[column_time_start] = time_step - pd.Timedelta(hours=data_duration)
+            data_df_step[column_time_end] = time_step
+
+            data_df_obj[data_duration][time_step] = finalize_data_ws(
+                data_df_step, column_idx=column_idx, data_units=data_units)
+
+    return data_df_obj
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to decode weather stations data of a time window (time step stored in a column)
+def decode_data_ws_window(data_collection_obj, data_valid_range=None, data_scale_factor=1,
+                          columns_list=None, columns_type=None, columns_id=None,
+                          column_data='data', column_time_start='time_start', column_time_end='time_end',
+                          column_time_format='%Y-%m-%dT%H:%M:%S', column_time_step='time_step'):
+
+    if columns_list is None:
+        columns_list = ['code', 'id', 'name', 'data', 'longitude', 'latitude', 'altitude',
+                        'boundary_limit_01', 'boundary_limit_02', 'boundary_limit_03',
+                        'catchment', 'time_start', 'time_end']
+    if columns_type is None:
+        columns_type = [int, int, str, float, float, float, float,
+                        str, str, str,
+                        str, pd.Timestamp, pd.Timestamp]
+    if columns_id is None:
+        columns_id = [0, 2, 3, 4, 5, 6, 10, 11, 12]
+
+    if data_valid_range is None:
+        data_valid_range = [0, None]
 
-        if np.int == column_type:
-            data_tmp = np.asarray(data_tmp, dtype=np.int)
-        elif np.float == column_type:
-            data_tmp = np.asarray(data_tmp, dtype=np.float)
-        elif pd.Timestamp == column_type:
-            data_tmp = pd.to_datetime(data_tmp)
+    # Rows of the time steps are decoded step by step (the columnar layout can change between the steps)
+    time_collection = []
+    for time_step, data_collection_step in data_collection_obj.items():
+        time_collection.extend([time_step] * len(data_collection_step))
 
-        if column_name == column_data:
+    columns_schema = define_columns_schema(
+        columns_list, columns_type, columns_id, column_data=column_data,
+        data_scale_factor=data_scale_factor, data_valid_range=data_valid_range,
+        columns_format={column_time_start: column_time_format, column_time_end: column_time_format})
+    data_df = decode_data_list(list(data_collection_obj.values()), columns_schema)
+    data_df.insert(0, column_time_step, pd.DatetimeIndex(time_collection))
 
-            data_tmp = data_tmp / data_scale_factor
+    return data_df
+# -------------------------------------------------------------------------------------
 
-            data_valid_min = data_valid_range[0]
-            data_valid_max = data_valid_range[1]
 
-            if data_valid_min is not None:
-                data_tmp[data_tmp < data_valid_min] = np.nan
-            if data_valid_max is not None:
-                data_tmp[data_tmp > data_valid_max] = np.nan
+# -------------------------------------------------------------------------------------
+# Method to aggregate weather stations data by group (station or time step and station)
+def aggregate_data_ws(data_df, columns_group, data_type='accumulated', data_min_count=1,
+                      column_data='data', column_time_start='time_start', column_time_end='time_end'):
 
-        data_workspace[column_name] = data_tmp
+    columns_static = [column_name for column_name in list(data_df.columns)
+                      if column_name not in columns_group + [column_data, column_time_start, column_time_end]]
 
-    data_df = pd.DataFrame(data_workspace, columns=columns_list_select)
-    data_df = data_df.reset_index()
-    data_df = data_df.set_index([column_idx])
+    data_agg = {}
+    for column_name in columns_static:
+        data_agg[column_name] = (column_name, 'first')
 
     if data_type == 'accumulated':
 
-        data_df_value = data_df.groupby(column_idx)[column_data].sum(min_count=data_min_count)
-        data_df_time_start = data_df.groupby(column_idx)[column_time_start].min()
-        data_df_time_end = data_df.groupby(column_idx)[column_time_end].max()
+        data_agg[column_data] = (column_data, 'sum')
+        data_agg['_'.join([column_data, 'count'])] = (column_data, 'count')
+        data_agg[column_time_start] = (column_time_start, 'min')
+        data_agg[column_time_end] = (column_time_end, 'max')
 
     elif data_type == 'instantaneous':
 
         if data_min_count == 1:
-            data_df_value = data_df.groupby(column_idx)[column_data].last()
+            data_agg[column_data] = (column_data, 'last')
         else:
-            data_df_value = data_df.groupby(column_idx)[column_data].mean()
-        data_df_time_start = data_df.groupby(column_idx)[column_time_start].last()
-        data_df_time_end = data_df.groupby(column_idx)[column_time_end].last()
+            data_agg[column_data] = (column_data, 'mean')
+        data_agg[column_time_start] = (column_time_start, 'last')
+        data_agg[column_time_end] = (column_time_end, 'last')
 
     else:
         logging.error(' ===> Wrong definition of dataset type')
         raise NotImplemented('Dataset type not implemented yet')
 
-    data_dict_dynamic = {column_idx: data_df_value.index, column_data: data_df_value.values,
-                         column_time_start: data_df_time_start.values, column_time_end: data_df_time_end.values}
+    # Compute all the aggregation(s) in a single groupby pass
+    data_df_merged = data_df.groupby(columns_group).agg(**data_agg)
+
+    if data_type == 'accumulated':
+        # Same behaviour of sum(min_count=data_min_count)
+        column_count = '_'.join([column_data, 'count'])
+        data_df_merged.loc[data_df_merged[column_count] < data_min_count, column_data] = np.nan
+        data_df_merged = data_df_merged.drop(columns=[column_count])
 
-    data_df_dynamic = pd.DataFrame(data_dict_dynamic)
-    data_df_dynamic = data_df_dynamic.reset_index()
-    data_df_dynamic = data_df_dynamic.set_index(column_idx)
+    return data_df_merged
+# -------------------------------------------------------------------------------------
 
-    data_df_static = data_df.drop(
-        columns=[column_data, column_time_start, column_time_end]).groupby(column_idx).first()
 
-    data_df_merged = pd.merge(data_df_static, data_df_dynamic, left_index=True, right_index=True)
+# -------------------------------------------------------------------------------------
+# Method to finalize weather stations dataframe (station index as first column)
+def finalize_data_ws(data_df_merged, column_idx='code', data_units=''):
+
     idx_df_merged = data_df_merged.index.values
 
     data_df_merged = data_df_merged.reset_index(drop=True)
     data_df_merged.insert(0, column_idx, idx_df_merged)
-    data_df_merged = data_df_merged.drop(columns=['index_x', 'index_y'])
 
     if 'units' not in list(data_df_merged.columns):
         data_df_merged['units'] = data_units
@@ -270,43 +415,215 @@ def organize_data_ws(data_collection, data_type='accumulated', data_units='', da
 
 # -------------------------------------------------------------------------------------
 # Method to get river station dataset
-def get_data_rs(var_name, time_from, time_to, db_line_settings):
+def get_data_rs(var_name, time_from, time_to, db_line_settings, db_pool=None, query_batch=1, query_workers=1):
 
     # Define DB query
     db_query_registry = define_query_rs_registry(var_name)
-    db_query_data = define_query_rs_data()
 
     # Open DB connection
-    db_connection = pyodbc.connect(db_line_settings)
-    db_cursor = db_connection.cursor()
+    with connect_db(db_line_settings, db_pool=db_pool) as db_connection:
+        db_cursor = db_connection.cursor()
+
+        # Execute DB query
+        db_cursor.execute(db_query_registry)
+        # Get all registry
+        db_registry = db_cursor.fetchall()
+        db_registry_codes = [int(db_registry_field[0]) for db_registry_field in db_registry]
+
+        # Execute DB query to data
+        if query_workers <= 1:
+            db_dataset = get_data_rs_sensors(db_cursor, db_registry_codes, time_from, time_to,
+                                             query_batch=query_batch)
+
+        # Close DB cursor
+        db_cursor.close()
+        db_connection.commit()
+
+    # Execute DB query to data using concurrent connection(s)
+    if query_workers > 1:
+        db_dataset = get_data_rs_workers(db_registry_codes, time_from, time_to, db_line_settings,
+                                         db_pool=db_pool, query_batch=query_batch, query_workers=query_workers)
 
-    # Execute DB query
-    db_cursor.execute(db_query_registry)
-    # Get all registry
-    db_registry = db_cursor.fetchall()
+    return db_dataset
+
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to get river station dataset spreading the sensors over concurrent connection(s)
+def get_data_rs_workers(db_registry_codes, time_from, time_to, db_line_settings,
+                        db_pool=None, query_batch=1, query_workers=2):
+
+    if query_batch is None or query_batch < 1:
+        query_batch = 1
+
+    # Without a run pool, a temporary pool bounds the connections opened by the workers
+    db_pool_tmp = None
+    if db_pool is None:
+        db_pool_tmp = DBPool(db_line_settings, db_connect=open_db_connection, db_check=check_db_connection,
+                             pool_size=query_workers)
+        db_pool = db_pool_tmp
+
+    db_tasks = [db_registry_codes[db_task_start:db_task_start + query_batch]
+                for db_task_start in range(0, len(db_registry_codes), query_batch)]
+
+    def get_data_rs_task(db_task_codes):
+        with db_pool.connection() as db_task_connection:
+            db_task_cursor = db_task_connection.cursor()
+            db_task_dataset = get_data_rs_sensors(db_task_cursor, db_task_codes, time_from, time_to,
+                                                  query_batch=query_batch)
+            db_task_cursor.close()
+            db_task_connection.commit()
+        return db_task_dataset
+
+    try:
+        with ThreadPoolExecutor(max_workers=query_workers) as db_executor:
+            # Results are collected in the task order to keep the registry order of the sensors
+            db_results = list(db_executor.map(get_data_rs_task, db_tasks))
+    finally:
+        if db_pool_tmp is not None:
+            db_pool_tmp.close()
+
+    db_dataset = []
+    for db_result in db_results:
+        db_dataset.extend(db_result)
+
+    return db_dataset
+
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to get river station dataset for a list of sensors
+def get_data_rs_sensors(db_cursor, db_registry_codes, time_from, time_to, query_batch=1, query_limit=10000):
+
+    if query_batch is None or query_batch < 1:
+        query_batch = 1
 
-    # Execute DB query to data
     db_dataset = []
-    for db_registry_id, db_registry_field in enumerate(db_registry):
+    for db_batch_start in range(0, len(db_registry_codes), query_batch):
+        db_batch_codes = db_registry_codes[db_batch_start:db_batch_start + query_batch]
+
+        if len(db_batch_codes) == 1:
+            db_query_data = define_query_rs_data()
+        else:
+            db_query_data = define_query_rs_data_batch(len(db_batch_codes))
 
-        db_registry_code = np.int(db_registry_field[0])
-        db_query_parameters = (time_from, time_to, db_registry_code)
+        db_query_parameters = []
+        for db_registry_code in db_batch_codes:
+            db_query_parameters.extend([time_from, time_to, db_registry_code])
 
+        # Execute the procedure call(s); a batch returns one result set for each sensor
         db_cursor.execute(db_query_data, db_query_parameters)
+        db_batch_points = fetch_data_rs_sets(db_cursor)
+
+        if len(db_batch_codes) == 1:
+            # All the result sets of a single call belong to its sensor
+            db_batch_points = [[db_row for db_set in db_batch_points for db_row in db_set]]
+        elif len(db_batch_points) != len(db_batch_codes):
+            # Result sets cannot be paired with the sensors of the batch; the sensors are queried one by one
+            logging.warning(' ===> Batch of ' + str(len(db_batch_codes)) + ' sensors returned ' +
+                            str(len(db_batch_points)) + ' result sets. Sensors are queried one by one')
+            db_batch_points = []
+            for db_registry_code in db_batch_codes:
+                db_cursor.execute(define_query_rs_data(), [time_from, time_to, db_registry_code])
+                db_batch_points.append([db_row for db_set in fetch_data_rs_sets(db_cursor) for db_row in db_set])
+
+        for db_registry_code, db_point in zip(db_batch_codes, db_batch_points):
+
+            # The procedure returns at most query_limit items; the window is split to get the missing ones
+            if len(db_point) >= query_limit:
+                db_point = get_data_rs_subwindow(db_cursor, db_registry_code, time_from, time_to,
+                                                 query_limit=query_limit)
+
+            for db_point_step in db_point:
+                if db_point_step:
+                    db_dataset.append(db_point_step)
+
+    return db_dataset
+
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to fetch the result sets of the executed procedure call(s)
+def fetch_data_rs_sets(db_cursor):
+    db_sets = []
+    while True:
+        if db_cursor.description is not None:
+            db_sets.append(db_cursor.fetchall())
+
+        if not db_cursor.nextset():
+            break
+    return db_sets
+
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to get river station dataset of a sensor splitting the time window until the items limit is satisfied
+def get_data_rs_subwindow(db_cursor, db_registry_code, time_from, time_to,
+                          query_limit=10000, column_time_id=3, time_format="%Y-%m-%dT%H:%M:%S.%f",
+                          time_window_min='1min'):
+
+    time_start, time_end = pd.Timestamp(time_from), pd.Timestamp(time_to)
+    time_middle = (time_start + (time_end - time_start) / 2).floor('s')
+
+    if (time_middle - time_start) < pd.Timedelta(time_window_min):
+        logging.warning(' ===> Sensor ' + str(db_registry_code) + ' returned more than ' + str(query_limit) +
+                        ' items between ' + time_from + ' and ' + time_to + '. Datasets could be incomplete')
+        db_cursor.execute(define_query_rs_data(), [time_from, time_to, db_registry_code])
+        return db_cursor.fetchall()
+
+    time_middle_str = time_middle.strftime(time_format)[:-3]
+
+    db_dataset = []
+    for time_from_sub, time_to_sub, time_select in [(time_from, time_middle_str, 'left'),
+                                                    (time_middle_str, time_to, 'right')]:
+
+        db_cursor.execute(define_query_rs_data(), [time_from_sub, time_to_sub, db_registry_code])
         db_point = db_cursor.fetchall()
 
+        if len(db_point) >= query_limit:
+            db_point = get_data_rs_subwindow(db_cursor, db_registry_code, time_from_sub, time_to_sub,
+                                             query_limit=query_limit, column_time_id=column_time_id,
+                                             time_format=time_format, time_window_min=time_window_min)
+
+        # Items on the split time are kept only once (in the left sub-window)
         for db_point_step in db_point:
             if db_point_step:
-                db_dataset.append(db_point_step)
-
-    # Close DB connection
-    db_connection.commit()
+                time_point = pd.Timestamp(db_point_step[column_time_id])
+                if (time_select == 'left' and time_point <= time_middle) or \
+                        (time_select == 'right' and time_point > time_middle):
+                    db_dataset.append(db_point_step)
 
     return db_dataset
 
 # -------------------------------------------------------------------------------------
 
 
+# -------------------------------------------------------------------------------------
+# Method to split river station dataset by time step
+def split_data_rs(data_collection, time_range, time_frequency='H', column_time_id=3):
+
+    # Each row belongs to the step closing its interval (time_from, time_to] as in the hourly query
+    data_obj = {}
+    for time_step in time_range:
+        data_obj[time_step] = []
+
+    if data_collection:
+        time_collection = pd.to_datetime([data_row[column_time_id] for data_row in data_collection])
+        time_collection = time_collection.ceil(time_frequency)
+
+        for data_row, time_row in zip(data_collection, time_collection):
+            if time_row in data_obj:
+                data_obj[time_row].append(data_row)
+
+    return data_obj
+
+# -------------------------------------------------------------------------------------
+
+
 # -------------------------------------------------------------------------------------
 # Method to define database settings
 def get_db_credential(db_name="SIRMIP"):
@@ -375,23 +692,88 @@ def parse_query_time(time_step, time_frequency='H', time_format="%Y-%m-%dT%H:%M:
 # -------------------------------------------------------------------------------------
 
 
+# -------------------------------------------------------------------------------------
+# Method to parse the query time window
+def parse_query_window(time_range, time_frequency='H', time_format="%Y-%m-%dT%H:%M:%S.%f"):
+
+    time_start = min(time_range)
+    time_end = max(time_range)
+
+    time_to = time_end.strftime(time_format)[:-3]
+    time_from = pd.date_range(end=time_start, freq=time_frequency, periods=2)[0].strftime(time_format)[:-3]
+
+    return time_from, time_to
+
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to split weather station dataset by time step
+def split_data_ws(data_collection, time_range, time_frequency='H', time_format='%Y-%m-%dT%H:%M:%S',
+                  column_time_id=12):
+
+    # Each row belongs to the step closing its interval (time_from, time_to] as in the hourly query
+    data_obj = {}
+    for time_step in time_range:
+        data_obj[time_step] = []
+
+    if data_collection:
+        time_collection = pd.to_datetime([data_row[column_time_id] for data_row in data_collection],
+                                         format=time_format)
+        time_collection = time_collection.ceil(time_frequency)
+
+        for data_row, time_row in zip(data_collection, time_collection):
+            if time_row in data_obj:
+                data_obj[time_row].append(data_row)
+
+    return data_obj
+
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to split weather station dataset by variable (sensor type)
+def split_data_ws_by_variable(data_collection, var_name_list, column_var_id=13):
+
+    data_obj = {}
+    for var_name in var_name_list:
+        data_obj[var_name] = []
+
+    for data_row in data_collection:
+        var_name = data_row[column_var_id]
+        if var_name in data_obj:
+            data_obj[var_name].append(data_row)
+
+    return data_obj
+
+# -------------------------------------------------------------------------------------
+
+
 # -------------------------------------------------------------------------------------
 # Method to define weather station query
 def define_query_ws(var_name, time_from, time_end, flag_type='automatic'):
 
+    # Multiple variables are selected together and the sensor type is added as last column
+    if isinstance(var_name, (list, tuple)):
+        db_query_var_select = ", s.TipoSensore AS TipoSensore "
+        db_query_var_where = "    AND (s.TipoSensore IN (" + ", ".join(["'" + var_step + "'" for var_step in var_name]) + ") ) "
+    else:
+        db_query_var_select = " "
+        db_query_var_where = "    AND (s.TipoSensore='" + var_name + "' ) "
+
     if flag_type == 'automatic':
 
         db_query_data = "SELECT s.CodiceUnico AS CodiceSensore, st.CodiceUnico AS CodiceStazione, st.NomeAnnale AS NomeStazione, ds.DatoOrigine AS Pioggia_mm, "
         db_query_data += "geo.LongCentesimale AS Lon, geo.LatCentesimale AS Lat, geo.Quota AS Zm, sito.Regione, sito.Provincia, sito.Comune, s.BacinoAnnale, "
         db_query_data += "CONVERT(CHAR(19), ds.Data, 126 ) AS DataInizio, "
-        db_query_data += "CONVERT(CHAR(19), ds.Data,   126 ) AS DataFine "
+        db_query_data += "CONVERT(CHAR(19), ds.Data,   126 ) AS DataFine" + db_query_var_select
         db_query_data += "FROM DatoSensore AS ds INNER JOIN Sensore AS s ON ds.Sensore = s.CodiceUnico "
         db_query_data += "    INNER JOIN Stazione AS st ON s.Stazione = st.CodiceUnico "
         db_query_data += "    INNER JOIN Georeferenza AS geo ON st.Posizione = geo.IDGeo "
         db_query_data += "    INNER JOIN Sito ON st.SitoCollocazione = sito.IDSito "
         db_query_data += "WHERE "
         db_query_data += "    ( ( ds.Data BETWEEN '" + time_from + "' AND '" + time_end + "' ) AND NOT( ds.Data='" + time_from + "' ) ) "
-        db_query_data += "    AND (s.TipoSensore='" + var_name + "' ) "
+        db_query_data += db_query_var_where
         db_query_data += "    AND NOT( ds.DatoOrigine IS NULL ) "
         db_query_data += "    AND NOT( geo.GaussBoagaEst IS NULL ) "
         db_query_data += "    AND NOT( geo.GaussBoagaNord IS NULL ) "
@@ -403,14 +785,14 @@ def define_query_ws(var_name, time_from, time_end, flag_type='automatic'):
         db_query_data = "SELECT s.CodiceUnico AS CodiceSensore, st.CodiceUnico AS CodiceStazione, st.NomeAnnale AS NomeStazione, ds.DatoOrigine AS Pioggia_mm, "
         db_query_data += "geo.LongCentesimale AS Lon, geo.LatCentesimale AS Lat, geo.Quota AS Zm, sito.Regione, sito.Provincia, sito.Comune, s.BacinoAnnale, "
         db_query_data += "CONVERT(CHAR(19), ds.Data, 126 ) AS DataInizio, "
-        db_query_data += "CONVERT(CHAR(19), ds.Data,   126 ) AS DataFine "
+        db_query_data += "CONVERT(CHAR(19), ds.Data,   126 ) AS DataFine" + db_query_var_select
         db_query_data += "FROM DatoSensore AS ds INNER JOIN Sensore AS s ON ds.Sensore = s.CodiceUnico "
         db_query_data += "    INNER JOIN Stazione AS st ON s.Stazione = st.CodiceUnico "
         db_query_data += "    INNER JOIN Georeferenza AS geo ON st.Posizione = geo.IDGeo "
         db_query_data += "    INNER JOIN Sito ON st.SitoCollocazione = sito.IDSito "
         db_query_data += "WHERE "
         db_query_data += "    ( ( ds.Data BETWEEN '" + time_from + "' AND '" + time_end + "' ) AND NOT( ds.Data='" + time_from + "' ) ) "
-        db_query_data += "    AND (s.TipoSensore='" + var_name + "' ) "
+        db_query_data += db_query_var_where
         db_query_data += "    AND NOT( ds.DatoOrigine IS NULL ) "
         db_query_data += "    AND NOT( geo.GaussBoagaEst IS NULL ) "
         db_query_data += "    AND NOT( geo.GaussBoagaNord IS NULL ) "
@@ -444,6 +826,18 @@ def define_query_rs_data():
 # -------------------------------------------------------------------------------------
 
 
+# -------------------------------------------------------------------------------------
+# Method to define river station query data for a batch of sensors (single round trip)
+def define_query_rs_data_batch(sensor_n):
+
+    db_query_data = "SET NOCOUNT ON; "
+    for sensor_id in range(sensor_n):
+        db_query_data += "EXEC Liv2QperiodoSensore ?, ?, ?, 'o', 10000, 0; "
+
+    return db_query_data
+# -------------------------------------------------------------------------------------
+
+
 # -------------------------------------------------------------------------------------
 # Method to define river station query registry
 def define_query_rs_registry(var_name):
@@ -3,8 +3,18 @@
 import logging
 import tempfile
 import os
+import re
 import json
 import pickle
+
+import numpy as np
+
+from functools import lru_cache
+
+from ground_network.odbc.lib_utils_decoder import encode_data
+
+# Magic string of numpy (columnar) files
+obj_magic = b'\x93NUMPY'
 # -------------------------------------------------------------------------------------
 
 
@@ -46,30 +56,17 @@ def create_filename_tmp(prefix='tmp_', suffix='.tiff', folder=None):
 # -------------------------------------------------------------------------------------
 # Method to read settings file
 def read_file_settings(file_name):
+
     env_ws = {}
     for env_item, env_value in os.environ.items():
         env_ws[env_item] = env_value
 
     with open(file_name, "r") as file_handle:
-        json_block = []
-        for file_row in file_handle:
-
-            for env_key, env_value in env_ws.items():
-                env_tag = '$' + env_key
-                if env_tag in file_row:
-                    env_value = env_value.strip("'\\'")
-                    file_row = file_row.replace(env_tag, env_value)
-                    file_row = file_row.replace('//', '/')
-
-            # Add the line to our JSON block
-            json_block.append(file_row)
-
-            # Check whether we closed our JSON block
-            if file_row.startswith('}'):
-                # Do something with the JSON dictionary
-                json_dict = json.loads(''.join(json_block))
-                # Start a new block
-                json_block = []
+        json_text = file_handle.read()
+
+    # Substitute the environment variables ($VAR) in a single pass
+    json_text = fill_env2string(json_text, env_ws)
+    json_dict = json.loads(json_text)
 
     return json_dict
 
@@ -77,10 +74,46 @@ def read_file_settings(file_name):
 
 
 # -------------------------------------------------------------------------------------
-# Method to read data obj
-def read_obj(filename):
+# Method to compile the environment variables pattern (longest names first)
+@lru_cache(maxsize=8)
+def compile_env_pattern(env_keys):
+    return re.compile(r'\$(' + '|'.join(re.escape(env_key) for env_key in env_keys) + ')')
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to fill environment variables ($VAR) in a string
+def fill_env2string(string_raw, env_ws):
+
+    if (not env_ws) or ('$' not in string_raw):
+        return string_raw
+
+    env_keys = tuple(sorted(env_ws.keys(), key=lambda env_key: (-len(env_key), env_key)))
+    env_pattern = compile_env_pattern(env_keys)
+
+    def fill_env(env_match):
+        env_value = env_ws[env_match.group(1)].strip("'\\'").replace('//', '/')
+        # Collapse double slash(es) only where the value joins the string
+        if env_value.endswith('/') and string_raw.startswith('/', env_match.end()):
+            env_value = env_value[:-1]
+        if env_value.startswith('/') and env_match.start() > 0 and string_raw[env_match.start() - 1] == '/':
+            env_value = env_value[1:]
+        return env_value
+
+    return env_pattern.sub(fill_env, string_raw)
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to read data obj (columnar array or pickle)
+def read_obj(filename, mmap_mode='r'):
     if os.path.exists(filename):
-        data = pickle.load(open(filename, "rb"))
+        with open(filename, 'rb') as handle:
+            file_magic = handle.read(len(obj_magic))
+        if file_magic == obj_magic:
+            data = np.load(filename, mmap_mode=mmap_mode, allow_pickle=False)
+        else:
+            data = pickle.load(open(filename, "rb"))
     else:
         data = None
     return data
@@ -88,10 +121,18 @@ def read_obj(filename):
 
 
 # -------------------------------------------------------------------------------------
-# Method to write data obj
-def write_obj(filename, data):
+# Method to write data obj (rows are saved as columnar array if possible, pickle otherwise)
+def write_obj(filename, data, obj_columns=True):
     if os.path.exists(filename):
         os.remove(filename)
+
+    data_array = None
+    if obj_columns and isinstance(data, (list, tuple)):
+        data_array = encode_data(data)
+
     with open(filename, 'wb') as handle:
-        pickle.dump(data, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        if data_array is not None:
+            np.save(handle, data_array, allow_pickle=False)
+        else:
+            pickle.dump(data, handle, protocol=pickle.HIGHEST_PROTOCOL)
 # -------------------------------------------------------------------------------------
@@ -0,0 +1,111 @@
+# -------------------------------------------------------------------------------------
+# Libraries
+import logging
+import io
+import os
+import zipfile
+
+import pandas as pd
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to define the entry name of a time step in the store file
+def define_store_entry(time_step, time_format='%Y%m%d%H%M', entry_ext='.csv'):
+    return time_step.strftime(time_format) + entry_ext
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to read the index (available time steps) of the store file
+def read_store_index(file_name, time_format='%Y%m%d%H%M'):
+
+    if not os.path.exists(file_name):
+        return []
+
+    with zipfile.ZipFile(file_name, 'r') as file_handle:
+        entry_names = file_handle.namelist()
+
+    time_steps = sorted(set(pd.to_datetime(
+        [os.path.splitext(entry_name)[0] for entry_name in entry_names], format=time_format)))
+
+    return time_steps
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to write (add or replace) time steps in the store file
+def write_store(file_name, data_obj, time_format='%Y%m%d%H%M',
+                data_separetor=',', data_encoding='utf-8', data_index=False, data_header=True):
+
+    data_entries = {}
+    for time_step, data_frame in data_obj.items():
+        data_entry = define_store_entry(time_step, time_format=time_format)
+        data_entries[data_entry] = data_frame.to_csv(
+            sep=data_separetor, index=data_index, index_label=False, header=data_header,
+            columns=list(data_frame.columns.values)).encode(data_encoding)
+
+    # The store is written to a temporary file and then replaced, so an interrupted write leaves the previous
+    # store untouched (updated time steps are not kept from the previous store; zip entries can not be removed)
+    file_name_tmp = file_name + '.' + str(os.getpid()) + '.tmp'
+    try:
+        with zipfile.ZipFile(file_name_tmp, 'w', compression=zipfile.ZIP_DEFLATED) as file_handle_dst:
+            if os.path.exists(file_name):
+                with zipfile.ZipFile(file_name, 'r') as file_handle_src:
+                    for entry_info in file_handle_src.infolist():
+                        if entry_info.filename not in data_entries:
+                            file_handle_dst.writestr(entry_info, file_handle_src.read(entry_info))
+            for data_entry, data_bytes in data_entries.items():
+                file_handle_dst.writestr(data_entry, data_bytes)
+        os.replace(file_name_tmp, file_name)
+    finally:
+        if os.path.exists(file_name_tmp):
+            os.remove(file_name_tmp)
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to read time steps (all if not defined) from the store file
+def read_store(file_name, time_steps=None, time_format='%Y%m%d%H%M', data_separetor=','):
+
+    data_obj = {}
+    if not os.path.exists(file_name):
+        return data_obj
+
+    with zipfile.ZipFile(file_name, 'r') as file_handle:
+
+        entry_names = file_handle.namelist()
+        if time_steps is None:
+            time_steps = sorted(set(pd.to_datetime(
+                [os.path.splitext(entry_name)[0] for entry_name in entry_names], format=time_format)))
+
+        for time_step in time_steps:
+            data_entry = define_store_entry(time_step, time_format=time_format)
+            if data_entry in entry_names:
+                data_obj[time_step] = pd.read_csv(io.BytesIO(file_handle.read(data_entry)), sep=data_separetor)
+
+    return data_obj
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to export a time step of the store file in csv format
+def export_store(file_name, time_step, file_name_csv, time_format='%Y%m%d%H%M'):
+
+    data_entry = define_store_entry(time_step, time_format=time_format)
+
+    if not os.path.exists(file_name):
+        logging.warning(' ===> Store file "' + file_name + '" is not available')
+        return False
+
+    with zipfile.ZipFile(file_name, 'r') as file_handle:
+        if data_entry not in file_handle.namelist():
+            logging.warning(' ===> Time step "' + str(time_step) + '" is not available in the store file')
+            return False
+        data_bytes = file_handle.read(data_entry)
+
+    with open(file_name_csv, 'wb') as file_handle:
+        file_handle.write(data_bytes)
+
+    return True
+# -------------------------------------------------------------------------------------
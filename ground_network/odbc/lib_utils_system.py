@@ -1,10 +1,20 @@
 # -------------------------------------------------------------------------------------
 # Libraries
+import logging
 import os
 import re
+import socket
+import sqlite3
+import threading
+import time
 
+import numpy as np
+import pandas as pd
+
+from contextlib import contextmanager
 from copy import deepcopy
 from datetime import datetime
+from functools import lru_cache
 # -------------------------------------------------------------------------------------
 
 
@@ -116,3 +126,389 @@ def fill_tags2string(string_raw, tags_format=None, tags_filling=None):
     else:
         return string_raw
 # -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to compile a string template in literal and tag parts (parsed once for each template)
+@lru_cache(maxsize=256)
+def compile_tags2string(string_raw, tags_format_items):
+
+    tags_format = dict(tags_format_items)
+
+    string_compiled = []
+    for string_part in re.split(r"(\{[A-Za-z0-9_]+\})", string_raw):
+        tag_name = string_part[1:-1] if (string_part.startswith('{') and string_part.endswith('}')) else None
+        if (tag_name is not None) and (tags_format.get(tag_name) is not None):
+            string_compiled.append((tag_name, tags_format[tag_name]))
+        elif string_part:
+            string_compiled.append((None, string_part))
+
+    return tuple(string_compiled)
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to fill a string template over a time range (time tags are rendered by vectorized strftime)
+def fill_tags2string_range(string_raw, tags_format=None, tags_filling=None, time_range=None):
+
+    if string_raw is None:
+        return [None] * len(time_range)
+
+    tags_format_items = tuple(sorted((tag_key, tag_value) for tag_key, tag_value in tags_format.items()
+                                     if isinstance(tag_value, str)))
+    tags_filling_items = tuple(sorted((tag_key, tag_value) for tag_key, tag_value in tags_filling.items()
+                                      if isinstance(tag_value, (str, int, float))))
+    tags_time = tuple(sorted(tag_key for tag_key, tag_value in tags_filling.items()
+                             if isinstance(tag_value, pd.DatetimeIndex)))
+
+    time_values = pd.DatetimeIndex(time_range).values.astype('datetime64[ns]')
+
+    string_filled = fill_tags2string_cache(
+        string_raw, tags_format_items, tags_filling_items, tags_time, time_values.tobytes())
+
+    return list(string_filled)
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to render (and cache) a string template for the (template, values, time range) key
+@lru_cache(maxsize=1024)
+def fill_tags2string_cache(string_raw, tags_format_items, tags_filling_items, tags_time, time_bytes):
+
+    time_range = pd.DatetimeIndex(np.frombuffer(time_bytes, dtype='datetime64[ns]'))
+    tags_filling = dict(tags_filling_items)
+
+    string_compiled = compile_tags2string(string_raw, tags_format_items)
+    if all(tag_name is None for tag_name, tag_value in string_compiled):
+        return tuple([string_raw] * len(time_range))
+
+    string_parts = []
+    for tag_name, tag_value in string_compiled:
+
+        if tag_name is None:
+            string_parts.append([tag_value] * len(time_range))
+        elif tag_name in tags_time:
+            string_parts.append(list(time_range.strftime(tag_value)))
+        elif tag_name in list(tags_filling.keys()):
+            tag_filling = tags_filling[tag_name]
+            if isinstance(tag_filling, (float, int)):
+                tag_filling = tag_value.format(tag_filling)
+            string_parts.append([tag_filling] * len(time_range))
+        else:
+            string_parts.append([tag_value] * len(time_range))
+
+    string_filled = tuple(''.join(string_step).replace('//', '/') for string_step in zip(*string_parts))
+
+    return string_filled
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Class file index (folder contents scanned once and updated by the run itself; shared by threads)
+class FileIndex:
+
+    def __init__(self):
+        self.folder_obj = {}
+        self.folder_lock = threading.RLock()
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to split a path in folder and file keys
+    @staticmethod
+    def split(file_path):
+        folder_name, file_name = os.path.split(os.path.normpath(file_path))
+        if folder_name == '':
+            folder_name = os.curdir
+        return folder_name, file_name
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to scan a folder (None if the folder does not exist)
+    def scan(self, folder_name):
+
+        with self.folder_lock:
+            folder_key = os.path.normpath(folder_name)
+            if folder_key not in self.folder_obj:
+                try:
+                    with os.scandir(folder_key) as folder_handle:
+                        self.folder_obj[folder_key] = set(folder_entry.name for folder_entry in folder_handle)
+                except (FileNotFoundError, NotADirectoryError):
+                    self.folder_obj[folder_key] = None
+
+            return self.folder_obj[folder_key]
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to check if a file exists
+    def exists(self, file_path):
+        with self.folder_lock:
+            folder_name, file_name = self.split(file_path)
+            file_list = self.scan(folder_name)
+            return (file_list is not None) and (file_name in file_list)
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to check if a folder is empty (or does not exist)
+    def is_empty(self, folder_name):
+        with self.folder_lock:
+            file_list = self.scan(folder_name)
+            return not file_list
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to add a file (after writing it)
+    def add(self, file_path):
+        with self.folder_lock:
+            folder_name, file_name = self.split(file_path)
+            if self.scan(folder_name) is None:
+                del self.folder_obj[os.path.normpath(folder_name)]
+            file_list = self.scan(folder_name)
+            if file_list is not None:
+                file_list.add(file_name)
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to remove a file (a file removed by other instances is skipped)
+    def remove(self, file_path):
+        with self.folder_lock:
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                pass
+            folder_name, file_name = self.split(file_path)
+            file_list = self.scan(folder_name)
+            if file_list is not None:
+                file_list.discard(file_name)
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to make a folder
+    def make_folder(self, folder_name):
+        with self.folder_lock:
+            if folder_name == '' or self.scan(folder_name) is not None:
+                return
+            os.makedirs(folder_name, exist_ok=True)
+            del self.folder_obj[os.path.normpath(folder_name)]
+            self.add(folder_name)
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to remove an empty folder (a folder changed by other instances is scanned again and kept)
+    def remove_folder(self, folder_name):
+        with self.folder_lock:
+            try:
+                os.rmdir(folder_name)
+            except OSError:
+                self.folder_obj.pop(os.path.normpath(folder_name), None)
+                return
+            self.folder_obj[os.path.normpath(folder_name)] = None
+            folder_root, folder_leaf = self.split(folder_name)
+            file_list = self.scan(folder_root)
+            if file_list is not None:
+                file_list.discard(folder_leaf)
+
+    # -------------------------------------------------------------------------------------
+
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Class work lease (work items in progress shared by the instances of a connector in a sqlite file)
+class WorkLease:
+
+    def __init__(self, file_name, lease_name='connector', lease_time=3600, lease_wait=0, lease_check=5,
+                 time_format='%Y-%m-%d %H:%M'):
+
+        if lease_time <= 0:
+            logging.error(' ===> Work lease time must be greater than 0')
+            raise ValueError('Bad definition of work lease time')
+
+        self.file_name = file_name
+        self.lease_name = lease_name
+        self.lease_time = lease_time
+        self.lease_wait = lease_wait
+        self.lease_check = lease_check
+        self.time_format = time_format
+
+        self.lease_host = socket.gethostname()
+        self.lease_pid = os.getpid()
+
+        folder_name = os.path.dirname(file_name)
+        if folder_name != '':
+            os.makedirs(folder_name, exist_ok=True)
+
+        with self.connect() as lease_db:
+            lease_db.execute('CREATE TABLE IF NOT EXISTS lease ('
+                             'name TEXT, variable TEXT, time TEXT, host TEXT, pid INTEGER, expire REAL, '
+                             'PRIMARY KEY (name, variable, time))')
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to connect to the lease file (transactions are opened explicitly)
+    @contextmanager
+    def connect(self):
+        lease_db = sqlite3.connect(self.file_name, timeout=60, isolation_level=None)
+        try:
+            yield lease_db
+        finally:
+            lease_db.close()
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to remove the expired leases and the leases of the dead processes of this host
+    def expire(self, lease_db):
+
+        lease_db.execute('DELETE FROM lease WHERE name = ? AND expire < ?', (self.lease_name, time.time()))
+
+        lease_rows = lease_db.execute('SELECT DISTINCT pid FROM lease WHERE name = ? AND host = ? AND pid != ?',
+                                      (self.lease_name, self.lease_host, self.lease_pid)).fetchall()
+        for lease_pid, in lease_rows:
+            try:
+                os.kill(lease_pid, 0)
+            except ProcessLookupError:
+                logging.warning(' ===> Work leases of the dead process ' + str(lease_pid) + ' are released')
+                lease_db.execute('DELETE FROM lease WHERE name = ? AND host = ? AND pid = ?',
+                                 (self.lease_name, self.lease_host, lease_pid))
+            except PermissionError:
+                pass
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to acquire the free work items (the items in progress in other instances are returned as busy)
+    def acquire(self, work_items):
+
+        work_acquired, work_busy = [], []
+        with self.connect() as lease_db:
+            lease_db.execute('BEGIN IMMEDIATE')
+            try:
+                self.expire(lease_db)
+                for var_name, time_step in work_items:
+                    lease_key = (self.lease_name, var_name, time_step.strftime(self.time_format))
+                    lease_row = lease_db.execute(
+                        'SELECT host, pid FROM lease WHERE name = ? AND variable = ? AND time = ?',
+                        lease_key).fetchone()
+                    if (lease_row is None) or (tuple(lease_row) == (self.lease_host, self.lease_pid)):
+                        lease_db.execute('INSERT OR REPLACE INTO lease VALUES (?, ?, ?, ?, ?, ?)', lease_key + (
+                            self.lease_host, self.lease_pid, time.time() + self.lease_time))
+                        work_acquired.append((var_name, time_step))
+                    else:
+                        work_busy.append((var_name, time_step))
+                lease_db.execute('COMMIT')
+            except BaseException:
+                lease_db.execute('ROLLBACK')
+                raise
+
+        if work_busy:
+            logging.warning(' ===> Work items in progress in other instances are skipped: ' + str(len(work_busy)))
+
+        return work_acquired, work_busy
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to renew the leases of this instance
+    def renew(self):
+        with self.connect() as lease_db:
+            lease_db.execute('UPDATE lease SET expire = ? WHERE name = ? AND host = ? AND pid = ?',
+                             (time.time() + self.lease_time, self.lease_name, self.lease_host, self.lease_pid))
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to release the leases of this instance
+    def release(self):
+        with self.connect() as lease_db:
+            lease_db.execute('DELETE FROM lease WHERE name = ? AND host = ? AND pid = ?',
+                             (self.lease_name, self.lease_host, self.lease_pid))
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to collect the work items in progress in other instances
+    def collect(self):
+        with self.connect() as lease_db:
+            lease_db.execute('BEGIN IMMEDIATE')
+            self.expire(lease_db)
+            lease_db.execute('COMMIT')
+            lease_rows = lease_db.execute(
+                'SELECT variable, time FROM lease WHERE name = ? AND NOT (host = ? AND pid = ?)',
+                (self.lease_name, self.lease_host, self.lease_pid)).fetchall()
+        return [(var_name, pd.Timestamp(time_step)) for var_name, time_step in lease_rows]
+
+    # -------------------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------------------
+    # Method to wait for the work items in progress in other instances (the items still busy are returned)
+    def wait(self, work_items):
+
+        time_start = time.time()
+        while work_items:
+            with self.connect() as lease_db:
+                lease_db.execute('BEGIN IMMEDIATE')
+                self.expire(lease_db)
+                lease_db.execute('COMMIT')
+                work_items = [(var_name, time_step) for var_name, time_step in work_items if lease_db.execute(
+                    'SELECT 1 FROM lease WHERE name = ? AND variable = ? AND time = ?',
+                    (self.lease_name, var_name, time_step.strftime(self.time_format))).fetchone() is not None]
+            if (not work_items) or (time.time() - time_start >= self.lease_wait):
+                break
+            time.sleep(self.lease_check)
+
+        if work_items:
+            logging.warning(' ===> Work items still in progress in other instances: ' + str(len(work_items)))
+
+        return work_items
+
+    # -------------------------------------------------------------------------------------
+
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to define the work lease (None if the lease is not activated)
+def define_work_lease(lease_dict=None, lease_name='connector', lease_time_default=3600, lease_wait_default=0):
+
+    if lease_dict is None:
+        lease_dict = {}
+
+    if 'active' in list(lease_dict.keys()):
+        lease_active = lease_dict['active']
+    else:
+        lease_active = False
+    if 'file_name' in list(lease_dict.keys()):
+        file_name = lease_dict['file_name']
+    else:
+        file_name = None
+    if 'name' in list(lease_dict.keys()):
+        lease_name = lease_dict['name']
+    if 'lease_time' in list(lease_dict.keys()):
+        lease_time = lease_dict['lease_time']
+    else:
+        lease_time = lease_time_default
+    if 'wait' in list(lease_dict.keys()):
+        lease_wait = lease_dict['wait']
+    else:
+        lease_wait = lease_wait_default
+
+    if not lease_active:
+        return None
+    if file_name is None:
+        logging.error(' ===> Work lease file is not defined')
+        raise IOError('Work lease file is needed by the lock settings')
+
+    logging.info(' ---> Define work lease (name: ' + lease_name + ', lease time: ' + str(lease_time) +
+                 ', wait: ' + str(lease_wait) + ') ... OK')
+
+    return WorkLease(file_name, lease_name=lease_name, lease_time=lease_time, lease_wait=lease_wait)
+# -------------------------------------------------------------------------------------
@@ -2,6 +2,7 @@
 # Libraries
 import logging
 
+import numpy as np
 import pandas as pd
 
 from datetime import date
@@ -45,3 +46,52 @@ def set_time(time_run_args=None, time_run_file=None, time_format='%Y-%m-%d %H:$M
 
     return time_run, time_range
 # -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to plan the time windows of the run time(s) (union of the windows split in contiguous ranges)
+def plan_time_windows(time_runs, time_period=1, time_frequency='H', time_rounding='H'):
+
+    time_steps = pd.DatetimeIndex([])
+    for time_run in time_runs:
+        time_end = pd.Timestamp(time_run).floor(time_rounding)
+        time_steps = time_steps.union(pd.date_range(end=time_end, periods=time_period, freq=time_frequency))
+
+    time_windows = []
+    if time_steps.size > 0:
+        time_gaps = time_steps[1:] - time_steps[:-1] != pd.Timedelta(pd.tseries.frequencies.to_offset(time_frequency))
+        time_breaks = [0] + [time_id + 1 for time_id in np.flatnonzero(time_gaps)] + [time_steps.size]
+        for time_start_id, time_end_id in zip(time_breaks[:-1], time_breaks[1:]):
+            time_windows.append(pd.date_range(start=time_steps[time_start_id], end=time_steps[time_end_id - 1],
+                                              freq=time_frequency))
+
+    return time_windows
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to split a time period in chunks (aligned to the chunk frequency, e.g. one chunk for each day)
+def split_time_chunks(time_start, time_end, time_frequency='H', time_rounding='H', time_chunk='D', time_align=None):
+
+    # Chunks are extended to whole periods of the alignment frequency (files shared by the steps of a period)
+    if time_align is not None:
+        time_chunk_delta = pd.Timedelta(pd.tseries.frequencies.to_offset(time_chunk))
+        time_align_delta = pd.Timedelta(pd.tseries.frequencies.to_offset(time_align))
+        if time_chunk_delta % time_align_delta != pd.Timedelta(0):
+            logging.warning(' ===> Time chunk "' + time_chunk + '" is not aligned to "' + time_align +
+                            '". Time chunk is set to "' + time_align + '"')
+            time_chunk = time_align
+
+    time_start = pd.Timestamp(time_start).floor(time_rounding)
+    time_end = pd.Timestamp(time_end).floor(time_rounding)
+    if time_end < time_start:
+        logging.error(' ===> Time end "' + str(time_end) + '" is before time start "' + str(time_start) + '"')
+        raise ValueError('Bad definition of time period')
+
+    time_steps = pd.date_range(start=time_start, end=time_end, freq=time_frequency)
+    time_keys = time_steps.floor(time_chunk)
+
+    time_chunks = [time_steps[time_keys == time_key] for time_key in time_keys.unique()]
+
+    return time_chunks
+# -------------------------------------------------------------------------------------
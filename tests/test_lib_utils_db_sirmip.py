@@ -0,0 +1,118 @@
+# -------------------------------------------------------------------------------------
+# Libraries
+import pandas as pd
+
+from ground_network.odbc.lib_utils_db_sirmip import get_data_rs_sensors, accumulate_data_ws
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Class cursor returning the result sets of the executed procedure call(s)
+class CursorRS:
+
+    def __init__(self, data_obj, data_sets_batch=None):
+        self.data_obj = data_obj
+        self.data_sets_batch = data_sets_batch
+        self.data_sets = []
+        self.calls = []
+
+    @property
+    def description(self):
+        if self.data_sets and self.data_sets[0] is not None:
+            return [('column',)]
+        return None
+
+    def execute(self, db_query, db_parameters):
+        db_codes = db_parameters[2::3]
+        self.calls.append(db_codes)
+        if len(db_codes) > 1 and self.data_sets_batch is not None:
+            self.data_sets = list(self.data_sets_batch)
+        else:
+            self.data_sets = [self.data_obj[db_code] for db_code in db_codes]
+
+    def fetchall(self):
+        return self.data_sets[0]
+
+    def nextset(self):
+        self.data_sets = self.data_sets[1:]
+        return bool(self.data_sets)
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to define the rows of the sensors
+def define_rows_rs(db_codes):
+    return {db_code: [(db_code, 'Sensor ' + str(db_code), 1.0, '2020-06-17T01:00:00')] for db_code in db_codes}
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Test the batch of sensors paired with its result sets
+def test_get_data_rs_sensors_batch():
+
+    db_codes = [11, 12, 13]
+    db_cursor = CursorRS(define_rows_rs(db_codes))
+
+    db_dataset = get_data_rs_sensors(db_cursor, db_codes, 'from', 'to', query_batch=3)
+
+    assert [db_row[0] for db_row in db_dataset] == db_codes
+    assert db_cursor.calls == [db_codes]
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Test the batch of sensors with missing or extra result sets (sensors queried one by one)
+def test_get_data_rs_sensors_batch_sets_mismatch():
+
+    db_codes = [11, 12, 13]
+    data_obj = define_rows_rs(db_codes)
+
+    for data_sets_batch in [[data_obj[11], None, data_obj[13]], [data_obj[11], data_obj[12], [], data_obj[13]]]:
+        db_cursor = CursorRS(data_obj, data_sets_batch=data_sets_batch)
+
+        db_dataset = get_data_rs_sensors(db_cursor, db_codes, 'from', 'to', query_batch=3)
+
+        assert [db_row[0] for db_row in db_dataset] == db_codes
+        assert db_cursor.calls == [db_codes, [11], [12], [13]]
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to define the 10-minute rows of a weather station hour
+def define_rows_ws(time_step, station_code, station_values):
+    rows_step = []
+    for value_id, value_step in enumerate(station_values):
+        time_string = (time_step - pd.Timedelta(minutes=10 * value_id)).strftime('%Y-%m-%dT%H:%M:%S')
+        rows_step.append((station_code, station_code // 10, 'Station ' + str(station_code), value_step,
+                          13.1, 43.2, 100.0, 'Ancona', 'AN', 'X', 'Esino', time_string, time_string))
+    return rows_step
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Test the accumulations of stations with partial windows (min_count applied to each hour)
+def test_accumulate_data_ws_partial_window():
+
+    time_range = pd.date_range('2020-06-17 01:00', periods=3, freq='H')
+    data_collection_obj = {
+        time_range[0]: define_rows_ws(time_range[0], 1010, [1.0] * 6) + define_rows_ws(time_range[0], 1020, [0.5]) +
+        define_rows_ws(time_range[0], 1030, [1.0] * 3),
+        time_range[1]: define_rows_ws(time_range[1], 1010, [1.0] * 6) + define_rows_ws(time_range[1], 1020, [0.5]) +
+        define_rows_ws(time_range[1], 1030, [1.0] * 3),
+        time_range[2]: define_rows_ws(time_range[2], 1010, [1.0] * 6) + define_rows_ws(time_range[2], 1020, [0.5])}
+
+    data_df_obj = accumulate_data_ws(data_collection_obj, time_range, [3], data_min_count=3)
+    data_df_step = data_df_obj[3][time_range[2]].set_index('code')
+
+    # Station 1020 has 3 values in the window but less than min_count in each hour
+    assert data_df_step.loc[1010, 'data'] == 18.0
+    assert pd.isna(data_df_step.loc[1020, 'data'])
+    assert pd.isna(data_df_step.loc[1030, 'data'])
+
+    data_df_obj = accumulate_data_ws(data_collection_obj, time_range, [3], data_min_count=3, data_coverage=0.5)
+    data_df_step = data_df_obj[3][time_range[2]].set_index('code')
+
+    assert data_df_step.loc[1010, 'data'] == 18.0
+    assert pd.isna(data_df_step.loc[1020, 'data'])
+    assert data_df_step.loc[1030, 'data'] == 6.0
+# -------------------------------------------------------------------------------------
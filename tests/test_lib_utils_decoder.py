@@ -0,0 +1,86 @@
+# -------------------------------------------------------------------------------------
+# Libraries
+import pandas as pd
+
+from ground_network.odbc.lib_utils_io import write_obj, read_obj
+from ground_network.odbc.lib_utils_db_sirmip import decode_data_ws_window, accumulate_data_ws
+from ground_network.odbc.lib_utils_decoder import define_columns_schema, encode_data, decode_data_list
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to define the rows of a time step (name and catchment of the first station can be NULL)
+def define_rows_ws(time_step, station_name='Station 101', station_catchment='Esino'):
+    time_string = time_step.strftime('%Y-%m-%dT%H:%M:%S')
+    return [(1010, 101, station_name, 1.5, 13.1, 43.2, 100.0, None, 'AN', 'X', station_catchment,
+             time_string, time_string),
+            (1020, 102, 'Station 102', 2.5, 13.2, 43.3, 200.0, 'Ancona', 'AN', 'X', 'Musone',
+             time_string, time_string)]
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to define the ancillary collections of a window (hours with and without NULL string values)
+def define_collections_ws(tmp_path):
+    time_range = pd.date_range('2020-06-17 01:00', periods=4, freq='H')
+    rows_obj = {time_range[0]: define_rows_ws(time_range[0], station_name=None),
+                time_range[1]: define_rows_ws(time_range[1]),
+                time_range[2]: define_rows_ws(time_range[2], station_catchment=None),
+                time_range[3]: define_rows_ws(time_range[3], station_name='Station 101 (new)')}
+
+    data_collection_obj = {}
+    for time_step, rows_step in rows_obj.items():
+        file_name = str(tmp_path / (time_step.strftime('%Y%m%d%H%M') + '.workspace'))
+        write_obj(file_name, rows_step)
+        data_collection_obj[time_step] = read_obj(file_name)
+
+    return time_range, data_collection_obj
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Test the window decoder with NULL and non NULL string hours
+def test_decode_data_ws_window_null_strings(tmp_path):
+
+    time_range, data_collection_obj = define_collections_ws(tmp_path)
+
+    data_df = decode_data_ws_window(data_collection_obj)
+
+    assert len(data_df) == 8
+    assert data_df['time_step'].tolist() == [time_step for time_step in time_range for _ in range(2)]
+    assert data_df['name'].tolist()[0::2] == [None, 'Station 101', 'Station 101', 'Station 101 (new)']
+    assert data_df['catchment'].tolist()[0::2] == ['Esino', 'Esino', None, 'Esino']
+    assert data_df['data'].tolist() == [1.5, 2.5] * 4
+    assert (data_df['time_end'] == data_df['time_step']).all()
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Test the accumulations with NULL and non NULL string hours
+def test_accumulate_data_ws_null_strings(tmp_path):
+
+    time_range, data_collection_obj = define_collections_ws(tmp_path)
+
+    data_df_obj = accumulate_data_ws(data_collection_obj, time_range, [3])
+
+    assert list(data_df_obj[3].keys()) == list(time_range[2:])
+    for data_df_step in data_df_obj[3].values():
+        assert sorted(data_df_step['data'].tolist()) == [4.5, 7.5]
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Test the decoder of a list of collections (columnar arrays with different layouts and rows)
+def test_decode_data_list_mixed_collections():
+
+    rows_null = [(1, 'a', None), (2, None, 1.5)]
+    rows_valid = [(3, 'bbbb', 2.5)]
+    columns_schema = define_columns_schema(['id', 'name', 'data'], [int, str, float], [0, 1, 2])
+
+    data_df = decode_data_list([encode_data(rows_null), encode_data(rows_valid), rows_valid, []], columns_schema)
+
+    assert data_df['id'].tolist() == [1, 2, 3, 3]
+    assert data_df['name'].tolist() == ['a', None, 'bbbb', 'bbbb']
+    assert data_df['data'].tolist()[1:] == [1.5, 2.5, 2.5]
+    assert pd.isna(data_df['data'].iloc[0])
+# -------------------------------------------------------------------------------------
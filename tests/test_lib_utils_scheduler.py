@@ -0,0 +1,93 @@
+# -------------------------------------------------------------------------------------
+# Libraries
+import time
+
+import pandas as pd
+
+from ground_network.odbc.lib_utils_scheduler import plan_work_items, group_work_rounds, run_work_rounds, \
+    run_round_data
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Class driver recording the downloaded and organized time steps
+class DriverRound:
+
+    def __init__(self, time_sleep=0.0):
+        self.time_sleep = time_sleep
+        self.calls = []
+
+    def download_data(self, time_steps=None):
+        time.sleep(self.time_sleep)
+        self.calls.append(('download', time_steps))
+
+    def organize_data(self, time_steps=None):
+        self.calls.append(('organize', time_steps))
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Test the order of the work items (priority, most recent time step, variables order) and the backlog
+def test_plan_work_items():
+
+    time_steps = pd.date_range('2020-06-17 01:00', periods=2, freq='H')
+    variable_dict = {'rain': {'priority': 1}, 'air_temperature': {}, 'wind': {'download': False}}
+    work_backlog = [('rain', pd.Timestamp('2020-06-16 23:00')), ('wind', pd.Timestamp('2020-06-16 23:00'))]
+
+    work_items = plan_work_items(time_steps, variable_dict, work_backlog=work_backlog)
+
+    assert work_items == [('air_temperature', time_steps[1]), ('air_temperature', time_steps[0]),
+                          ('rain', time_steps[1]), ('rain', time_steps[0]), ('rain', pd.Timestamp('2020-06-16 23:00'))]
+    assert group_work_rounds(work_items, time_block=2) == [
+        [['air_temperature'], [time_steps[1], time_steps[0]]], [['rain'], [time_steps[1], time_steps[0]]],
+        [['rain'], [pd.Timestamp('2020-06-16 23:00')]]]
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Test the work rounds without deadline (every round is run at once)
+def test_run_work_rounds():
+
+    time_steps = pd.date_range('2020-06-17 01:00', periods=3, freq='H')
+    work_rounds = [[['rain'], list(time_steps[:2])], [['rain', 'air_temperature'], [time_steps[2]]]]
+    round_calls = []
+
+    def round_fx(var_list, time_steps_round, time_stop):
+        round_calls.append((var_list, time_steps_round, time_stop))
+        return []
+
+    assert run_work_rounds(work_rounds, round_fx) == []
+    assert round_calls == [(['rain'], list(time_steps[:2]), None),
+                           (['rain', 'air_temperature'], [time_steps[2]], None)]
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Test the deadline reached inside a work round (the time steps not run and the next rounds are deferred)
+def test_run_work_rounds_deadline():
+
+    time_steps = pd.date_range('2020-06-17 01:00', periods=4, freq='H')[::-1]
+    work_rounds = [[['rain'], list(time_steps[:3])], [['rain', 'air_temperature'], [time_steps[3]]]]
+    driver_data = DriverRound(time_sleep=0.2)
+
+    def round_fx(var_list, time_steps_round, time_stop):
+        return run_round_data(driver_data, time_steps_round, time_stop=time_stop)
+
+    work_deferred = run_work_rounds(work_rounds, round_fx, time_deadline=0.1)
+
+    assert driver_data.calls == [('download', [time_steps[0]]), ('organize', [time_steps[0]])]
+    assert work_deferred == [('rain', time_steps[1]), ('rain', time_steps[2]),
+                             ('rain', time_steps[3]), ('air_temperature', time_steps[3])]
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Test the time steps of a work round without stop time (downloaded and organized at once)
+def test_run_round_data():
+
+    time_steps = pd.date_range('2020-06-17 01:00', periods=2, freq='H')
+    driver_data = DriverRound()
+
+    assert run_round_data(driver_data, time_steps) == []
+    assert driver_data.calls == [('download', None), ('organize', None)]
+# -------------------------------------------------------------------------------------
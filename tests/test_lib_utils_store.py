@@ -0,0 +1,102 @@
+# -------------------------------------------------------------------------------------
+# Libraries
+import os
+import zipfile
+
+import pandas as pd
+import pytest
+
+from ground_network.odbc.lib_utils_store import write_store, read_store, read_store_index, export_store
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to define the dataframe of a time step
+def define_data_step(data_value):
+    return pd.DataFrame({'code': [1010, 1020], 'data': [data_value, data_value + 1.0], 'name': ['a', 'b']})
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Test the round trip of the time steps written in the store file
+def test_write_read_store(tmp_path):
+
+    file_name = str(tmp_path / 'rain_marche_20200617.zip')
+    time_steps = pd.date_range('2020-06-17 01:00', periods=2, freq='H')
+
+    write_store(file_name, {time_steps[0]: define_data_step(1.0), time_steps[1]: define_data_step(2.0)})
+
+    data_obj = read_store(file_name)
+    assert list(data_obj.keys()) == list(time_steps)
+    pd.testing.assert_frame_equal(data_obj[time_steps[1]], define_data_step(2.0))
+    assert list(read_store(file_name, time_steps=[time_steps[0]]).keys()) == [time_steps[0]]
+    assert read_store_index(file_name) == list(time_steps)
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Test the time steps added and replaced in the store file
+def test_write_store_append_replace(tmp_path):
+
+    file_name = str(tmp_path / 'rain_marche_20200617.zip')
+    time_steps = pd.date_range('2020-06-17 01:00', periods=3, freq='H')
+
+    write_store(file_name, {time_steps[0]: define_data_step(1.0)})
+    write_store(file_name, {time_steps[1]: define_data_step(2.0)})
+    write_store(file_name, {time_steps[1]: define_data_step(5.0), time_steps[2]: define_data_step(3.0)})
+
+    data_obj = read_store(file_name)
+    assert list(data_obj.keys()) == list(time_steps)
+    assert data_obj[time_steps[0]]['data'].tolist() == [1.0, 2.0]
+    assert data_obj[time_steps[1]]['data'].tolist() == [5.0, 6.0]
+    with zipfile.ZipFile(file_name, 'r') as file_handle:
+        assert len(file_handle.namelist()) == 3
+    assert os.listdir(str(tmp_path)) == ['rain_marche_20200617.zip']
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Test the store file after a killed write (previous time steps still available)
+def test_write_store_killed(tmp_path, monkeypatch):
+
+    file_name = str(tmp_path / 'rain_marche_20200617.zip')
+    time_steps = pd.date_range('2020-06-17 01:00', periods=2, freq='H')
+
+    write_store(file_name, {time_steps[0]: define_data_step(1.0)})
+
+    # The process is killed after writing an entry (the zip central directory is never written)
+    zipfile_writestr = zipfile.ZipFile.writestr
+
+    def writestr_killed(self, *args, **kwargs):
+        zipfile_writestr(self, *args, **kwargs)
+        raise KeyboardInterrupt()
+
+    def close_killed(self):
+        self.fp.flush()
+
+    monkeypatch.setattr(zipfile.ZipFile, 'writestr', writestr_killed)
+    monkeypatch.setattr(zipfile.ZipFile, 'close', close_killed)
+    with pytest.raises(KeyboardInterrupt):
+        write_store(file_name, {time_steps[1]: define_data_step(2.0)})
+    monkeypatch.undo()
+
+    assert list(read_store(file_name).keys()) == [time_steps[0]]
+    assert os.listdir(str(tmp_path)) == ['rain_marche_20200617.zip']
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Test the export of a time step of the store file in csv format
+def test_export_store(tmp_path):
+
+    file_name = str(tmp_path / 'rain_marche_20200617.zip')
+    file_name_csv = str(tmp_path / 'rain_marche_202006170100.csv')
+    time_step = pd.Timestamp('2020-06-17 01:00')
+
+    write_store(file_name, {time_step: define_data_step(1.0)})
+
+    assert export_store(file_name, time_step, file_name_csv)
+    pd.testing.assert_frame_equal(pd.read_csv(file_name_csv), define_data_step(1.0))
+    assert not export_store(file_name, time_step + pd.Timedelta(hours=1), file_name_csv)
+    assert not export_store(str(tmp_path / 'missing.zip'), time_step, file_name_csv)
+# -------------------------------------------------------------------------------------
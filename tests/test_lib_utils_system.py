@@ -0,0 +1,97 @@
+# -------------------------------------------------------------------------------------
+# Libraries
+import os
+import subprocess
+import sys
+import time
+
+import pandas as pd
+
+from ground_network.odbc.lib_utils_system import fill_tags2string, fill_tags2string_range, WorkLease
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Test the strings filled over the time range against the strings filled for each time step
+def test_fill_tags2string_range():
+
+    tags_format = {'domain_name': 'string_domain', 'ancillary_var_name': 'string_var_source',
+                   'ancillary_datetime': '%Y%m%d%H%M', 'ancillary_sub_path_time': '%Y/%m/%d/',
+                   'destination_store_datetime': '%Y%m%d'}
+    time_range = pd.date_range('2020-06-16 22:00', periods=4, freq='H')
+
+    for string_raw in ['/home/hyde/ancillary/{ancillary_sub_path_time}/',
+                       '{ancillary_var_name}_{domain_name}_{ancillary_datetime}.workspace',
+                       '{ancillary_var_name}_{domain_name}_{destination_store_datetime}.zip',
+                       'marche.dem.txt', '{unknown_name}_{domain_name}.csv']:
+
+        tags_filling = {'domain_name': 'marche', 'ancillary_var_name': 'rain', 'ancillary_datetime': time_range,
+                        'ancillary_sub_path_time': time_range, 'destination_store_datetime': time_range}
+        string_range = fill_tags2string_range(string_raw, tags_format, tags_filling, time_range)
+
+        string_steps = []
+        for time_step in time_range:
+            tags_filling_step = dict(tags_filling)
+            tags_filling_step.update({'ancillary_datetime': time_step, 'ancillary_sub_path_time': time_step,
+                                      'destination_store_datetime': time_step})
+            string_steps.append(fill_tags2string(string_raw, tags_format, tags_filling_step))
+
+        assert string_range == string_steps
+
+    assert fill_tags2string_range(None, tags_format, {}, time_range) == [None] * 4
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Method to define the lease of another instance (same lease file, other process id)
+def define_lease_other(file_name, lease_pid, lease_time=3600):
+    work_lease = WorkLease(file_name, lease_name='ws', lease_time=lease_time)
+    work_lease.lease_pid = lease_pid
+    return work_lease
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Test the work items acquired by an instance and skipped (busy) by another one
+def test_work_lease_acquire(tmp_path):
+
+    file_name = str(tmp_path / 'lease' / 'ws.db')
+    work_items = [('rain', pd.Timestamp('2020-06-17 01:00')), ('rain', pd.Timestamp('2020-06-17 00:00'))]
+
+    work_lease = WorkLease(file_name, lease_name='ws')
+    work_lease_other = define_lease_other(file_name, os.getppid())
+
+    assert work_lease_other.acquire(work_items[:1]) == (work_items[:1], [])
+    assert work_lease.acquire(work_items) == (work_items[1:], work_items[:1])
+    assert work_lease.acquire(work_items[1:]) == (work_items[1:], [])
+    assert work_lease.collect() == work_items[:1]
+    assert work_lease.wait(work_items[:1]) == work_items[:1]
+
+    work_lease_other.release()
+    assert work_lease.collect() == []
+    assert work_lease.wait(work_items[:1]) == []
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Test the work items released by an expired lease and by a dead process
+def test_work_lease_expire(tmp_path):
+
+    file_name = str(tmp_path / 'ws.db')
+    work_items = [('rain', pd.Timestamp('2020-06-17 01:00'))]
+
+    work_lease = WorkLease(file_name, lease_name='ws')
+
+    work_lease_other = define_lease_other(file_name, os.getppid(), lease_time=0.1)
+    assert work_lease_other.acquire(work_items) == (work_items, [])
+    assert work_lease.acquire(work_items) == ([], work_items)
+    time.sleep(0.2)
+    assert work_lease.acquire(work_items) == (work_items, [])
+    work_lease.release()
+
+    process_dead = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process_dead.wait()
+    work_lease_other = define_lease_other(file_name, process_dead.pid)
+    assert work_lease_other.acquire(work_items) == (work_items, [])
+    assert work_lease.acquire(work_items) == (work_items, [])
+# -------------------------------------------------------------------------------------
@@ -0,0 +1,53 @@
+# -------------------------------------------------------------------------------------
+# Libraries
+import pandas as pd
+import pytest
+
+from ground_network.odbc.lib_utils_time import plan_time_windows, split_time_chunks
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Test the time windows of overlapping and disjoint run times (hours shared by the runs planned once)
+def test_plan_time_windows():
+
+    time_runs = pd.DatetimeIndex(['2020-06-17 00:00', '2020-06-17 01:30', '2020-06-17 12:00'])
+
+    time_windows = plan_time_windows(time_runs, time_period=3)
+
+    assert [list(time_window) for time_window in time_windows] == [
+        list(pd.date_range('2020-06-16 22:00', '2020-06-17 01:00', freq='H')),
+        list(pd.date_range('2020-06-17 10:00', '2020-06-17 12:00', freq='H'))]
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Test the chunks of a time period (one chunk for each day; every time step in one chunk only)
+def test_split_time_chunks():
+
+    time_chunks = split_time_chunks('2020-06-16 22:30', '2020-06-18 02:00')
+
+    assert [time_chunk.size for time_chunk in time_chunks] == [2, 24, 3]
+    assert [time_step for time_chunk in time_chunks for time_step in time_chunk] == list(
+        pd.date_range('2020-06-16 22:00', '2020-06-18 02:00', freq='H'))
+    assert all(time_chunk.normalize().unique().size == 1 for time_chunk in time_chunks)
+
+    with pytest.raises(ValueError):
+        split_time_chunks('2020-06-18 02:00', '2020-06-16 22:00')
+# -------------------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------------------
+# Test the chunks aligned to the store files (a chunk not made of whole days is set to one day)
+def test_split_time_chunks_align():
+
+    time_chunks = split_time_chunks('2020-06-16 22:00', '2020-06-17 08:00', time_chunk='6H', time_align='D')
+    assert [time_chunk.size for time_chunk in time_chunks] == [2, 9]
+
+    time_chunks = split_time_chunks('2020-06-16 22:00', '2020-06-17 08:00', time_chunk='6H')
+    assert [time_chunk.size for time_chunk in time_chunks] == [2, 6, 3]
+
+    time_chunks = split_time_chunks('2020-06-15 00:00', '2020-06-18 23:00', time_chunk='2D', time_align='D')
+    assert all(time_chunk.size % 24 == 0 for time_chunk in time_chunks)
+    assert sum(time_chunk.size for time_chunk in time_chunks) == 96
+# -------------------------------------------------------------------------------------